@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""Build docs directly from in-memory outputs of parsers.
+
+There is no need to serialize a parse to CoNLL-U text and convert it back
+with ConverterConllUDV1: text splitting and search of token offsets are
+skipped, UD columns are mapped with the same tables (and caches) as in the
+converter.
+
+A parse is represented as a list of sentences, every sentence is a list of
+TokenTuple (or plain tuples with the same fields):
+    form, lemma, upos - strings, as in CoNLL-U;
+    feats - UD features string 'Case=Nom|Number=Sing' or a mapping;
+    head - 1-based position of the parent in the sentence, 0 for the root,
+           None if unknown;
+    deprel - UD dependency relation;
+    start, end - character offsets of the token in the text or None.
+
+Example:
+    adapter = DocAdapter(fields=ConvFields.INDEX)
+    doc = adapter.from_tokens('1', text, [[('Hi', 'hi', 'INTJ', '_', 0, 'root', 0, 2)]])
+    doc = adapter.from_spacy(nlp(text), '2')
+    doc = adapter.from_stanza(stanza_pipeline(text), '3')
+"""
+
+from typing import Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence
+
+from pylp import common
+from pylp import lp_doc
+from pylp.converter_conll_ud_v1 import ConverterConllUDV1, ConvFields
+
+
+class TokenTuple(NamedTuple):
+    form: str
+    lemma: str
+    upos: str
+    feats: str | Mapping[str, str] = '_'
+    head: Optional[int] = None
+    deprel: str = '_'
+    start: Optional[int] = None
+    end: Optional[int] = None
+
+
+def _feats_str(feats) -> str:
+    if not feats:
+        return '_'
+    if isinstance(feats, str):
+        return feats
+    return '|'.join(f'{name}={value}' for name, value in sorted(feats.items()))
+
+
+def spacy_sents(spacy_doc) -> Iterator[List[TokenTuple]]:
+    """Sentences of a spaCy Doc as lists of TokenTuple."""
+    for span in spacy_doc.sents:
+        sent = []
+        for token in span:
+            head = 0 if token.head.i == token.i else token.head.i - span.start + 1
+            sent.append(
+                TokenTuple(
+                    token.text,
+                    token.lemma_,
+                    token.pos_,
+                    str(token.morph),
+                    head,
+                    token.dep_.lower(),
+                    token.idx,
+                    token.idx + len(token.text),
+                )
+            )
+        yield sent
+
+
+def stanza_sents(stanza_doc) -> Iterator[List[TokenTuple]]:
+    """Sentences of a Stanza Document as lists of TokenTuple.
+
+    Words of multi-word tokens may have no offsets, they get None offsets.
+    """
+    for sentence in stanza_doc.sentences:
+        sent = []
+        for word in sentence.words:
+            sent.append(
+                TokenTuple(
+                    word.text,
+                    word.lemma or '_',
+                    word.upos or '_',
+                    word.feats or '_',
+                    word.head,
+                    word.deprel or '_',
+                    getattr(word, 'start_char', None),
+                    getattr(word, 'end_char', None),
+                )
+            )
+        yield sent
+
+
+class DocAdapter:
+    """Creates docs from sentences of TokenTuple.
+
+    max_cache_size and fields have the same meaning as in ConverterConllUDV1.
+    """
+
+    def __init__(self, max_cache_size: int = 100_000, fields: ConvFields = ConvFields.ALL) -> None:
+        self._converter = ConverterConllUDV1(max_cache_size, fields=fields)
+        self._need_offsets = bool(ConvFields(fields) & ConvFields.OFFSETS)
+
+    def _create_word_obj(self, pos: int, token: Sequence):
+        form, lemma, upos, feats, head, deprel, *offsets = token
+        # Columns are laid out as in CoNLL-U, see ConverterConllUDV1
+        row = (
+            '',
+            form,
+            lemma or '_',
+            upos or '_',
+            '_',
+            _feats_str(feats),
+            '_' if head is None else str(head),
+            deprel or '_',
+            '_',
+        )
+        word_obj = self._converter._create_word_obj(pos, row)
+        if self._need_offsets and offsets and offsets[0] is not None:
+            start, end = offsets[0], offsets[1] if len(offsets) > 1 else None
+            word_obj.offset = start
+            word_obj.len = end - start if end is not None else len(form)
+        return word_obj
+
+    def from_tokens(
+        self,
+        doc_id: str,
+        text: Optional[str],
+        sents: Iterable[Iterable[Sequence]],
+        lang: Optional[str | common.Lang] = None,
+    ) -> lp_doc.Doc:
+        doc = lp_doc.Doc(doc_id, text=text, lang=lang)
+        for tokens in sents:
+            sent = lp_doc.Sent()
+            for token in tokens:
+                sent.add_word(self._create_word_obj(len(sent), token))
+            doc.add_sent(sent)
+        return doc
+
+    def from_spacy(self, spacy_doc, doc_id: str, lang=None) -> lp_doc.Doc:
+        return self.from_tokens(doc_id, spacy_doc.text, spacy_sents(spacy_doc), lang)
+
+    def from_stanza(self, stanza_doc, doc_id: str, lang=None) -> lp_doc.Doc:
+        return self.from_tokens(doc_id, stanza_doc.text, stanza_sents(stanza_doc), lang)
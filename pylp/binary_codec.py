@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+
+"""Compact versioned binary format for lp_doc.Doc.
+
+Layout of a document (all numbers are little-endian):
+
+    magic(4s) version(B)
+    meta_len(I) meta          -- ujson: id, lang, text_hash, ling_meta
+    text_len(i) text          -- utf8, text_len == -1 means no text
+    fragments_cnt(I) {name(str) pairs_cnt(I) pairs(i*2n)}
+    sents_cnt(I) sent_offsets(I*(sents_cnt+1)) sents_blob
+
+Sentence offsets are relative to the beginning of the sents blob, so every
+sentence can be decoded independently. Word attributes are stored column by
+column, enum fields are packed as unsigned bytes. Phrases are stored as a
+table: per phrase fixed-size columns, flattened position/deps lists and the
+list of words. Rare cosmetic modifiers are stored in a single ujson list.
+"""
+
+import functools
+import operator
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import ujson
+
+from pylp import common
+from pylp import lp_doc
+from pylp.word_obj import WordObj
+from pylp.phrases.phrase import (
+    HeadModifier,
+    Phrase,
+    PhraseId,
+    PhraseType,
+    ReprEnhancer,
+    ReprEnhType,
+)
+
+MAGIC = b'PLPB'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sB')
+_U32 = struct.Struct('<I')
+_I32 = struct.Struct('<i')
+_I32x2 = struct.Struct('<ii')
+_SENT_HEADER = struct.Struct('<IBI')
+
+# (attribute name, enum class); enum values are packed as unsigned bytes
+_ENUM_COLUMNS: List[Tuple[str, Any]] = [
+    ('pos_tag', common.PosTag),
+    ('synt_link', common.SyntLink),
+    ('lang', common.Lang),
+    ('number', common.WordNumber),
+    ('gender', common.WordGender),
+    ('case', common.WordCase),
+    ('tense', common.WordTense),
+    ('person', common.WordPerson),
+    ('degree', common.WordDegree),
+    ('aspect', common.WordAspect),
+    ('voice', common.WordVoice),
+    ('mood', common.WordMood),
+    ('num_type', common.WordNumType),
+    ('animacy', common.WordAnimacy),
+]
+_INT_COLUMNS = [('offset', 'i'), ('len', 'i'), ('parent_offs', 'i'), ('_word_id', 'Q')]
+_STR_COLUMNS = ['lemma', 'form']
+
+# Column order defines bits in the column mask of a sentence.
+COLUMNS = (
+    [(name, 'B') for name, _ in _ENUM_COLUMNS]
+    + _INT_COLUMNS
+    + [(name, 's') for name in _STR_COLUMNS]
+)
+
+
+def _enum_table(enum_cls):
+    table: List[Any] = [None] * (max(enum_cls) + 1)
+    for v in enum_cls:
+        table[v] = v
+    return table
+
+
+_ENUM_TABLES = {name: _enum_table(enum_cls) for name, enum_cls in _ENUM_COLUMNS}
+
+_PHRASE_HAS_PREP_ID = 1
+_PHRASE_HAS_COSMETICS = 2
+
+
+class BinaryCodecError(RuntimeError):
+    pass
+
+
+# * Encoding
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.buf = bytearray()
+
+    def u8(self, v: int):
+        self.buf.append(v)
+
+    def u32(self, v: int):
+        self.buf += _U32.pack(v)
+
+    def i32(self, v: int):
+        self.buf += _I32.pack(v)
+
+    def ints(self, code: str, values: List[int]):
+        self.buf += struct.pack(f'<{len(values)}{code}', *values)
+
+    def raw(self, data: bytes):
+        self.u32(len(data))
+        self.buf += data
+
+    def string(self, s: str):
+        self.raw(s.encode('utf8'))
+
+    def strings(self, values: List[str]):
+        """Strings are stored as their char lengths and the single utf8 blob."""
+        self.ints('I', [len(s) for s in values])
+        self.raw(''.join(values).encode('utf8'))
+
+
+_COLUMNS_GETTER = operator.attrgetter(*(name for name, _ in COLUMNS))
+
+
+def _sent_columns(sent: lp_doc.Sent) -> List[Tuple[Any, ...]]:
+    """Columns in COLUMNS order; transposition is done by zip."""
+    if not len(sent):
+        return [() for _ in COLUMNS]
+    return list(zip(*map(_COLUMNS_GETTER, sent.words())))
+
+
+def _encode_column(w: _Writer, code: str, values: Tuple[Any, ...]):
+    if None in values:
+        w.u8(1)
+        w.buf += bytes(v is not None for v in values)
+        values = [v for v in values if v is not None]
+    else:
+        w.u8(0)
+    if code == 's':
+        w.strings(values)
+    else:
+        w.ints(code, values)
+
+
+def _encode_phrases(w: _Writer, phrases: List[Phrase]):
+    w.u32(len(phrases))
+    if not phrases:
+        return
+
+    flags = []
+    prep_ids = []
+    cosmetics = []
+    for p in phrases:
+        id_holder = p.get_id_holder()
+        f = 0
+        if id_holder._prep_id is not None:
+            f |= _PHRASE_HAS_PREP_ID
+            prep_ids.append(id_holder._prep_id)
+        head_mod = p.get_head_modifier()
+        repr_mods = p.get_repr_modifiers()
+        has_head_mod = head_mod is not None and (
+            head_mod.prep_modifier is not None or head_mod.repr_mod_suffix is not None
+        )
+        has_repr_mods = any(m is not None for m in repr_mods)
+        if has_head_mod or has_repr_mods:
+            f |= _PHRASE_HAS_COSMETICS
+            cosmetics.append(
+                [
+                    head_mod.prep_modifier if has_head_mod else None,
+                    head_mod.repr_mod_suffix if has_head_mod else None,
+                    (
+                        [
+                            (
+                                [(e.rel_pos, int(e.enh_type), e.value) for e in mod_list]
+                                if mod_list is not None
+                                else None
+                            )
+                            for mod_list in repr_mods
+                        ]
+                        if has_repr_mods
+                        else None
+                    ),
+                ]
+            )
+        flags.append(f)
+
+    pos_lists = [p.get_sent_pos_list() for p in phrases]
+    words_lists = [p.get_words() for p in phrases]
+    w.ints('I', [len(pl) for pl in pos_lists])
+    w.ints('I', [len(wl) for wl in words_lists])
+    w.ints('i', [p.get_head_pos() for p in phrases])
+    w.ints('B', [p.phrase_type for p in phrases])
+    w.ints('B', flags)
+    w.ints('Q', [p.get_id() for p in phrases])
+    w.ints('Q', prep_ids)
+    w.ints('i', [pos for pl in pos_lists for pos in pl])
+    w.ints('i', [d for p in phrases for d in p.get_deps()])
+    w.strings([word for wl in words_lists for word in wl])
+    w.raw(ujson.dumps(cosmetics).encode('utf8') if cosmetics else b'')
+
+
+def encode_sent(sent: lp_doc.Sent) -> bytes:
+    w = _Writer()
+    columns = _sent_columns(sent)
+    n_words = len(sent)
+    mask = 0
+    for bit, values in enumerate(columns):
+        if values.count(None) != n_words:
+            mask |= 1 << bit
+
+    has_bounds = sent.bounds is not None
+    w.buf += _SENT_HEADER.pack(n_words, int(has_bounds), mask)
+    if has_bounds:
+        assert sent.bounds is not None
+        w.buf += _I32x2.pack(*sent.bounds)
+
+    for bit, (_, code) in enumerate(COLUMNS):
+        if mask & (1 << bit):
+            _encode_column(w, code, columns[bit])
+
+    _encode_phrases(w, list(sent.phrases()))
+    return bytes(w.buf)
+
+
+def encode_doc(doc: lp_doc.Doc) -> bytes:
+    w = _Writer()
+    w.buf += _HEADER.pack(MAGIC, VERSION)
+
+    meta: Dict[str, Any] = {'id': doc.doc_id, 'ling_meta': doc.get_ling_meta()}
+    if doc.lang is not None:
+        meta['lang'] = int(doc.lang)
+    if doc.text_hash is not None:
+        meta['text_hash'] = doc.text_hash
+    w.raw(ujson.dumps(meta).encode('utf8'))
+
+    if doc.text is None:
+        w.i32(-1)
+    else:
+        text = doc.text.encode('utf8')
+        w.i32(len(text))
+        w.buf += text
+
+    fragments = doc.get_all_fragments()
+    w.u32(len(fragments))
+    for name, pairs in fragments.items():
+        w.string(name)
+        w.u32(len(pairs))
+        w.ints('i', [v for pair in pairs for v in pair])
+
+    encoded_sents = [encode_sent(s) for s in doc]
+    w.u32(len(encoded_sents))
+    offsets = [0]
+    for es in encoded_sents:
+        offsets.append(offsets[-1] + len(es))
+    w.ints('I', offsets)
+    for es in encoded_sents:
+        w.buf += es
+    return bytes(w.buf)
+
+
+# * Decoding
+
+
+class _Reader:
+    def __init__(self, buf, pos: int = 0) -> None:
+        self.buf = buf
+        self.pos = pos
+
+    def u8(self) -> int:
+        v = self.buf[self.pos]
+        self.pos += 1
+        return v
+
+    def u32(self) -> int:
+        (v,) = _U32.unpack_from(self.buf, self.pos)
+        self.pos += 4
+        return v
+
+    def i32(self) -> int:
+        (v,) = _I32.unpack_from(self.buf, self.pos)
+        self.pos += 4
+        return v
+
+    def ints(self, code: str, cnt: int) -> Tuple[int, ...]:
+        fmt = f'<{cnt}{code}'
+        values = struct.unpack_from(fmt, self.buf, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values
+
+    def raw(self):
+        size = self.u32()
+        data = self.buf[self.pos : self.pos + size]
+        self.pos += size
+        return data
+
+    def string(self) -> str:
+        return str(self.raw(), 'utf8')
+
+    def strings(self, cnt: int) -> List[str]:
+        lengths = self.ints('I', cnt)
+        blob = str(self.raw(), 'utf8')
+        values = []
+        pos = 0
+        for length in lengths:
+            values.append(blob[pos : pos + length])
+            pos += length
+        return values
+
+
+def _decode_column(r: _Reader, code: str, n_words: int) -> List[Any]:
+    mode = r.u8()
+    if mode == 1:
+        presence = bytes(r.buf[r.pos : r.pos + n_words])
+        r.pos += n_words
+        cnt = sum(presence)
+    else:
+        presence = None
+        cnt = n_words
+
+    values = r.strings(cnt) if code == 's' else r.ints(code, cnt)
+    if presence is None:
+        return list(values)
+
+    it = iter(values)
+    return [next(it) if present else None for present in presence]
+
+
+def _decode_phrases(r: _Reader) -> List[Phrase]:
+    n = r.u32()
+    if not n:
+        return []
+    sizes = r.ints('I', n)
+    words_cnts = r.ints('I', n)
+    head_positions = r.ints('i', n)
+    types = r.ints('B', n)
+    flags = r.ints('B', n)
+    ids = r.ints('Q', n)
+    prep_ids = iter(r.ints('Q', sum(1 for f in flags if f & _PHRASE_HAS_PREP_ID)))
+    positions = r.ints('i', sum(sizes))
+    deps = r.ints('i', sum(sizes))
+    words = r.strings(sum(words_cnts))
+    cosmetics_raw = r.raw()
+    cosmetics = iter(ujson.loads(bytes(cosmetics_raw)) if cosmetics_raw else [])
+
+    phrases = []
+    pos = 0
+    word_pos = 0
+    for i in range(n):
+        size = sizes[i]
+        id_holder = PhraseId()
+        id_holder._id = ids[i]
+        if flags[i] & _PHRASE_HAS_PREP_ID:
+            id_holder._prep_id = next(prep_ids)
+
+        head_modifier = HeadModifier()
+        repr_modifiers: List[Optional[List[ReprEnhancer]]] = [None] * size
+        if flags[i] & _PHRASE_HAS_COSMETICS:
+            prep_mod, repr_suffix, repr_mods = next(cosmetics)
+            head_modifier.prep_modifier = tuple(prep_mod) if prep_mod is not None else None
+            head_modifier.repr_mod_suffix = repr_suffix
+            if repr_mods is not None:
+                repr_modifiers = [
+                    (
+                        [ReprEnhancer(p, ReprEnhType(e), v) for p, e, v in mod_list]
+                        if mod_list is not None
+                        else None
+                    )
+                    for mod_list in repr_mods
+                ]
+
+        phrase = Phrase(
+            size=size,
+            head_pos=head_positions[i],
+            sent_pos_list=list(positions[pos : pos + size]),
+            words=words[word_pos : word_pos + words_cnts[i]],
+            deps=list(deps[pos : pos + size]),
+            id_holder=id_holder,
+            head_modifier=head_modifier,
+            repr_modifiers=repr_modifiers,
+        )
+        phrase.phrase_type = PhraseType(types[i])
+        phrases.append(phrase)
+        pos += size
+        word_pos += words_cnts[i]
+    return phrases
+
+
+def _decode_sent_header(r: _Reader):
+    n_words, has_bounds, mask = _SENT_HEADER.unpack_from(r.buf, r.pos)
+    r.pos += _SENT_HEADER.size
+    bounds = None
+    if has_bounds:
+        bounds = _I32x2.unpack_from(r.buf, r.pos)
+        r.pos += _I32x2.size
+    return n_words, bounds, mask
+
+
+def _decode_sent_columns(r: _Reader):
+    n_words, bounds, mask = _decode_sent_header(r)
+    columns: Dict[str, List[Any]] = {}
+    for bit, (name, code) in enumerate(COLUMNS):
+        if mask & (1 << bit):
+            columns[name] = _decode_column(r, code, n_words)
+    return n_words, bounds, columns
+
+
+def _skip_sent_columns(r: _Reader):
+    n_words, _, mask = _decode_sent_header(r)
+    for bit, (_, code) in enumerate(COLUMNS):
+        if not mask & (1 << bit):
+            continue
+        cnt = n_words
+        if r.u8() == 1:
+            cnt = sum(r.buf[r.pos : r.pos + n_words])
+            r.pos += n_words
+        if code == 's':
+            r.pos += 4 * cnt
+            blob_size = r.u32()
+            r.pos += blob_size
+        else:
+            r.pos += struct.calcsize(f'<{cnt}{code}')
+
+
+def _make_words(n_words: int, columns: Dict[str, List[Any]]) -> List[WordObj]:
+    words = [WordObj() for _ in range(n_words)]
+    for name, values in columns.items():
+        table = _ENUM_TABLES.get(name)
+        if table is not None:
+            for w, v in zip(words, values):
+                setattr(w, name, table[v] if v is not None else None)
+        else:
+            for w, v in zip(words, values):
+                setattr(w, name, v)
+    return words
+
+
+def decode_sent(buf, pos: int = 0, sent_cls=lp_doc.Sent) -> lp_doc.Sent:
+    r = _Reader(buf, pos)
+    n_words, bounds, columns = _decode_sent_columns(r)
+    words = _make_words(n_words, columns)
+    phrases = _decode_phrases(r)
+    return sent_cls(words, phrases, bounds)
+
+
+class DocHeader:
+    """Decoded document-level data and positions of encoded sentences."""
+
+    def __init__(self, doc: lp_doc.Doc, sents_begin: int, sent_offsets: Tuple[int, ...]) -> None:
+        self.doc = doc
+        self.sents_begin = sents_begin
+        self.sent_offsets = sent_offsets
+
+    def __len__(self) -> int:
+        return len(self.sent_offsets) - 1
+
+    def sent_pos(self, i: int) -> int:
+        return self.sents_begin + self.sent_offsets[i]
+
+
+def decode_header(buf) -> DocHeader:
+    """Decode everything except sentences."""
+    magic, version = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise BinaryCodecError("Not a pylp binary document")
+    if version != VERSION:
+        raise BinaryCodecError(f"Unsupported version of binary document: {version}")
+    r = _Reader(buf, _HEADER.size)
+    meta = ujson.loads(bytes(r.raw()))
+    lang = meta.get('lang')
+    doc = lp_doc.Doc(meta['id'], lang=common.Lang(lang) if lang is not None else None)
+    doc._ling_meta = meta['ling_meta']
+    doc._text_hash = meta.get('text_hash')
+
+    text_len = r.i32()
+    if text_len >= 0:
+        doc._text = str(buf[r.pos : r.pos + text_len], 'utf8')
+        r.pos += text_len
+
+    for _ in range(r.u32()):
+        name = r.string()
+        pairs_cnt = r.u32()
+        values = r.ints('i', pairs_cnt * 2)
+        doc.set_fragments(list(zip(values[::2], values[1::2])), name)
+
+    sents_cnt = r.u32()
+    sent_offsets = r.ints('I', sents_cnt + 1)
+    return DocHeader(doc, r.pos, sent_offsets)
+
+
+def _load_words(buf, pos: int) -> List[WordObj]:
+    n_words, _, columns = _decode_sent_columns(_Reader(buf, pos))
+    return _make_words(n_words, columns)
+
+
+def _load_phrases(buf, pos: int) -> List[Phrase]:
+    r = _Reader(buf, pos)
+    _skip_sent_columns(r)
+    return _decode_phrases(r)
+
+
+def decode_lazy_sent(buf, pos: int = 0) -> lp_doc.LazySent:
+    n_words, bounds, _ = _decode_sent_header(_Reader(buf, pos))
+    return lp_doc.LazySent(
+        functools.partial(_load_words, buf, pos),
+        functools.partial(_load_phrases, buf, pos),
+        n_words,
+        bounds,
+    )
+
+
+def decode_doc(buf, sent_cls=lp_doc.Sent, lazy: bool = False) -> lp_doc.Doc:
+    header = decode_header(buf)
+    doc = header.doc
+    for i in range(len(header)):
+        if lazy:
+            doc.add_sent(decode_lazy_sent(buf, header.sent_pos(i)))
+        else:
+            doc.add_sent(decode_sent(buf, header.sent_pos(i), sent_cls=sent_cls))
+    return doc
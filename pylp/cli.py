@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
 
 import argparse
+import glob
 import logging
+import queue
+import threading
+import time
 from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 from pylp.converter_conll_ud_v1 import ConverterConllUDV1
 from pylp import lp_doc
+from pylp.io import ShardedDocWriter
+from pylp.pipeline import Pipeline
 
 
 def convert_cli(args):
@@ -28,6 +35,88 @@ def convert_cli(args):
         print(doc)
 
 
+def find_input_prefixes(inputs: Iterable[str]) -> List[Path]:
+    """Return <prefix> for every <prefix>.txt file found in the directories
+    (recursively) or matched by the glob patterns."""
+    prefixes = []
+    for inp in inputs:
+        if Path(inp).is_dir():
+            paths = Path(inp).rglob('*.txt')
+        else:
+            paths = (Path(p) for p in glob.glob(inp, recursive=True))
+        prefixes.extend(sorted(p.with_suffix('') for p in paths if p.suffix == '.txt'))
+    return prefixes
+
+
+def _read_pair(prefix: Path) -> Tuple[lp_doc.Doc, Optional[str]]:
+    # Stems may contain dots, so suffixes are appended instead of with_suffix
+    text = prefix.with_name(prefix.name + '.txt').read_text(encoding='utf8')
+    conll_path = prefix.with_name(prefix.name + '.conll')
+    conll_text = conll_path.read_text(encoding='utf8') if conll_path.exists() else None
+    return lp_doc.Doc(str(prefix), text=text), conll_text
+
+
+def prefetch_pairs(
+    prefixes: List[Path], errors: List[str], queue_size: int = 64
+) -> Iterator[Tuple[lp_doc.Doc, Optional[str]]]:
+    """Read txt/conll pairs on a background thread. Pairs that can not be read
+    are reported to errors."""
+    pairs_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    done = object()
+
+    def reader():
+        try:
+            for prefix in prefixes:
+                try:
+                    pairs_queue.put(_read_pair(prefix))
+                except (OSError, UnicodeDecodeError) as ex:
+                    errors.append(f"{prefix}: {ex}")
+        finally:
+            pairs_queue.put(done)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    while (item := pairs_queue.get()) is not done:
+        yield item
+    thread.join()
+
+
+def batch_cli(args):
+    prefixes = find_input_prefixes(args.inputs)
+    logging.info("Found %d txt files", len(prefixes))
+
+    read_errors: List[str] = []
+    pipeline = Pipeline(
+        [('convert', {})],
+        processes=args.processes,
+        chunksize=args.chunksize,
+        skip_errors=True,
+        prefetch=args.prefetch,
+    )
+    last_report = time.monotonic()
+    with ShardedDocWriter(
+        args.output_dir, shard_size=args.shard_size, suffix=args.output_suffix
+    ) as writer:
+        pairs = prefetch_pairs(prefixes, read_errors, queue_size=args.read_ahead)
+        for doc in pipeline.process(pairs):
+            writer.write(doc)
+            if time.monotonic() - last_report >= args.report_every:
+                last_report = time.monotonic()
+                logging.info("%s, read errors: %d", pipeline.stats, len(read_errors))
+
+    errors = read_errors + pipeline.errors
+    logging.info(
+        "Done: %s, read errors: %d, shards: %d",
+        pipeline.stats,
+        len(read_errors),
+        len(writer.shards),
+    )
+    for error in errors[: args.max_errors_to_show]:
+        logging.error("%s", error)
+    if len(errors) > args.max_errors_to_show:
+        logging.error("... and %d more errors", len(errors) - args.max_errors_to_show)
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--verbose", "-v", action="store_true", default=False)
@@ -39,6 +128,19 @@ def main():
 
     prepare_convert.set_defaults(func=convert_cli)
 
+    batch = subparsers.add_parser('batch', help='convert many txt/conll pairs to JSONL shards')
+    batch.add_argument("inputs", nargs='+', help='directories or glob patterns of txt files')
+    batch.add_argument("--output_dir", "-o", required=True)
+    batch.add_argument("--processes", "-p", type=int, default=1)
+    batch.add_argument("--chunksize", type=int, default=4)
+    batch.add_argument("--prefetch", type=int, default=2, help='chunks per process submitted ahead')
+    batch.add_argument("--read_ahead", type=int, default=64, help='files read ahead')
+    batch.add_argument("--shard_size", type=int, default=10000)
+    batch.add_argument("--output_suffix", default='.jsonl.gz')
+    batch.add_argument("--report_every", type=float, default=30.0, help='seconds')
+    batch.add_argument("--max_errors_to_show", type=int, default=20)
+    batch.set_defaults(func=batch_cli)
+
     args = parser.parse_args()
 
     FORMAT = "%(asctime)s %(levelname)s: %(name)s: %(message)s"
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+
+import itertools
+import logging
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, overload
+
+from pylp import common
+from pylp.common import Attr
+from pylp.word_obj import WordObj
+from pylp.lp_doc import Sent
+from pylp.phrases.phrase import Phrase
+from pylp.utils import adjust_syntax_links_columns, new_positions_from_mask
+
+# Sentinels that are stored in columns instead of None.
+NONE_INT = -(2**31)
+NONE_ENUM = -1
+
+INT_FIELDS = ('offset', 'len', 'parent_offs')
+ENUM_FIELDS = {
+    'pos_tag': common.PosTag,
+    'synt_link': common.SyntLink,
+    'lang': common.Lang,
+    'number': common.WordNumber,
+    'gender': common.WordGender,
+    'case': common.WordCase,
+    'tense': common.WordTense,
+    'person': common.WordPerson,
+    'degree': common.WordDegree,
+    'aspect': common.WordAspect,
+    'voice': common.WordVoice,
+    'mood': common.WordMood,
+    'num_type': common.WordNumType,
+    'animacy': common.WordAnimacy,
+}
+COLUMN_FIELDS = INT_FIELDS + tuple(ENUM_FIELDS)
+
+_FIELD_ATTRS = {
+    'pos_tag': Attr.POS_TAG,
+    'offset': Attr.OFFSET,
+    'len': Attr.LENGTH,
+    'parent_offs': Attr.SYNTAX_PARENT,
+    'synt_link': Attr.SYNTAX_LINK_NAME,
+    'lang': Attr.LANG,
+    'number': Attr.NUMBER,
+    'gender': Attr.GENDER,
+    'case': Attr.CASE,
+    'tense': Attr.TENSE,
+    'person': Attr.PERSON,
+    'degree': Attr.DEGREE,
+    'aspect': Attr.ASPECT,
+    'voice': Attr.VOICE,
+    'mood': Attr.MOOD,
+    'num_type': Attr.NUM_TYPE,
+    'animacy': Attr.ANIMACY,
+}
+
+
+def _make_enum_table(enum_cls):
+    table: List[Any] = [None] * (max(enum_cls) + 1)
+    for v in enum_cls:
+        table[v] = v
+    return table
+
+
+_ENUM_TABLES = {name: _make_enum_table(enum_cls) for name, enum_cls in ENUM_FIELDS.items()}
+
+
+def _new_columns() -> Dict[str, array]:
+    columns = {name: array('i') for name in INT_FIELDS}
+    columns.update((name, array('b')) for name in ENUM_FIELDS)
+    return columns
+
+
+def _enum_property(name):
+    table = _ENUM_TABLES[name]
+
+    def getter(self):
+        v = self._sent._columns[name][self._pos]
+        return None if v == NONE_ENUM else table[v]
+
+    def setter(self, value):
+        self._sent._columns[name][self._pos] = NONE_ENUM if value is None else int(value)
+
+    return property(getter, setter)
+
+
+def _int_property(name):
+    def getter(self):
+        v = self._sent._columns[name][self._pos]
+        return None if v == NONE_INT else v
+
+    def setter(self, value):
+        self._sent._columns[name][self._pos] = NONE_INT if value is None else value
+
+    return property(getter, setter)
+
+
+def _list_property(attr_name):
+    def getter(self):
+        return getattr(self._sent, attr_name)[self._pos]
+
+    def setter(self, value):
+        getattr(self._sent, attr_name)[self._pos] = value
+
+    return property(getter, setter)
+
+
+class WordView(WordObj):
+    """Lightweight view of a word stored in ColumnarSent.
+
+    All reads and writes go directly to the columns of the sentence, so the
+    view can be passed to any code that expects WordObj.
+    """
+
+    __slots__ = ('_sent', '_pos')
+
+    def __init__(self, sent: "ColumnarSent", pos: int) -> None:
+        self._sent = sent
+        self._pos = pos
+
+    # Slots of WordObj are replaced with properties that read the columns.
+    # pyright checks them against the declared slot types, the types of the
+    # values are the same, so only these assignments are ignored.
+    lemma = _list_property('_lemmas')  # pyright: ignore[reportAssignmentType]
+    form = _list_property('_forms')  # pyright: ignore[reportAssignmentType]
+    _word_id = _list_property('_word_ids')  # pyright: ignore[reportAssignmentType]
+
+    offset = _int_property('offset')  # pyright: ignore[reportAssignmentType]
+    len = _int_property('len')  # pyright: ignore[reportAssignmentType]
+    parent_offs = _int_property('parent_offs')  # pyright: ignore[reportAssignmentType]
+
+    pos_tag = _enum_property('pos_tag')  # pyright: ignore[reportAssignmentType]
+    synt_link = _enum_property('synt_link')  # pyright: ignore[reportAssignmentType]
+    lang = _enum_property('lang')  # pyright: ignore[reportAssignmentType]
+    number = _enum_property('number')
+    gender = _enum_property('gender')
+    case = _enum_property('case')
+    tense = _enum_property('tense')
+    person = _enum_property('person')
+    degree = _enum_property('degree')
+    aspect = _enum_property('aspect')
+    voice = _enum_property('voice')
+    mood = _enum_property('mood')
+    num_type = _enum_property('num_type')
+    animacy = _enum_property('animacy')
+
+    @property
+    def extra(self) -> dict:
+        extras = self._sent._extras
+        extra = extras.get(self._pos)
+        if extra is None:
+            extra = {}
+            extras[self._pos] = extra
+        return extra
+
+    @extra.setter
+    def extra(self, extra: dict):
+        self._sent._extras[self._pos] = extra
+
+    def get_extra(self, key, default=None):
+        extra = self._sent._extras.get(self._pos)
+        if extra is None:
+            return default
+        return extra.get(key, default)
+
+    def has_extra(self) -> bool:
+        return bool(self._sent._extras.get(self._pos))
+
+
+class ColumnarSent(Sent):
+    """Sentence that stores word attributes in typed arrays (struct of arrays).
+
+    Numeric and enum attributes are kept in array.array columns, where None is
+    encoded with NONE_INT/NONE_ENUM sentinels. Lemmas, forms and word ids are
+    stored in plain lists. Words are exposed via WordView objects that are
+    created on demand.
+    """
+
+    def __init__(
+        self,
+        words: List[WordObj] | None = None,
+        phrases: List[Phrase] | None = None,
+        bounds: Tuple[int, int] | None = None,
+    ) -> None:
+        super().__init__(phrases=phrases, bounds=bounds)
+        self._columns: Dict[str, array] = _new_columns()
+        self._lemmas: List[Optional[str]] = []
+        self._forms: List[Optional[str]] = []
+        self._word_ids: List[Optional[int]] = []
+        # Aux per word dicts; allocated only for words that use them
+        self._extras: Dict[int, dict] = {}
+        if words is not None:
+            for w in words:
+                self.add_word(w)
+
+    # * Columns API
+
+    def column(self, name: str) -> array:
+        """Raw column with sentinels instead of None. See COLUMN_FIELDS."""
+        return self._columns[name]
+
+    def lemmas(self) -> List[Optional[str]]:
+        return self._lemmas
+
+    def forms(self) -> List[Optional[str]]:
+        return self._forms
+
+    def parent_offsets(self) -> List[Optional[int]]:
+        return [None if v == NONE_INT else v for v in self._columns['parent_offs']]
+
+    # * Sent API
+
+    def add_word(self, word_obj: WordObj):
+        columns = self._columns
+        for name in INT_FIELDS:
+            v = getattr(word_obj, name)
+            columns[name].append(NONE_INT if v is None else v)
+        for name in ENUM_FIELDS:
+            v = getattr(word_obj, name)
+            columns[name].append(NONE_ENUM if v is None else v)
+        self._lemmas.append(word_obj.lemma)
+        self._forms.append(word_obj.form)
+        self._word_ids.append(word_obj._word_id)
+        if word_obj.has_extra():
+            self._extras[len(self._lemmas) - 1] = word_obj.extra
+
+    def words(self) -> Iterator[WordObj]:
+        for i in range(len(self._lemmas)):
+            yield WordView(self, i)
+
+    def set_words(self, new_words: List[WordObj]):
+        if len(new_words) < len(self) and self._phrases:
+            logging.warning(
+                "New words has length < than old words. It may lead to the misaligning with phrases"
+            )
+        # new_words may contain views of this sentence, so fill new columns first
+        self._take_columns(ColumnarSent(new_words))
+
+    def _take_columns(self, other: "ColumnarSent"):
+        self._columns = other._columns
+        self._lemmas = other._lemmas
+        self._forms = other._forms
+        self._word_ids = other._word_ids
+        self._extras = other._extras
+        self._words = []
+
+    def filter_words(self, filter_list):
+        keep = []
+        for word_pos in range(len(self._lemmas)):
+            word_obj = WordView(self, word_pos)
+            keep.append(not any(filt(word_obj, word_pos, self) for filt in filter_list))
+        self.filter_words_by_mask(keep)
+
+    def filter_words_by_mask(self, keep: Sequence[bool]):
+        new_positions, new_len = new_positions_from_mask(keep)
+        if new_len < len(new_positions):
+            self._compact(keep, new_positions, new_len)
+            self._remap_phrases(new_positions)
+
+    def _compact(self, keep: Sequence[bool], new_positions: List[int], new_len: int):
+        kept = [old_pos for old_pos, new_pos in enumerate(new_positions) if new_pos != -1]
+        for name, col in self._columns.items():
+            self._columns[name] = array(col.typecode, itertools.compress(col, keep))
+        self._lemmas = list(itertools.compress(self._lemmas, keep))
+        self._forms = list(itertools.compress(self._forms, keep))
+        self._word_ids = list(itertools.compress(self._word_ids, keep))
+        self._extras = {
+            new_positions[p]: e for p, e in self._extras.items() if new_positions[p] != -1
+        }
+        assert len(self._lemmas) == new_len, "Logic error 3ac1"
+        adjust_syntax_links_columns(
+            self._columns['parent_offs'],
+            self._columns['synt_link'],
+            kept,
+            new_positions,
+            NONE_INT,
+        )
+
+    def __len__(self) -> int:
+        return len(self._lemmas)
+
+    def __iter__(self) -> Iterator[WordObj]:
+        return self.words()
+
+    @overload
+    def __getitem__(self, item: slice) -> List[WordObj]: ...
+
+    @overload
+    def __getitem__(self, item: int) -> WordObj: ...
+
+    def __getitem__(self, item: slice | int) -> List[WordObj] | WordObj:
+        size = len(self._lemmas)
+        if isinstance(item, slice):
+            return [WordView(self, i) for i in range(*item.indices(size))]
+        if item < 0:
+            item += size
+        if not 0 <= item < size:
+            raise IndexError("word index out of range")
+        return WordView(self, item)
+
+    def to_dict(self):
+        d = super().to_dict()
+        d['words'] = [WordView(self, i).to_dict() for i in range(len(self._lemmas))]
+        return d
+
+    @classmethod
+    def from_dict(cls, dic):
+        sent = cls(bounds=cls._bounds_from_dict(dic))
+        sent._fill_from_dicts(dic['words'])
+        if 'phrases' in dic:
+            sent._phrases = [Phrase.from_dict(pdic) for pdic in dic['phrases']]
+        return sent
+
+    def _fill_from_dicts(self, word_dicts):
+        n = len(word_dicts)
+        columns = self._columns
+        for name in INT_FIELDS:
+            key = _FIELD_ATTRS[name]
+            columns[name] = array(
+                'i', [NONE_INT if (v := wd.get(key)) is None else v for wd in word_dicts]
+            )
+        for name in ENUM_FIELDS:
+            key = _FIELD_ATTRS[name]
+            columns[name] = array(
+                'b', [NONE_ENUM if (v := wd.get(key)) is None else v for wd in word_dicts]
+            )
+        undef = common.PosTag.UNDEF
+        pos_col = columns['pos_tag']
+        for i in range(n):
+            if pos_col[i] == NONE_ENUM:
+                pos_col[i] = undef
+        self._lemmas = [wd.get(Attr.WORD_LEMMA) for wd in word_dicts]
+        self._forms = [wd.get(Attr.WORD_FORM) for wd in word_dicts]
+        self._word_ids = [wd.get(Attr.WORD_ID) for wd in word_dicts]
+
+    @classmethod
+    def from_sent(cls, sent: Sent) -> "ColumnarSent":
+        return cls(list(sent.words()), list(sent.phrases()), sent.bounds)
+
+    def to_sent(self) -> Sent:
+        """Materialize words as WordObj and return ordinary Sent."""
+        words = []
+        for pos, view in enumerate(self.words()):
+            word_obj = WordObj()
+            for name in COLUMN_FIELDS:
+                setattr(word_obj, name, getattr(view, name))
+            word_obj.lemma = view.lemma
+            word_obj.form = view.form
+            word_obj._word_id = view._word_id
+            if (extra := self._extras.get(pos)) is not None:
+                word_obj.extra = extra
+            words.append(word_obj)
+        return Sent(words, self._phrases, self.bounds)
@@ -1,10 +1,14 @@
+import enum
 import logging
 from io import StringIO
+from pathlib import Path
 import re
+from typing import IO, Iterable, Iterator, List, Mapping, Optional, Tuple
 
 from pylp import common
 from pylp import lp_doc
-from pylp.word_obj import WordObj
+from pylp.io import open_text
+from pylp.word_obj import MORPH_FIELDS, WordObj
 import pylp.phrases.builder
 
 # inspired by the code from isanlp
@@ -12,10 +16,16 @@ import pylp.phrases.builder
 
 
 class ConllFormatStreamParser:
-    """Parses annotations of a text document in CONLL-X format aquired from stream."""
+    """Parses annotations of a text document in CONLL-X format aquired from stream.
 
-    def __init__(self, string):
-        self._string_io = StringIO(string)
+    Accepts either a string or a text file object (any iterable of lines).
+    """
+
+    def __init__(self, string_or_file: str | Iterable[str]):
+        if isinstance(string_or_file, str):
+            self._string_io = StringIO(string_or_file)
+        else:
+            self._string_io = string_or_file
 
     def __iter__(self):
         sent = []
@@ -27,6 +37,38 @@ class ConllFormatStreamParser:
                 sent = []
             else:
                 sent.append(l.split('\t'))
+        if sent:
+            yield sent
+
+
+def _get_comment_value(conllu_sent, key: str) -> Optional[str]:
+    """Value of the comment '# key = value' (or '# key') before the first token."""
+    for row in conllu_sent:
+        line = row[0]
+        if not line.startswith('#'):
+            break
+        name, _, value = line[1:].partition('=')
+        if name.strip() == key:
+            return value.strip()
+    return None
+
+
+def _restore_sent_text(conllu_sent) -> str:
+    """Text of the sentence from '# text' comment or from forms of tokens."""
+    text = _get_comment_value(conllu_sent, 'text')
+    if text is not None:
+        return text
+    parts = []
+    for row in conllu_sent:
+        if row[0].startswith('#') or not row[0].isdigit():
+            continue
+        parts.append(row[ConverterConllUDV1.FORM])
+        if (
+            len(row) <= ConverterConllUDV1.MISC
+            or 'SpaceAfter=No' not in row[ConverterConllUDV1.MISC]
+        ):
+            parts.append(' ')
+    return ''.join(parts).rstrip()
 
 
 DEF_PHRASE_BUILDER_OPTS = pylp.phrases.builder.PhraseBuilderOpts()
@@ -119,9 +161,18 @@ def fill_morph_info(conllu_pos_tag: str, morph_str: str, word_obj: WordObj):
     _assign_morph_features(word_obj, morph_feats, word_obj.pos_tag)
 
 
-def fill_syntax_info(
-    word_pos, conllu_head: int | None, conllu_deprel: str, enh_deps: str, word_obj: WordObj
-):
+def parse_pos_tag(conllu_pos_tag: str, morph_str: str) -> common.PosTag:
+    """Same pos tag as fill_morph_info sets, FEATS are parsed only when they
+    may change the tag."""
+    adjusted_tags = (common.PosTag.VERB, common.PosTag.ADJ)
+    if len(morph_str) <= 2 or common.POS_TAG_DICT.get(conllu_pos_tag) not in adjusted_tags:
+        return convert_upos_tag(conllu_pos_tag, {})
+    morph_feats = dict(s.split('=') for s in morph_str.split('|'))
+    return convert_upos_tag(conllu_pos_tag, morph_feats)
+
+
+def parse_syntax_info(conllu_head: int | None, conllu_deprel: str, enh_deps: str):
+    """Return (1-based head, synt link) or (None, None)."""
     # TODO what to do with modificators?
     # flat:name
     # nsubj:pass
@@ -155,6 +206,12 @@ def fill_syntax_info(
         )
 
     if head is not None and rel is not None:
+        return head, rel
+    return None, None
+
+
+def _set_parent(word_pos, head, rel, word_obj: WordObj):
+    if head is not None:
         head -= 1
         if head != -1:
             word_obj.parent_offs = head - word_pos
@@ -164,6 +221,117 @@ def fill_syntax_info(
         word_obj.synt_link = rel
 
 
+def fill_syntax_info(
+    word_pos, conllu_head: int | None, conllu_deprel: str, enh_deps: str, word_obj: WordObj
+):
+    head, rel = parse_syntax_info(conllu_head, conllu_deprel, enh_deps)
+    _set_parent(word_pos, head, rel, word_obj)
+
+
+_MULTIWORD_ID_RE = re.compile(r'(\d+)[\.-](\d+)')
+_WHITESPACE_RE = re.compile(r'\s+')
+# Whitespace runs that differ from a single space
+_COLLAPSIBLE_WHITESPACE_RE = re.compile(r'\s{2,}|[^\S ]')
+
+
+class ConvFields(enum.IntFlag):
+    """Fields of WordObj that are filled by ConverterConllUDV1.
+
+    Conversion of the fields that are not requested is skipped (the fields
+    keep default values), e.g. with INDEX fields FEATS are not parsed and the
+    offsets of tokens are not searched in the text.
+    """
+
+    FORM = 1
+    LEMMA = 2
+    # pos_tag is always filled with MORPH, since it is adjusted by FEATS
+    POS = 4
+    MORPH = 8
+    # parent_offs and synt_link from HEAD and DEPREL
+    SYNTAX = 16
+    # prefer syntax links from the enhanced DEPS column
+    ENH_DEPS = 32
+    # offset and len
+    OFFSETS = 64
+
+    ALL = FORM | LEMMA | POS | MORPH | SYNTAX | ENH_DEPS | OFFSETS
+    # ENH_DEPS is needed to get the same syntax links as with ALL
+    INDEX = LEMMA | POS | SYNTAX | ENH_DEPS
+
+
+class TextAligner:
+    """Finds token forms in the text in a single forward pass.
+
+    There may be multiple spaces or newlines in a text, but they are replaced
+    with a single space in a form of a token. So whitespace runs of the text
+    are collapsed into single spaces once, and positions of the normalized
+    text are mapped back to the original text. Forms are normalized the same
+    way and searched with str.find from the end of the previous token.
+
+    If strict is False, forms that can not be found are recorded in unaligned
+    and get None offsets, otherwise RuntimeError is raised.
+    """
+
+    def __init__(self, text: str, strict: bool = False) -> None:
+        self._strict = strict
+        self._norm_text = text
+        self._cur_pos = 0
+        self.unaligned: List[str] = []
+
+        # Position i >= _breaks[k] of the normalized text is i + _shifts[k] in the original text
+        self._breaks: List[int] = []
+        self._shifts: List[int] = []
+        parts = []
+        prev = 0
+        shift = 0
+        for m in _COLLAPSIBLE_WHITESPACE_RE.finditer(text):
+            begin, end = m.span()
+            parts.append(text[prev:begin])
+            parts.append(' ')
+            self._breaks.append(begin + 1 - shift)
+            shift += end - begin - 1
+            self._shifts.append(shift)
+            prev = end
+        if parts:
+            parts.append(text[prev:])
+            self._norm_text = ''.join(parts)
+        # Sentinel
+        self._breaks.append(len(self._norm_text) + 1)
+
+        # Positions are not decreasing, so the current break only moves forward
+        self._break_idx = 0
+        self._shift = 0
+        self._next_break = self._breaks[0]
+
+    def _to_orig(self, pos: int) -> int:
+        while pos >= self._next_break:
+            self._shift = self._shifts[self._break_idx]
+            self._break_idx += 1
+            self._next_break = self._breaks[self._break_idx]
+        return pos + self._shift
+
+    def align(self, form: str) -> Tuple[Optional[int], Optional[int]]:
+        """Return (offset, length) of the form in the original text."""
+        if ' ' in form or not form.isprintable():
+            form = _WHITESPACE_RE.sub(' ', form)
+        idx = self._norm_text.find(form, self._cur_pos)
+        if idx == -1 or not form:
+            if self._strict:
+                raise RuntimeError(
+                    f"Failed to find form {form} in text: "
+                    f"{self._norm_text[self._cur_pos: self._cur_pos + 50]}"
+                )
+            self.unaligned.append(form)
+            return None, None
+
+        end = idx + len(form)
+        self._cur_pos = end
+        if end <= self._next_break:
+            return idx + self._shift, len(form)
+        begin = self._to_orig(idx)
+        return begin, self._to_orig(end - 1) + 1 - begin
+
+
 class ConverterConllUDV1:
     FORM = 1
     LEMMA = 2
@@ -172,86 +340,218 @@ class ConverterConllUDV1:
     HEAD = 6
     DEPREL = 7
     ENH_DEP = 8
+    MISC = 9
+
+    def __init__(
+        self,
+        max_cache_size: int = 100_000,
+        strict_alignment: bool = False,
+        fields: ConvFields = ConvFields.ALL,
+    ) -> None:
+        """Parsed (UPOS, FEATS) and (HEAD, DEPREL, DEPS) columns are cached,
+        each cache is cleared when it exceeds max_cache_size entries.
+        max_cache_size <= 0 disables caching.
+
+        If strict_alignment is False, tokens that are not found in the text get
+        None offsets and are listed in self.unaligned (sent no, word pos, form)
+        for the last converted doc. Otherwise RuntimeError is raised.
+
+        Only the requested fields of words are filled, see ConvFields.
+        """
+        self._max_cache_size = max_cache_size
+        self._strict_alignment = strict_alignment
+        fields = ConvFields(fields)
+        # IntFlag operations are slow, so flags are checked once here
+        self._need_form = bool(fields & ConvFields.FORM)
+        self._need_lemma = bool(fields & ConvFields.LEMMA)
+        self._need_pos = bool(fields & ConvFields.POS)
+        self._need_morph = bool(fields & ConvFields.MORPH)
+        self._need_syntax = bool(fields & ConvFields.SYNTAX)
+        self._need_enh_deps = bool(fields & ConvFields.ENH_DEPS)
+        self._need_offsets = bool(fields & ConvFields.OFFSETS)
+        self.unaligned: List[Tuple[int, int, str]] = []
+        # (upos, feats) -> (pos_tag, ((morph field, value), ...))
+        self._morph_cache: dict = {}
+        # (head, deprel, deps) -> (head, synt_link)
+        self._synt_cache: dict = {}
 
     def __call__(self, text, conll_raw_text, doc: lp_doc.Doc) -> lp_doc.Doc:
         """Performs conll text parsing.
 
         Args:
             text(str): text.
+            conll_raw_text: conll string or text file object.
 
         Returns:
         lp_doc.Doc
         """
-        offs_gen = self._offset_gen(text)
-        next(offs_gen)
         try:
-            for conllu_sent in ConllFormatStreamParser(conll_raw_text):
+            return self._fill_doc(text, ConllFormatStreamParser(conll_raw_text), doc)
+        except IndexError:
+            if isinstance(conll_raw_text, str):
+                logging.error('--------------------------------')
+                logging.error(conll_raw_text)
+                logging.error('--------------------------------')
+            raise
+
+    def iter_docs(
+        self,
+        conll_file: str | Path | IO,
+        texts: Optional[Mapping[str, str]] = None,
+    ) -> Iterator[lp_doc.Doc]:
+        """Converts a file with multiple documents separated by '# newdoc'
+        comments. Docs are yielded one by one, so only the current document is
+        kept in memory. Files with .gz suffix are decompressed.
+
+        Id of a doc is taken from '# newdoc id = ...' comment, otherwise it is
+        the ordinal number of the doc. The original text of a doc is looked up
+        in texts by doc id; if it is missing, the text is restored from '# text'
+        comments (or forms of tokens) of sentences joined by newlines.
+        """
+        if isinstance(conll_file, (str, Path)):
+            with open_text(conll_file) as f:
+                yield from self.iter_docs(f, texts)
+            return
+
+        doc_id: Optional[str] = None
+        doc_sents: List[list] = []
+        docs_cnt = 0
+        for conllu_sent in ConllFormatStreamParser(conll_file):
+            new_doc_id = _get_comment_value(conllu_sent, 'newdoc id')
+            is_new_doc = (
+                new_doc_id is not None or _get_comment_value(conllu_sent, 'newdoc') is not None
+            )
+            if is_new_doc and doc_sents:
+                yield self._make_doc(doc_id or str(docs_cnt), doc_sents, texts)
+                docs_cnt += 1
+                doc_sents = []
+            if is_new_doc:
+                doc_id = new_doc_id
+            doc_sents.append(conllu_sent)
+        if doc_sents:
+            yield self._make_doc(doc_id or str(docs_cnt), doc_sents, texts)
+
+    def _make_doc(self, doc_id: str, conllu_sents: List[list], texts: Optional[Mapping[str, str]]):
+        text = texts.get(doc_id) if texts is not None else None
+        if text is None:
+            text = '\n'.join(_restore_sent_text(s) for s in conllu_sents)
+        doc = lp_doc.Doc(doc_id, text=text)
+        return self._fill_doc(text, conllu_sents, doc)
+
+    def _fill_doc(self, text, conllu_sents, doc: lp_doc.Doc) -> lp_doc.Doc:
+        aligner = None
+        if self._need_offsets:
+            aligner = TextAligner(text, strict=self._strict_alignment)
+        self.unaligned = []
+        try:
+            for conllu_sent in conllu_sents:
                 sent = lp_doc.Sent()
 
                 for word in conllu_sent:
-                    if word[0].startswith('#') or re.match(r'(\d+)[\.-](\d+)', word[0]) is not None:
+                    word_id = word[0]
+                    if not word_id.isdigit() and (
+                        word_id.startswith('#') or _MULTIWORD_ID_RE.match(word_id) is not None
+                    ):
                         continue
                     word_obj = self._create_word_obj(len(sent), word)
 
-                    assert word_obj.form is not None, "not initialized form"
-                    # set offsets of a word in the text
-                    begin, length = offs_gen.send(word_obj.form)
-                    word_obj.offset = begin
-                    word_obj.len = length
+                    if aligner is not None:
+                        # set offsets of a word in the text
+                        form = word[self.FORM]
+                        begin, length = aligner.align(form)
+                        if begin is None:
+                            self.unaligned.append((len(doc), len(sent), form))
+                        word_obj.offset = begin
+                        word_obj.len = length
 
                     sent.add_word(word_obj)
                 doc.add_sent(sent)
 
         except IndexError as err:
             logging.error('Err: Index error: %s', err)
-            logging.error('--------------------------------')
-            logging.error(conll_raw_text)
-            logging.error('--------------------------------')
             raise
 
+        if self.unaligned:
+            logging.warning(
+                "Failed to find %d tokens in the text of the doc %s",
+                len(self.unaligned),
+                doc.doc_id,
+            )
         return doc
 
-    def _offset_gen(self, text: str):
-        def _special_cases(form, cur_pos):
-            # special case when space is in a token
-            # there may be multiple spaces or newlines in a text
-            # But they are replaced with a single space in a form of a token
-            form_reg = re.compile(re.escape(form).replace(r'\ ', r'\s+'))
-            if (match := form_reg.search(text, cur_pos)) is not None:
-                idx = match.start()
-                length = len(match.group())
-                return idx, length
-            return -1, -1
-
-        form = yield None, None
-        cur_pos = 0
-        while cur_pos < len(text):
-            if ' ' in form:
-                idx, length = _special_cases(form, cur_pos)
-            else:
-                idx = text.find(form, cur_pos)
-                length = len(form)
-            if idx == -1:
-                raise RuntimeError(
-                    f"Failed to find form {form} in text: {text[cur_pos: cur_pos+50]}"
-                )
-            cur_pos = idx + length
-            form = yield idx, length
-
     def _create_word_obj(self, pos, word):
         # pos_tag = convert_upos_tag(word[self.POSTAG])
+        if self._max_cache_size > 0:
+            return self._create_word_obj_cached(pos, word)
+
+        lemma = None
+        if self._need_lemma:
+            lemma = word[self.LEMMA].lower()
+            if lemma == '_':
+                lemma = ''
+        form = word[self.FORM] if self._need_form else None
+        word_obj = WordObj(lemma=lemma, form=form)
 
-        lemma = word[self.LEMMA].lower()
-        if lemma == '_':
-            lemma = ''
-        word_obj = WordObj(lemma=lemma, form=word[self.FORM])
+        if self._need_morph:
+            fill_morph_info(word[self.POSTAG], word[self.MORPH], word_obj)
+        elif self._need_pos:
+            word_obj.pos_tag = parse_pos_tag(word[self.POSTAG], word[self.MORPH])
 
-        fill_morph_info(word[self.POSTAG], word[self.MORPH], word_obj)
+        if self._need_syntax:
+            self._set_syntax(pos, word, word_obj)
 
-        self._set_syntax(pos, word, word_obj)
+        return word_obj
+
+    def _create_word_obj_cached(self, pos, word):
+        word_obj = WordObj._blank()
+        if self._need_lemma:
+            lemma = word[self.LEMMA].lower()
+            if lemma == '_':
+                lemma = ''
+            word_obj.lemma = lemma
+        if self._need_form:
+            word_obj.form = word[self.FORM]
+
+        if self._need_pos or self._need_morph:
+            morph_key = (word[self.POSTAG], word[self.MORPH])
+            morph = self._morph_cache.get(morph_key)
+            if morph is None:
+                if self._need_morph:
+                    morph = self._parse_morph(*morph_key)
+                else:
+                    morph = parse_pos_tag(*morph_key), ()
+                if len(self._morph_cache) >= self._max_cache_size:
+                    self._morph_cache.clear()
+                self._morph_cache[morph_key] = morph
+            word_obj.pos_tag, feats = morph
+            for name, value in feats:
+                setattr(word_obj, name, value)
+
+        if self._need_syntax:
+            synt_key = (word[self.HEAD], word[self.DEPREL], self._enh_deps(word))
+            synt = self._synt_cache.get(synt_key)
+            if synt is None:
+                head = synt_key[0]
+                synt = parse_syntax_info(None if head == '_' else int(head), *synt_key[1:])
+                if len(self._synt_cache) >= self._max_cache_size:
+                    self._synt_cache.clear()
+                self._synt_cache[synt_key] = synt
+            _set_parent(pos, *synt, word_obj)
 
         return word_obj
 
+    def _enh_deps(self, word) -> str:
+        return word[self.ENH_DEP] if self._need_enh_deps else '_'
+
+    @staticmethod
+    def _parse_morph(conllu_pos_tag: str, morph_str: str):
+        word_obj = WordObj()
+        fill_morph_info(conllu_pos_tag, morph_str, word_obj)
+        feats = tuple(
+            (name, value) for name in MORPH_FIELDS if (value := getattr(word_obj, name)) is not None
+        )
+        return word_obj.pos_tag, feats
+
     def _set_syntax(self, pos: int, word: tuple, word_obj: WordObj):
         head = word[self.HEAD]
         if head == '_':
@@ -259,4 +559,4 @@ class ConverterConllUDV1:
         else:
             head = int(head)
 
-        fill_syntax_info(pos, head, word[self.DEPREL], word[self.ENH_DEP], word_obj)
+        fill_syntax_info(pos, head, word[self.DEPREL], self._enh_deps(word), word_obj)
@@ -4,12 +4,14 @@
 
 import logging
 import functools
+from typing import Dict, List, Set
 
 from pylp.common import PosTag, SyntLink
 from pylp.common import Lang
 from pylp.common import STOP_WORD_POS_TAGS
 
 from pylp import lp_doc
+from pylp.columnar import ColumnarSent
 from pylp.word_obj import WordObj
 
 
@@ -22,16 +24,25 @@ class Filtratus:
             kinds = ['punct', 'determiner', 'common_aux', 'stopwords', 'num&undeflang']
         for k in kinds:
             self._filters[k] = create_filtratus(k, **filters_kwargs)
+        self._compiled = {}
+
+    def compile(self, kinds) -> "CompiledFilter":
+        key = tuple(kinds)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            filters = []
+            for k in kinds:
+                if k not in self._filters:
+                    raise RuntimeError("Filter %s is not loaded!" % k)
+                filters.append(self._filters[k])
+            compiled = CompiledFilter(filters)
+            self._compiled[key] = compiled
+        return compiled
 
     def __call__(self, text: str, doc_obj: lp_doc.Doc, kinds):
-        filters = []
-        for k in kinds:
-            if k not in self._filters:
-                raise RuntimeError("Filter %s is not loaded!" % k)
-            filters.append(self._filters[k])
-
+        compiled = self.compile(kinds)
         for sent in doc_obj:
-            sent.filter_words(filters)
+            compiled.filter_sent(sent)
 
 
 def create_filter_by_pos_tags(sw_pos_tags):
@@ -48,6 +59,11 @@ class AbcFilter:
     def filter(self, word_obj: WordObj, word_pos: int, sent: lp_doc.Sent):
         raise NotImplementedError("ABC")
 
+    def compile(self, rules: "FilterRules") -> bool:
+        """Add the filter conditions to rules. Return False if the filter can not
+        be expressed via rules and should be called for every word."""
+        return False
+
     def __call__(self, word_obj: WordObj, word_pos: int, sent: lp_doc.Sent) -> bool:
         return self.filter(word_obj, word_pos, sent)
 
@@ -58,6 +74,10 @@ class PunctAndUndefFiltratus(AbcFilter):
     def filter(self, word_obj: WordObj, word_pos: int, sent: lp_doc.Sent):
         return word_obj.pos_tag in (PosTag.UNDEF, PosTag.PUNCT, PosTag.X)
 
+    def compile(self, rules: "FilterRules") -> bool:
+        rules.banned_pos.update((PosTag.UNDEF, PosTag.PUNCT, PosTag.X))
+        return True
+
 
 class DeterminatusFiltratus(AbcFilter):
     name = 'determiner'
@@ -65,6 +85,10 @@ class DeterminatusFiltratus(AbcFilter):
     def filter(self, word_obj: WordObj, word_pos: int, sent: lp_doc.Sent):
         return word_obj.pos_tag == PosTag.DET
 
+    def compile(self, rules: "FilterRules") -> bool:
+        rules.banned_pos.add(PosTag.DET)
+        return True
+
 
 class CommonAuxFiltratus(AbcFilter):
     name = 'common_aux'
@@ -79,6 +103,11 @@ class CommonAuxFiltratus(AbcFilter):
             word_obj.synt_link == SyntLink.COP
         )
 
+    def compile(self, rules: "FilterRules") -> bool:
+        rules.banned_pos_lemmas.setdefault(PosTag.AUX, set()).update(self._common_aux)
+        rules.banned_links.add(SyntLink.COP)
+        return True
+
 
 class StopWordsFiltratus(AbcFilter):
     name = 'stopwords'
@@ -115,6 +144,15 @@ class StopWordsFiltratus(AbcFilter):
 
         return False
 
+    def compile(self, rules: "FilterRules") -> bool:
+        if rules.sw_pos or rules.sw_lemmas or rules.sw_white_list:
+            # The white list is applied only to its own stopwords
+            return False
+        rules.sw_pos.update(self._sw_pos_tags)
+        rules.sw_lemmas.update(self._stop_words)
+        rules.sw_white_list.update(self._white_list)
+        return True
+
 
 class NumAndUndefLangFiltratus(AbcFilter):
     name = 'num&undeflang'
@@ -122,6 +160,92 @@ class NumAndUndefLangFiltratus(AbcFilter):
     def filter(self, word_obj: WordObj, word_pos: int, sent: lp_doc.Sent):
         return word_obj.lang == Lang.UNDEF or word_obj.pos_tag == PosTag.NUM
 
+    def compile(self, rules: "FilterRules") -> bool:
+        rules.banned_langs.add(Lang.UNDEF)
+        rules.banned_pos.add(PosTag.NUM)
+        return True
+
+
+class FilterRules:
+    """Conditions that filters add in AbcFilter.compile."""
+
+    def __init__(self) -> None:
+        self.banned_pos: Set[PosTag] = set()
+        self.banned_links: Set[SyntLink] = set()
+        self.banned_langs: Set[Lang] = set()
+        self.banned_pos_lemmas: Dict[PosTag, Set[str]] = {}
+        self.sw_pos: Set[PosTag] = set()
+        self.sw_lemmas: Set[str] = set()
+        self.sw_white_list: Set[str] = set()
+
+
+class CompiledFilter:
+    """Combines the list of filters into a single set of rules.
+
+    A word is removed if its PoS tag, syntax link or language is banned, its
+    lemma is banned for its PoS tag or it is a stopword that is not in the
+    white list. Filters that can not be compiled are called for the
+    remaining words. The result of the filtering is the same as of
+    sent.filter_words(filters).
+    """
+
+    def __init__(self, filters) -> None:
+        rules = FilterRules()
+        self._callables = [
+            f for f in filters if not (isinstance(f, AbcFilter) and f.compile(rules))
+        ]
+        # Enums are stored as ints, so the same rules are applied to columns of ColumnarSent
+        self.banned_pos = frozenset(int(p) for p in rules.banned_pos)
+        self.banned_links = frozenset(int(l) for l in rules.banned_links)
+        self.banned_langs = frozenset(int(l) for l in rules.banned_langs)
+        self.banned_pos_lemmas = {int(p): frozenset(l) for p, l in rules.banned_pos_lemmas.items()}
+        self.sw_pos = frozenset(int(p) for p in rules.sw_pos)
+        self.sw_lemmas = frozenset(rules.sw_lemmas)
+        self.sw_white_list = frozenset(rules.sw_white_list)
+
+    def _keep(self, pos_tag, synt_link, lang, lemma) -> bool:
+        if (
+            pos_tag in self.banned_pos
+            or synt_link in self.banned_links
+            or lang in self.banned_langs
+        ):
+            return False
+        if (lemmas := self.banned_pos_lemmas.get(pos_tag)) is not None and lemma in lemmas:
+            return False
+        if (pos_tag in self.sw_pos or lemma in self.sw_lemmas) and lemma not in self.sw_white_list:
+            return False
+        return True
+
+    def keep_mask(self, sent: lp_doc.Sent) -> List[bool]:
+        """keep_mask[pos] is False if the word should be removed."""
+        if isinstance(sent, ColumnarSent):
+            keep = list(
+                map(
+                    self._keep,
+                    sent.column('pos_tag'),
+                    sent.column('synt_link'),
+                    sent.column('lang'),
+                    sent.lemmas(),
+                )
+            )
+        else:
+            keep = [self._keep(w.pos_tag, w.synt_link, w.lang, w.lemma) for w in sent]
+
+        if self._callables:
+            for pos, k in enumerate(keep):
+                if k:
+                    word_obj = sent[pos]
+                    keep[pos] = not any(f(word_obj, pos, sent) for f in self._callables)
+        return keep
+
+    def filter_sent(self, sent: lp_doc.Sent):
+        sent.filter_words_by_mask(self.keep_mask(sent))
+
+    def __call__(self, word_obj: WordObj, word_pos: int, sent: lp_doc.Sent) -> bool:
+        if not self._keep(word_obj.pos_tag, word_obj.synt_link, word_obj.lang, word_obj.lemma):
+            return True
+        return any(f(word_obj, word_pos, sent) for f in self._callables)
+
 
 def create_filtratus(kind='', **kwargs):
     if kind == PunctAndUndefFiltratus.name:
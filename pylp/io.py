@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+"""Streaming reading and writing of Doc objects in JSONL format.
+
+Every line of a file is a single Doc.to_dict() object. Files with .gz suffix
+are transparently (de)compressed.
+"""
+
+import gzip
+import logging
+from pathlib import Path
+from typing import Callable, IO, Iterable, Iterator, Optional
+
+import ujson
+
+from pylp import lp_doc
+
+RecordFilterType = Callable[[dict], bool]
+
+
+def open_text(path: str | Path, mode: str = 'rt') -> IO:
+    """Open file in text mode; use gzip if the path has .gz suffix."""
+    if 'b' in mode:
+        raise ValueError("Only text modes are supported")
+    if 't' not in mode:
+        mode += 't'
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf8')
+    return open(path, mode, encoding='utf8')
+
+
+def by_ids(ids: Iterable[str]) -> RecordFilterType:
+    """Filter that keeps only records with specified doc ids."""
+    ids_set = frozenset(ids)
+    return lambda record: record['id'] in ids_set
+
+
+def by_text_hashes(text_hashes: Iterable[str]) -> RecordFilterType:
+    """Filter that keeps only records with specified text hashes."""
+    hashes_set = frozenset(text_hashes)
+    return lambda record: record.get('text_hash') in hashes_set
+
+
+def read_records(
+    path_or_file: str | Path | IO, record_filter: Optional[RecordFilterType] = None
+) -> Iterator[dict]:
+    """Yield raw doc dicts. Records for which record_filter returns False are skipped."""
+    if isinstance(path_or_file, (str, Path)):
+        with open_text(path_or_file) as f:
+            yield from read_records(f, record_filter)
+        return
+
+    for line_no, line in enumerate(path_or_file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = ujson.loads(line)
+        except ValueError as ex:
+            logging.error("Failed to parse line %d: %s", line_no, ex)
+            raise
+        if record_filter is None or record_filter(record):
+            yield record
+
+
+def read_docs(
+    path_or_file: str | Path | IO,
+    record_filter: Optional[RecordFilterType] = None,
+    sent_cls: type[lp_doc.Sent] = lp_doc.Sent,
+    lazy: bool = False,
+) -> Iterator[lp_doc.Doc]:
+    """Yield docs one by one. record_filter is applied to raw dicts, so
+    skipped records are never converted to Doc. See Doc.from_dict for the
+    description of other args."""
+    for record in read_records(path_or_file, record_filter):
+        yield lp_doc.Doc.from_dict(record, sent_cls=sent_cls, lazy=lazy)
+
+
+class DocWriter:
+    """Writes docs as JSONL. Docs are serialized immediately, but lines are
+    written to the file by batches of batch_size."""
+
+    def __init__(self, path_or_file: str | Path | IO, batch_size: int = 100) -> None:
+        if batch_size <= 0:
+            raise RuntimeError(f"Invalid batch size: {batch_size}")
+        self._own_file = isinstance(path_or_file, (str, Path))
+        self._file: IO = (
+            open_text(path_or_file, 'wt') if self._own_file else path_or_file  # type: ignore
+        )
+        self._batch_size = batch_size
+        self._batch: list[str] = []
+        self.docs_cnt = 0
+
+    def write(self, doc: lp_doc.Doc):
+        self._batch.append(ujson.dumps(doc.to_dict(), ensure_ascii=False))
+        self.docs_cnt += 1
+        if len(self._batch) >= self._batch_size:
+            self.flush()
+
+    def write_many(self, docs: Iterable[lp_doc.Doc]):
+        for doc in docs:
+            self.write(doc)
+
+    def flush(self):
+        if self._batch:
+            self._batch.append('')
+            self._file.write('\n'.join(self._batch))
+            self._batch = []
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        if self._own_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ShardedDocWriter:
+    """Writes docs to <output_dir>/<prefix>-<shard_no><suffix> files with at
+    most shard_size docs per file."""
+
+    def __init__(
+        self,
+        output_dir: str | Path,
+        shard_size: int = 10000,
+        prefix: str = 'docs',
+        suffix: str = '.jsonl.gz',
+        batch_size: int = 100,
+    ) -> None:
+        if shard_size <= 0:
+            raise RuntimeError(f"Invalid shard size: {shard_size}")
+        self._output_dir = Path(output_dir)
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        self._shard_size = shard_size
+        self._prefix = prefix
+        self._suffix = suffix
+        self._batch_size = batch_size
+        self._writer: Optional[DocWriter] = None
+        self.shards: list[Path] = []
+        self.docs_cnt = 0
+
+    def write(self, doc: lp_doc.Doc):
+        if self._writer is None or self._writer.docs_cnt >= self._shard_size:
+            self._next_shard()
+        assert self._writer is not None
+        self._writer.write(doc)
+        self.docs_cnt += 1
+
+    def _next_shard(self):
+        if self._writer is not None:
+            self._writer.close()
+        path = self._output_dir / f'{self._prefix}-{len(self.shards):05d}{self._suffix}'
+        self.shards.append(path)
+        self._writer = DocWriter(path, batch_size=self._batch_size)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_docs(
+    path_or_file: str | Path | IO, docs: Iterable[lp_doc.Doc], batch_size: int = 100
+) -> int:
+    """Write all docs and return their number."""
+    with DocWriter(path_or_file, batch_size=batch_size) as writer:
+        writer.write_many(docs)
+        return writer.docs_cnt
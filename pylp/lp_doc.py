@@ -1,16 +1,17 @@
 #!/usr/bin/env python3
 
+import functools
 import hashlib
+import itertools
 import logging
-from typing import Any, overload, Optional, Iterator, List, Tuple, Dict
-
-import libpyexbase
+from typing import Any, Callable, overload, Optional, Iterator, List, Sequence, Tuple, Dict
 
 from pylp import common
+from pylp import word_id_cache
 
-from pylp.word_obj import WordObj
+from pylp.word_obj import WordObj, words_from_dicts
 from pylp.phrases.phrase import Phrase, PhraseType
-from pylp.utils import adjust_syntax_links
+from pylp.utils import adjust_syntax_links, new_positions_from_mask
 
 
 class Sent:
@@ -64,36 +65,35 @@ class Sent:
         self._phrases = phrases
 
     def filter_words(self, filter_list):
-        new_words = []
-        new_positions = []
-        cur_pos = 0
-        for word_pos, word_obj in enumerate(self._words):
-            for filt in filter_list:
-                if filt(word_obj, word_pos, self):
-                    new_positions.append(-1)
-                    break
-            else:
-                new_words.append(word_obj)
-                new_positions.append(cur_pos)
-                cur_pos += 1
-
-        if len(new_words) < len(new_positions):
-            adjust_syntax_links(new_words, new_positions)
-            self._delete_dangling_phrases(new_positions)
-            for phrase in self.phrases(with_mwe=True):
-                self._fix_sent_pos_in_phrase(phrase, new_positions)
+        """Remove words for which any filter from filter_list returns True."""
+        keep = [
+            not any(filt(word_obj, word_pos, self) for filt in filter_list)
+            for word_pos, word_obj in enumerate(self)
+        ]
+        self.filter_words_by_mask(keep)
+
+    def filter_words_by_mask(self, keep: Sequence[bool]):
+        """Remove words for which keep[pos] is False. Syntax links and
+        positions of phrases are adjusted, phrases with removed words are deleted."""
+        new_positions, new_len = new_positions_from_mask(keep)
+        if new_len == len(new_positions):
+            return
+        new_words = list(itertools.compress(self._words, keep))
+        adjust_syntax_links(new_words, new_positions)
+        self._remap_phrases(new_positions)
         self._words = new_words
 
-    def _delete_dangling_phrases(self, new_positions):
+    def _remap_phrases(self, new_positions: List[int]):
         new_phrases = []
         for phrase in self._phrases:
-            if all(new_positions[p] != -1 for p in phrase.get_sent_pos_list()):
+            pos_list = [new_positions[p] for p in phrase.get_sent_pos_list()]
+            if -1 not in pos_list:
+                phrase.set_sent_pos_list(pos_list)
                 new_phrases.append(phrase)
         self._phrases = new_phrases
 
-    def _fix_sent_pos_in_phrase(self, phrase, new_positions):
-        pos_list = [new_positions[p] for p in phrase.get_sent_pos_list()]
-        phrase.set_sent_pos_list(pos_list)
+    def parent_offsets(self) -> List[Optional[int]]:
+        return [w.parent_offs for w in self._words]
 
     def __len__(self) -> int:
         return len(self._words)
@@ -127,18 +127,17 @@ class Sent:
 
         return d
 
+    @staticmethod
+    def _bounds_from_dict(dic) -> Tuple[int, int] | None:
+        # bounds are a list after JSON
+        bounds = dic.get('bounds')
+        return (bounds[0], bounds[1]) if bounds is not None else None
+
     @classmethod
     def from_dict(cls, dic):
-        words = []
-        for wdic in dic['words']:
-            words.append(WordObj.from_dict(wdic))
-        phrases = []
-        if 'phrases' in dic:
-            for pdic in dic['phrases']:
-                phrases.append(Phrase.from_dict(pdic))
-
-        bounds = dic.get('bounds')
-        return cls(words, phrases, bounds)
+        words = words_from_dicts(dic['words'])
+        phrases = _phrases_from_dicts(dic.get('phrases'))
+        return cls(words, phrases, cls._bounds_from_dict(dic))
 
     def __str__(self) -> str:
         s = ''
@@ -147,7 +146,7 @@ class Sent:
 
         s += 'Words:\n'
         words_s = []
-        for i, w in enumerate(self._words):
+        for i, w in enumerate(self.words()):
             words_s.append(f"Word #{i}: {w}\n")
 
         phrases_s = []
@@ -168,6 +167,78 @@ class Sent:
         return ''.join([s] + words_s + mwes_l + phrases_s)
 
 
+def _phrases_from_dicts(phrase_dicts) -> List[Phrase]:
+    phrases = []
+    if phrase_dicts:
+        for pdic in phrase_dicts:
+            phrases.append(Phrase.from_dict(pdic))
+    return phrases
+
+
+class LazySent(Sent):
+    """Sent that keeps raw payloads and materializes words and phrases on first access.
+
+    Loaders are callables that return the list of words (phrases). Each loader
+    is called at most once, after that LazySent behaves like ordinary Sent.
+    """
+
+    def __init__(
+        self,
+        words_loader: Callable[[], List[WordObj]],
+        phrases_loader: Callable[[], List[Phrase]],
+        size: int,
+        bounds: Tuple[int, int] | None = None,
+    ) -> None:
+        # Do not call Sent.__init__, it would assign empty words and phrases.
+        self._words_loader: Optional[Callable[[], List[WordObj]]] = words_loader
+        self._phrases_loader: Optional[Callable[[], List[Phrase]]] = phrases_loader
+        self._loaded_words: List[WordObj] = []
+        self._loaded_phrases: List[Phrase] = []
+        self._size = size
+        self.bounds = bounds
+
+    @property
+    def _words(self) -> List[WordObj]:
+        if self._words_loader is not None:
+            self._loaded_words = self._words_loader()
+            self._words_loader = None
+        return self._loaded_words
+
+    @_words.setter
+    def _words(self, words: List[WordObj]):
+        self._words_loader = None
+        self._loaded_words = words
+
+    @property
+    def _phrases(self) -> List[Phrase]:
+        if self._phrases_loader is not None:
+            self._loaded_phrases = self._phrases_loader()
+            self._phrases_loader = None
+        return self._loaded_phrases
+
+    @_phrases.setter
+    def _phrases(self, phrases: List[Phrase]):
+        self._phrases_loader = None
+        self._loaded_phrases = phrases
+
+    def is_materialized(self) -> bool:
+        return self._words_loader is None and self._phrases_loader is None
+
+    def __len__(self) -> int:
+        if self._words_loader is not None:
+            return self._size
+        return len(self._loaded_words)
+
+    @classmethod
+    def from_dict(cls, dic):
+        return cls(
+            functools.partial(words_from_dicts, dic['words']),
+            functools.partial(_phrases_from_dicts, dic.get('phrases')),
+            len(dic['words']),
+            cls._bounds_from_dict(dic),
+        )
+
+
 FragmentType = List[Tuple[int, int]]
 
 
@@ -300,7 +371,13 @@ class Doc:
         return d
 
     @classmethod
-    def from_dict(cls, dic):
+    def from_dict(cls, dic, sent_cls: type[Sent] = Sent, lazy: bool = False):
+        """Pass sent_cls=columnar.ColumnarSent to store words in typed arrays.
+        If lazy is True, sentences are LazySent objects that decode their
+        words and phrases only when they are accessed.
+        """
+        if lazy:
+            sent_cls = LazySent
         doc = cls(dic['id'], lang=dic.get('lang'))
         text = None
         text_hash = None
@@ -311,14 +388,32 @@ class Doc:
         doc._text = text
         doc._text_hash = text_hash
         if 'fragments' in dic:
-            doc._fragments = dic['fragments']
+            # Pairs are lists after JSON
+            doc._fragments = {
+                name: [(begin, end) for begin, end in pairs]
+                for name, pairs in dic['fragments'].items()
+            }
         if 'ling_meta' in dic:
             doc._ling_meta = dic['ling_meta']
 
         for sdic in dic['sents']:
-            doc.add_sent(Sent.from_dict(sdic))
+            doc.add_sent(sent_cls.from_dict(sdic))
         return doc
 
+    def to_bytes(self) -> bytes:
+        """Encode the doc with compact binary format. See pylp.binary_codec."""
+        from pylp import binary_codec
+
+        return binary_codec.encode_doc(self)
+
+    @classmethod
+    def from_bytes(cls, buf, sent_cls: type[Sent] = Sent, lazy: bool = False) -> "Doc":
+        """See from_dict for the description of arguments. In lazy mode buf
+        should stay unchanged while the doc is used."""
+        from pylp import binary_codec
+
+        return binary_codec.decode_doc(buf, sent_cls=sent_cls, lazy=lazy)
+
     def __str__(self) -> str:
         s = f"Doc: {self.doc_id}; "
         if self.lang is not None:
@@ -350,9 +445,7 @@ def assign_word_ids_and_word_langs(doc_objects: list[Doc]):
         unique_lemmas.update(w.lemma.lower() for s in doc_obj for w in s if w.lemma is not None)
 
     unique_lemmas = list(unique_lemmas)
-    word_ids, word_langs = libpyexbase.calc_word_ids_and_langs(unique_lemmas, True)
-
-    il_dict = {l: (i, la) for l, i, la in zip(unique_lemmas, word_ids, word_langs)}
+    il_dict = dict(zip(unique_lemmas, word_id_cache.get_word_ids_and_langs(unique_lemmas)))
     for doc_obj in doc_objects:
         doc_obj.add_ling_prop('word_lang_detected')
         for sent in doc_obj:
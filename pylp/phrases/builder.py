@@ -1,10 +1,14 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-import math
 import logging
 import copy
-from typing import Iterator, List, Optional, FrozenSet, Any, cast
+import heapq
+import bisect
+import itertools
+from array import array
+from concurrent.futures import Executor
+from typing import Callable, Iterator, List, Mapping, Optional, FrozenSet, Any, cast
 import collections
 from collections.abc import Iterable
 
@@ -12,54 +16,30 @@ import pylp.common as lp
 from pylp import lp_doc
 from pylp.word_obj import WordObj
 
-from pylp.phrases.phrase import Phrase, PhraseType, ReprEnhancer, ReprEnhType
+from pylp.phrases.phrase import (
+    HeadModifier,
+    Phrase,
+    PhraseId,
+    PhraseIdMemo,
+    PhraseType,
+    ReprEnhancer,
+    ReprEnhType,
+    positions_mask,
+)
 
 # * Builder helpers
 
 
-def _sorted_lists_intersect(li1, li2):
-    i = j = 0
-    while i < len(li1) and j < len(li2):
-        if li1[i] < li2[j]:
-            i += 1
-        elif li2[j] < li1[i]:
-            j += 1
-        else:
-            return True
-
-    return False
-
-
-def _create_phrase_sent_pos_list(head_phrase: Phrase, other_phrase: Phrase):
+def _create_phrase_sent_pos_list(head_phrase: Phrase, other_phrase: Phrase, new_mask: int):
+    """Positions of the merged phrase and new positions of head and other
+    phrases parts in it. new_mask is the union of positions masks of the phrases,
+    a new position is the number of positions before it in the mask."""
     head_pos_list = head_phrase.get_sent_pos_list()
     other_pos_list = other_phrase.get_sent_pos_list()
 
-    new_pos_list = []
-    new_head_pos_list: list[int] = [-1] * len(head_pos_list)
-    new_other_pos: list[int] = [-1] * len(other_pos_list)
-    i = j = 0
-    while i < len(head_pos_list) and j < len(other_pos_list):
-        if head_pos_list[i] < other_pos_list[j]:
-            new_head_pos_list[i] = len(new_pos_list)
-            new_pos_list.append(head_pos_list[i])
-            i += 1
-        elif other_pos_list[j] < head_pos_list[i]:
-            new_other_pos[j] = len(new_pos_list)
-            new_pos_list.append(other_pos_list[j])
-            j += 1
-        else:
-            raise RuntimeError(
-                'trying to merge phrase with the same word: '
-                f'head={head_phrase}; other={other_phrase}'
-            )
-    while i < len(head_pos_list):
-        new_head_pos_list[i] = len(new_pos_list)
-        new_pos_list.append(head_pos_list[i])
-        i += 1
-    while j < len(other_pos_list):
-        new_other_pos[j] = len(new_pos_list)
-        new_pos_list.append(other_pos_list[j])
-        j += 1
+    new_pos_list = sorted(head_pos_list + other_pos_list)
+    new_head_pos_list = [(new_mask & ((1 << p) - 1)).bit_count() for p in head_pos_list]
+    new_other_pos = [(new_mask & ((1 << p) - 1)).bit_count() for p in other_pos_list]
     return new_pos_list, new_head_pos_list, new_other_pos
 
 
@@ -118,16 +98,27 @@ def make_new_phrase(head_phrase: Phrase, other_phrase: Phrase, sent: lp_doc.Sent
     if not _is_new_phrase_valid(head_phrase, other_phrase, sent):
         return None
 
+    head_mask = head_phrase.get_sent_pos_mask()
+    other_mask = other_phrase.get_sent_pos_mask()
+    if head_mask & other_mask:
+        raise RuntimeError(
+            'trying to merge phrase with the same word: '
+            f'head={head_phrase}; other={other_phrase}'
+        )
+    new_mask = head_mask | other_mask
+    if new_mask in phrases_cache:
+        return None
+    phrases_cache.add(new_mask)
+
+    return _merge_phrases(head_phrase, other_phrase, sent, new_mask)
+
+
+def _merge_phrases(head_phrase: Phrase, other_phrase: Phrase, sent: lp_doc.Sent, new_mask: int):
     new_pos_list, new_head_pos_list, new_other_pos_list = _create_phrase_sent_pos_list(
-        head_phrase, other_phrase
+        head_phrase, other_phrase, new_mask
     )
     new_head_pos = new_head_pos_list[head_phrase.get_head_pos()]
 
-    t = tuple(new_pos_list)
-    if t in phrases_cache:
-        return None
-    phrases_cache.add(t)
-
     deps = [0] * len(new_pos_list)
     _adjust_deps(new_head_pos_list, head_phrase.get_deps(), deps)
     _adjust_deps(new_other_pos_list, other_phrase.get_deps(), deps)
@@ -162,6 +153,7 @@ def make_new_phrase(head_phrase: Phrase, other_phrase: Phrase, sent: lp_doc.Sent
         id_holder=id_holder,
         head_modifier=head_phrase.get_head_modifier(),
         repr_modifiers=repr_modifiers,
+        sent_pos_mask=new_mask,
     )
     # Simply derive type from the head phrase for now
     new_phrase.phrase_type = head_phrase.phrase_type
@@ -169,23 +161,198 @@ def make_new_phrase(head_phrase: Phrase, other_phrase: Phrase, sent: lp_doc.Sent
     return new_phrase
 
 
-def _generate_new_phrases(
-    head_phrase: Phrase, mod_phrases: Iterator[Phrase], sent: lp_doc.Sent, phrases_cache
-):
-    for mod_phrase in mod_phrases:
-        p = make_new_phrase(head_phrase, mod_phrase, sent, phrases_cache)
-        if p is not None:
-            yield p
+class PhraseTable:
+    """Phrases of a sentence stored as rows of flat arrays.
+
+    A row of a merged phrase keeps only its positions mask, the sentence
+    position of its head and the rows it was merged from. Phrase objects of
+    merged rows are created on demand by phrase(), so candidates that are
+    never returned or accessed cost no allocations besides the row.
+    """
+
+    def __init__(self, sent: lp_doc.Sent) -> None:
+        self.sent = sent
+        # Python ints, sentences may be longer than 64 words
+        self.masks: List[int] = []
+        self.head_positions = array('i')
+        # Rows of merged phrases, -1 for phrases added with add_phrase
+        self.head_rows = array('i')
+        self.mod_rows = array('i')
+        # Head modifier and type are inherited from the first head of a merge chain
+        self.root_rows = array('i')
+        self._phrases: List[Phrase | None] = []
+        # Id holders of merged rows computed by id_holder() without creating phrases
+        self._id_holders: List[PhraseId | None] = []
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+    def add_phrase(self, phrase: Phrase) -> int:
+        row = len(self.masks)
+        self.masks.append(phrase.get_sent_pos_mask())
+        self.head_positions.append(phrase.sent_hp())
+        self.head_rows.append(-1)
+        self.mod_rows.append(-1)
+        self.root_rows.append(row)
+        self._phrases.append(phrase)
+        self._id_holders.append(None)
+        return row
+
+    def merge(self, head_row: int, mod_row: int, phrases_cache) -> int | None:
+        """Same checks as in make_new_phrase, but the phrase is not created.
+        Return row of the new phrase or None."""
+        mod_mask = self.masks[mod_row]
+        mod_root = cast(Phrase, self._phrases[self.root_rows[mod_row]])
+        mod_head_modifier = mod_root.get_head_modifier()
+        if (
+            mod_head_modifier is not None
+            and mod_head_modifier.prep_modifier is not None
+            # the lowest position of the modifier phrase
+            and mod_head_modifier.prep_modifier[0] > (mod_mask & -mod_mask).bit_length() - 1
+        ):
+            logging.debug(
+                "Preposition should be before all modificators: prep=%s, phrase=%s",
+                mod_head_modifier.prep_modifier,
+                self.phrase(mod_row),
+            )
+            return None
+
+        head_mask = self.masks[head_row]
+        if head_mask & mod_mask:
+            raise RuntimeError(
+                'trying to merge phrase with the same word: '
+                f'head={self.phrase(head_row)}; other={self.phrase(mod_row)}'
+            )
+        new_mask = head_mask | mod_mask
+        if new_mask in phrases_cache:
+            return None
+        phrases_cache.add(new_mask)
+
+        row = len(self.masks)
+        self.masks.append(new_mask)
+        self.head_positions.append(self.head_positions[head_row])
+        self.head_rows.append(head_row)
+        self.mod_rows.append(mod_row)
+        self.root_rows.append(self.root_rows[head_row])
+        self._phrases.append(None)
+        self._id_holders.append(None)
+        return row
+
+    def phrase(self, row: int) -> Phrase:
+        phrase = self._phrases[row]
+        if phrase is None:
+            phrase = _merge_phrases(
+                self.phrase(self.head_rows[row]),
+                self.phrase(self.mod_rows[row]),
+                self.sent,
+                self.masks[row],
+            )
+            self._phrases[row] = phrase
+        return phrase
+
+    def id_holder(self, row: int) -> PhraseId:
+        """Id holder of the row phrase, the same as phrase(row).get_id_holder(),
+        but the phrase is not created."""
+        if (phrase := self._phrases[row]) is not None:
+            return phrase.get_id_holder()
+        id_holder = self._id_holders[row]
+        if id_holder is None:
+            head_row, mod_row = self.head_rows[row], self.mod_rows[row]
+            on_left = self.head_positions[head_row] > self.head_positions[mod_row]
+            id_holder = copy.copy(self.id_holder(head_row)).merge_mod(
+                self.id_holder(mod_row), on_left
+            )
+            self._id_holders[row] = id_holder
+        return id_holder
+
+    def drop_phrase(self, row: int):
+        """Forget the Phrase object of a merged row, phrase() creates it again."""
+        if self.head_rows[row] >= 0:
+            self._phrases[row] = None
+
+
+# * Beam scoring
+
+# Scores expansion of head_phrase with mod_phrase, higher is better.
+# A scorer may also define score_rows(table, head_row, mod_row) that scores
+# the same expansion of PhraseTable rows, then phrases are not created for
+# scoring, see _row_scorer.
+PhraseScorer = Callable[[Phrase, Phrase, lp_doc.Sent], float]
+RowScorer = Callable[[PhraseTable, int, int], float]
+
+_MOD_POS_SCORES = {
+    lp.PosTag.NOUN: 0.5,
+    lp.PosTag.PROPN: 0.5,
+    lp.PosTag.ADJ: 0.25,
+    lp.PosTag.PARTICIPLE: 0.25,
+}
+
+
+def distance_pos_scorer(head_phrase: Phrase, mod_phrase: Phrase, sent: lp_doc.Sent) -> float:
+    """Closer modifiers are better, nouns are preferred to adjectives
+    on the same distance."""
+    return _distance_pos_score(head_phrase.sent_hp(), mod_phrase.sent_hp(), sent)
+
+
+def _distance_pos_score(head_hp: int, mod_hp: int, sent: lp_doc.Sent) -> float:
+    return _MOD_POS_SCORES.get(sent[mod_hp].pos_tag, 0.0) - abs(mod_hp - head_hp)
+
+
+def _distance_pos_row_scorer(table: PhraseTable, head_row: int, mod_row: int) -> float:
+    return _distance_pos_score(
+        table.head_positions[head_row], table.head_positions[mod_row], table.sent
+    )
+
+
+class PhraseFreqScorer:
+    """Scores expansion by frequency of the resulting phrase id in an external
+    table, e.g. phrase counts collected on a corpus."""
+
+    def __init__(self, freqs: Mapping[int, float], default: float = 0.0) -> None:
+        self._freqs = freqs
+        self._default = default
+
+    def __call__(self, head_phrase: Phrase, mod_phrase: Phrase, sent: lp_doc.Sent) -> float:
+        return self._score(
+            head_phrase.get_id_holder(),
+            mod_phrase.get_id_holder(),
+            head_phrase.sent_hp() > mod_phrase.sent_hp(),
+        )
+
+    def score_rows(self, table: PhraseTable, head_row: int, mod_row: int) -> float:
+        return self._score(
+            table.id_holder(head_row),
+            table.id_holder(mod_row),
+            table.head_positions[head_row] > table.head_positions[mod_row],
+        )
+
+    def _score(self, head_id_holder: PhraseId, mod_id_holder: PhraseId, on_left: bool) -> float:
+        id_holder = copy.copy(head_id_holder).merge_mod(mod_id_holder, on_left)
+        return self._freqs.get(id_holder.get_id(), self._default)
+
+
+def _row_scorer(scorer: PhraseScorer | None) -> RowScorer:
+    if scorer is None:
+        return _distance_pos_row_scorer
+    if (score_rows := getattr(scorer, 'score_rows', None)) is not None:
+        return score_rows
+    # Plain phrase scorers need the phrases of the rows
+    return lambda table, head_row, mod_row: scorer(
+        table.phrase(head_row), table.phrase(mod_row), table.sent
+    )
 
 
 # types
-PhrasesIndexType = List[Optional[List[List[Phrase]]]]
+# Rows of PhraseTable for each word and level
+PhrasesIndexType = List[Optional[List[List[int]]]]
 ModsIndexType = List[Optional[List[int]]]
 
 
 class AuxBuilderInfo:
     def __init__(self) -> None:
         self.conj_set: List[int] = []
+        # conj_set as a bitmask, filled after all conjuncts are collected
+        self.conj_mask = 0
         self.main_mod_pos: int | None = None
 
 
@@ -195,10 +362,213 @@ class AuxBuilderIndices:
         words_index: PhrasesIndexType,
         mods_index: ModsIndexType,
         aux_info_list: List[AuxBuilderInfo | None],
+        table: PhraseTable,
     ):
         self.words_index = words_index
         self.mods_index = mods_index
         self.aux_info_list = aux_info_list
+        self.table = table
+
+
+def _resolve_conj_modifier(
+    pos: int,
+    word_obj: WordObj,
+    sent: lp_doc.Sent,
+    aux_info_list: List[AuxBuilderInfo | None],
+):
+    init_pos = pos
+    # find the actual head of this conj
+    link = word_obj.synt_link
+    while word_obj.parent_offs and link == lp.SyntLink.CONJ:
+        # at first find the modificator with no CONJ type
+        conj_pos = pos + word_obj.parent_offs
+        conj_obj = sent[conj_pos]
+
+        pos = conj_pos
+        word_obj = conj_obj
+        link = conj_obj.synt_link
+
+    if init_pos != pos:
+        # we skipped all chained conjuncts
+        # this word (with index pos) has real dep relation
+        # cache this info for init_pos
+        aux_info = aux_info_list[init_pos]
+        if aux_info is None:
+            aux_info = AuxBuilderInfo()
+            aux_info_list[init_pos] = aux_info
+
+        aux_info.main_mod_pos = pos
+
+        # collect all conjuct positions in main mod info
+        # conj_set is a sorted list
+        main_mod_aux_info = aux_info_list[pos]
+        if main_mod_aux_info is None:
+            main_mod_aux_info = AuxBuilderInfo()
+            aux_info_list[pos] = main_mod_aux_info
+            main_mod_aux_info.conj_set = [pos]
+
+        insert_pos = len(main_mod_aux_info.conj_set)
+        while insert_pos > 0 and init_pos < main_mod_aux_info.conj_set[insert_pos - 1]:
+            insert_pos -= 1
+        main_mod_aux_info.conj_set.insert(insert_pos, init_pos)
+        aux_info.conj_set = main_mod_aux_info.conj_set
+
+    if word_obj.parent_offs:
+        return pos + word_obj.parent_offs, word_obj
+
+    return None, None
+
+
+def _create_all_mods_index(sent: lp_doc.Sent) -> ModsIndexType:
+    mods_index: ModsIndexType = [None] * len(sent)
+
+    for i, l in enumerate(sent.parent_offsets()):
+        if l:
+            head_pos = i + l
+
+            mod_list = mods_index[head_pos]
+            if mod_list is None:
+                mod_list = [i]
+                mods_index[head_pos] = mod_list
+            else:
+                mod_list.append(i)
+    return mods_index
+
+
+class SentAnalysis:
+    """Builder independent analysis of a sentence: modifiers of words and
+    groups of conjuncts. It is computed once and shared by all builders that
+    process the sentence (see PhraseProfile), so each builder only applies its
+    own head and modifier tests.
+    """
+
+    def __init__(self, sent: lp_doc.Sent) -> None:
+        self.sent = sent
+        self.all_mods_index = _create_all_mods_index(sent)
+        self.aux_info_list: List[AuxBuilderInfo | None] = [None] * len(sent)
+        # Real (head_pos, modifier word) of a word after skipping chained
+        # conjuncts, or None if the word has no head.
+        self.resolved_heads: List[tuple[int, WordObj] | None] = [None] * len(sent)
+        for i, word_obj in enumerate(sent):
+            if not word_obj.parent_offs:
+                continue
+            head_pos, mod_word_obj = _resolve_conj_modifier(i, word_obj, sent, self.aux_info_list)
+            if head_pos is not None and mod_word_obj is not None:
+                self.resolved_heads[i] = (head_pos, mod_word_obj)
+
+        for aux_info in self.aux_info_list:
+            if aux_info is not None:
+                aux_info.conj_mask = positions_mask(aux_info.conj_set)
+
+        # Builder that has filled extras of words, see BasicPhraseBuilder._extra_key
+        self.extra_key: Any = None
+
+
+# * Partitioning of long sentences
+
+
+def _find_root(parents: List[int], pos: int) -> int:
+    while parents[pos] != pos:
+        parents[pos] = parents[parents[pos]]
+        pos = parents[pos]
+    return pos
+
+
+def _union(parents: List[int], pos1: int, pos2: int):
+    # The root of a component is its first position
+    root1 = _find_root(parents, pos1)
+    root2 = _find_root(parents, pos2)
+    if root1 < root2:
+        parents[root2] = root1
+    elif root2 < root1:
+        parents[root1] = root2
+
+
+def _pack_windows(parents: List[int], max_part_len: int) -> List[List[int]]:
+    """Contiguous windows [start, end) that cover all components of more than
+    one word, a component never crosses a window border. Components are
+    packed into a window while it is not longer than max_part_len words, a
+    window is longer only if a component is longer."""
+    ends: dict[int, int] = {}
+    for pos in range(len(parents)):
+        root = _find_root(parents, pos)
+        if root != pos:
+            ends[root] = pos + 1
+
+    windows: List[List[int]] = []
+    for start, end in sorted(ends.items()):
+        if windows and start < windows[-1][1]:
+            # overlapping components
+            windows[-1][1] = max(windows[-1][1], end)
+        elif windows and end - windows[-1][0] <= max_part_len:
+            windows[-1][1] = end
+        else:
+            windows.append([start, end])
+    return windows
+
+
+def _shift_extra(extra: dict, shift: int) -> dict:
+    """Copy of word extras with sentence positions of prepositions shifted."""
+    extra = dict(extra)
+    if isinstance(prep := extra.get(lp.Attr.PREP_WHITE_LIST), tuple):
+        extra[lp.Attr.PREP_WHITE_LIST] = (prep[0] + shift, *prep[1:])
+    if isinstance(preps := extra.get(lp.Attr.PREP_MOD), list):
+        extra[lp.Attr.PREP_MOD] = [(p[0] + shift, *p[1:]) for p in preps]
+    return extra
+
+
+def _window_sent(sent: lp_doc.Sent, start: int, end: int) -> lp_doc.Sent:
+    words = []
+    for pos in range(start, end):
+        # A copy of a ColumnarSent word would be a view of the same columns
+        word_obj = WordObj.from_word(sent[pos])
+        if word_obj.parent_offs and not start <= pos + word_obj.parent_offs < end:
+            # Such links are not used by phrases, see BasicPhraseBuilder._partition
+            word_obj.parent_offs = 0
+        if word_obj.has_extra():
+            word_obj.extra = _shift_extra(word_obj.extra, -start)
+        words.append(word_obj)
+    return lp_doc.Sent(words)
+
+
+def _shift_phrases(phrases: List[Phrase], shift: int) -> List[Phrase]:
+    """Shift sentence positions of phrases and of their prepositions in place.
+    Head modifiers are shared by phrases, each of them is replaced once."""
+    head_modifiers: dict[int, HeadModifier] = {}
+    for phrase in phrases:
+        phrase.set_sent_pos_list([pos + shift for pos in phrase.get_sent_pos_list()])
+        head_modifier = phrase.get_head_modifier()
+        if head_modifier is None or head_modifier.prep_modifier is None:
+            continue
+        if (new_head_modifier := head_modifiers.get(id(head_modifier))) is None:
+            prep_pos, *prep_rest = head_modifier.prep_modifier
+            new_head_modifier = HeadModifier(
+                (prep_pos + shift, *prep_rest), head_modifier.repr_mod_suffix
+            )
+            head_modifiers[id(head_modifier)] = new_head_modifier
+        phrase.set_head_modifier(new_head_modifier)
+    return phrases
+
+
+def _build_window_phrases(
+    builder: "BasicPhraseBuilder",
+    sent: lp_doc.Sent,
+    init_phrases: List[Phrase],
+    extra_key: Any,
+) -> List[Phrase | tuple[int, Phrase]]:
+    """Build phrases for a window of a long sentence, init phrases are
+    returned with their indices. Runs in executors, so it is a module function."""
+    # init phrases are kept by the builder while a sentence is processed
+    builder = copy.copy(builder)
+    analysis = SentAnalysis(sent)
+    # Extras are created for the whole sentence, see _build_partitioned
+    analysis.extra_key = extra_key
+    analysis = builder._prepare_sent(sent, init_phrases, analysis)
+    init_indices = {id(p): i for i, p in enumerate(init_phrases)}
+    return [
+        p if (i := init_indices.get(id(p))) is None else (i, p)
+        for p in builder._build_phrases_impl(sent, analysis)
+    ]
 
 
 class BasicPhraseBuilderOpts:
@@ -208,8 +578,23 @@ class BasicPhraseBuilderOpts:
         return_top_level_phrases=False,
         def_phrase_type: PhraseType = PhraseType.DEFAULT,
         propagate_mods_to_conjucts: bool = True,
+        beam_size: int | None = None,
+        phrase_scorer: PhraseScorer | None = None,
+        id_memo: PhraseIdMemo | None = None,
+        max_part_len: int | None = 4096,
     ):
         self.max_variants_bound = max_variants_bound
+        # If beam_size is set, it is used instead of max_variants_bound:
+        # only beam_size best scored phrases are kept for each head and level.
+        # See _generate_phrases_for_level_beam.
+        self.beam_size = beam_size
+        # distance_pos_scorer is used by default
+        self.phrase_scorer = phrase_scorer
+        # Memo of phrase ids, may be shared by builders (see PhraseProfile)
+        self.id_memo = id_memo
+        # Longer sentences are split into windows built separately,
+        # see BasicPhraseBuilder._partition. None disables partitioning.
+        self.max_part_len = max_part_len
         self.return_top_level_phrases = return_top_level_phrases
         self.def_phrase_type = def_phrase_type
         # See https://fginter.github.io/docs/u/dep/conj.html
@@ -230,23 +615,9 @@ class BasicPhraseBuilder:
         self._opts = opts
         self._init_phrases: list[list[Phrase]] = []
 
-    def _create_all_mods_index(self, sent: lp_doc.Sent) -> ModsIndexType:
-        mods_index: ModsIndexType = [None] * len(sent)
-
-        for i, word_obj in enumerate(sent):
-            l = word_obj.parent_offs
-            if l:
-                head_pos = i + l
-
-                mod_list = mods_index[head_pos]
-                if mod_list is None:
-                    mod_list = [i]
-                    mods_index[head_pos] = mod_list
-                else:
-                    mod_list.append(i)
-        return mods_index
-
-    def _init_word_index(self, pos: int, word_obj: WordObj, words_index: PhrasesIndexType):
+    def _init_word_index(
+        self, pos: int, word_obj: WordObj, words_index: PhrasesIndexType, table: PhraseTable
+    ):
         try:
             cur_word_index = [[] for _ in range(self._max_n)]
             words_index[pos] = cur_word_index
@@ -254,75 +625,28 @@ class BasicPhraseBuilder:
             if self._init_phrases and (word_init_phrases := self._init_phrases[pos]):
                 # Fill index for this word from init phrases.
                 for phrase in word_init_phrases:
-                    cur_word_index[min(phrase.size() - 1, self._max_n - 1)].append(phrase)
+                    cur_word_index[min(phrase.size() - 1, self._max_n - 1)].append(
+                        table.add_phrase(phrase)
+                    )
                     # If this is MWE do not add this word to index
                     if phrase.phrase_type == PhraseType.MWE:
                         add_word_as_phrase = False
 
             if add_word_as_phrase:
-                phrase = Phrase.from_word(pos, word_obj)
+                phrase = Phrase.from_word(pos, word_obj, self._opts.id_memo)
                 phrase.phrase_type = self._opts.def_phrase_type
                 # init words_index's level 0
-                cur_word_index[0] = [phrase]
+                cur_word_index[0] = [table.add_phrase(phrase)]
         except RuntimeError as ex:
             logging.warning("Failed to create phrase from word_obj: %s", ex)
 
-    def _resolve_conj_modifier(
-        self,
-        pos: int,
-        word_obj: WordObj,
-        sent: lp_doc.Sent,
-        aux_info_list: List[AuxBuilderInfo | None],
-    ):
-        init_pos = pos
-        # find the actual head of this conj
-        link = word_obj.synt_link
-        while word_obj.parent_offs and link == lp.SyntLink.CONJ:
-            # at first find the modificator with no CONJ type
-            conj_pos = pos + word_obj.parent_offs
-            conj_obj = sent[conj_pos]
-
-            pos = conj_pos
-            word_obj = conj_obj
-            link = conj_obj.synt_link
-
-        if init_pos != pos:
-            # we skipped all chained conjuncts
-            # this word (with index pos) has real dep relation
-            # cache this info for init_pos
-            aux_info = aux_info_list[init_pos]
-            if aux_info is None:
-                aux_info = AuxBuilderInfo()
-                aux_info_list[init_pos] = aux_info
-
-            aux_info.main_mod_pos = pos
-
-            # collect all conjuct positions in main mod info
-            # conj_set is a sorted list
-            main_mod_aux_info = aux_info_list[pos]
-            if main_mod_aux_info is None:
-                main_mod_aux_info = AuxBuilderInfo()
-                aux_info_list[pos] = main_mod_aux_info
-                main_mod_aux_info.conj_set = [pos]
-
-            insert_pos = len(main_mod_aux_info.conj_set)
-            while insert_pos > 0 and init_pos < main_mod_aux_info.conj_set[insert_pos - 1]:
-                insert_pos -= 1
-            main_mod_aux_info.conj_set.insert(insert_pos, init_pos)
-            aux_info.conj_set = main_mod_aux_info.conj_set
-
-        if word_obj.parent_offs:
-            return pos + word_obj.parent_offs, word_obj
-
-        return None, None
-
     def _propagate_head_modifiers_to_conj(self, sent: lp_doc.Sent, aux_indices: AuxBuilderIndices):
         def _find_phrase(levels):
             # This word may be MWE, so need to scan all levels
             for phrases_on_level in levels:
                 if phrases_on_level:
                     # take the first phrase on a level
-                    return phrases_on_level[0]
+                    return aux_indices.table.phrase(phrases_on_level[0])
             return None
 
         for pos, aux_info in enumerate(aux_indices.aux_info_list):
@@ -371,35 +695,33 @@ class BasicPhraseBuilder:
 
                 conj_head_mod.prep_modifier = mod_head_mod.prep_modifier
 
-    def _create_indices(
-        self, sent: lp_doc.Sent, all_mods_index: ModsIndexType
-    ) -> AuxBuilderIndices:
+    def _create_indices(self, sent: lp_doc.Sent, analysis: SentAnalysis) -> AuxBuilderIndices:
         # words_index:
         # for each word there is a list of size MaxN
         # index 0 -> single words
         # index 1 -> two-word phrases
         # index 3 -> three-word phrases etc...
         # mods_index is modificators of words
+        # Phrases of the index are stored in the table
+        table = PhraseTable(sent)
         words_index: PhrasesIndexType = [None] * len(sent)
         good_mods_index: ModsIndexType = [None] * len(sent)
-        aux_info_list: List[AuxBuilderInfo | None] = [None] * len(sent)
+        all_mods_index = analysis.all_mods_index
+        resolved_heads = analysis.resolved_heads
 
         for i, word_obj in enumerate(sent):
             is_good_head = self._test_head(word_obj, i, sent, all_mods_index)
             if words_index[i] is None and is_good_head:
-                self._init_word_index(i, word_obj, words_index)
+                self._init_word_index(i, word_obj, words_index, table)
 
-            if not word_obj.parent_offs:
-                continue
-
-            head_pos, mod_word_obj = self._resolve_conj_modifier(i, word_obj, sent, aux_info_list)
-            if head_pos is None or mod_word_obj is None:
+            if (resolved := resolved_heads[i]) is None:
                 continue
+            head_pos, mod_word_obj = resolved
 
             is_good_mod = self._test_pair(head_pos, mod_word_obj, i, sent, all_mods_index)
 
             if words_index[i] is None and is_good_mod:
-                self._init_word_index(i, word_obj, words_index)
+                self._init_word_index(i, word_obj, words_index, table)
 
             if is_good_mod:
                 mods_list = good_mods_index[head_pos]
@@ -408,7 +730,7 @@ class BasicPhraseBuilder:
                 else:
                     mods_list.append(i)
 
-        aux_indices = AuxBuilderIndices(words_index, good_mods_index, aux_info_list)
+        aux_indices = AuxBuilderIndices(words_index, good_mods_index, analysis.aux_info_list, table)
         self._propagate_head_modifiers_to_conj(sent, aux_indices)
         return aux_indices
 
@@ -417,22 +739,20 @@ class BasicPhraseBuilder:
         modificators: List[int],
         aux_indices: AuxBuilderIndices,
         level: int,
-        head_phrase_sent_pos: List[int],
+        head_phrase_mask: int,
     ):
         for mod_pos in modificators:
-            if mod_pos in head_phrase_sent_pos:
+            if head_phrase_mask >> mod_pos & 1:
                 # this modifier is already in phrase
                 continue
 
             aux_info = aux_indices.aux_info_list[mod_pos]
-            conj_set = aux_info.conj_set if aux_info is not None else []
-
-            if conj_set:
+            if aux_info is not None and aux_info.conj_mask:
                 # we have to check if the phrase already contains words with conjunct relation to the current modifier.
                 # we don't want to combine words with conjunct relation in one phrase,
                 # it may become a bit hairy when forming a string representation of a phrase.
                 # Especially when phrase also contains prepositions.
-                if _sorted_lists_intersect(head_phrase_sent_pos, conj_set):
+                if head_phrase_mask & aux_info.conj_mask:
                     continue
 
             mod_phrases = aux_indices.words_index[mod_pos]
@@ -447,6 +767,8 @@ class BasicPhraseBuilder:
             # no modificators
             return
         head_index = aux_indices.words_index[head_pos]
+        table = aux_indices.table
+        new_phrases = head_index[level + 1]
         # extend the phrases from previous levels with modificators
         # e.g. we can take already built 2word phrase, add one modificator and get 3word phrase.
         # or get 2word phrase, add modificator from level 1 that consists of 2 words.
@@ -454,36 +776,81 @@ class BasicPhraseBuilder:
             mod_level = level - head_level
             if mod_level < 0:
                 break
-            for head_phrase in head_phrases:
-                gen = _generate_new_phrases(
-                    head_phrase,
-                    self._modifiers_generator(
-                        mods_index,
-                        aux_indices,
-                        mod_level,
-                        head_phrase.get_sent_pos_list(),
-                    ),
-                    sent,
-                    phrases_cache,
-                )
-
-                for p in gen:
-                    head_index[level + 1].append(p)
+            for head_row in head_phrases:
+                for mod_row in self._modifiers_generator(
+                    mods_index, aux_indices, mod_level, table.masks[head_row]
+                ):
+                    row = table.merge(head_row, mod_row, phrases_cache)
+                    if row is None:
+                        continue
+                    new_phrases.append(row)
                     # Keep only up to max_variants_bound phrases
                     if (
                         self._opts.max_variants_bound is not None
-                        and len(head_index[level + 1]) >= self._opts.max_variants_bound
+                        and len(new_phrases) >= self._opts.max_variants_bound
                     ):
                         return
 
+    def _generate_phrases_for_level_beam(self, level, head_pos, aux_indices, sent, phrases_cache):
+        """Score all expansions of the head phrases on this level, then
+        merge rows in order of decreasing score until beam_size rows are
+        merged. Expansions are scored by the table rows (see _row_scorer), so
+        phrases are not created for the candidates."""
+        mods_index = aux_indices.mods_index[head_pos]
+        if not mods_index:
+            return
+        head_index = aux_indices.words_index[head_pos]
+        new_phrases = head_index[level + 1]
+        beam_size = self._opts.beam_size - len(new_phrases)
+        if beam_size <= 0:
+            return
+        score = _row_scorer(self._opts.phrase_scorer)
+        table = aux_indices.table
+
+        candidates = []
+        for head_level, head_phrases in enumerate(head_index):
+            mod_level = level - head_level
+            if mod_level < 0:
+                break
+            for head_row in head_phrases:
+                head_mask = table.masks[head_row]
+                for mod_row in self._modifiers_generator(
+                    mods_index, aux_indices, mod_level, head_mask
+                ):
+                    if head_mask | table.masks[mod_row] in phrases_cache:
+                        continue
+                    # Candidates with equal scores keep the generation order
+                    candidates.append(
+                        (
+                            -score(table, head_row, mod_row),
+                            len(candidates),
+                            head_row,
+                            mod_row,
+                        )
+                    )
+
+        heapq.heapify(candidates)
+        while candidates and beam_size > 0:
+            _, _, head_row, mod_row = heapq.heappop(candidates)
+            row = table.merge(head_row, mod_row, phrases_cache)
+            if row is not None:
+                new_phrases.append(row)
+                beam_size -= 1
+
+    def _level_generator(self):
+        if self._opts.beam_size is not None:
+            return self._generate_phrases_for_level_beam
+        return self._generate_phrases_for_level
+
     def _generate_phrases(self, sent: lp_doc.Sent, aux_indices: AuxBuilderIndices):
         phrases_cache = set()
+        generate_for_level = self._level_generator()
         # fill words_index's levels 1 .. MaxN
         for l in range(0, self._max_n - 1):
             for head_pos, head_index in enumerate(aux_indices.words_index):
                 if head_index is None:
                     continue
-                self._generate_phrases_for_level(l, head_pos, aux_indices, sent, phrases_cache)
+                generate_for_level(l, head_pos, aux_indices, sent, phrases_cache)
 
     def _find_top_level(self, head_index):
         for i in range(self._max_n - 1, 0, -1):
@@ -491,21 +858,24 @@ class BasicPhraseBuilder:
                 return i
         return None
 
-    def _build_phrases_impl(self, sent: lp_doc.Sent):
+    def _prepare_indices(self, sent: lp_doc.Sent, analysis: SentAnalysis) -> AuxBuilderIndices:
         logging.debug("sent: %s", sent)
 
-        all_mods_index = self._create_all_mods_index(sent)
+        all_mods_index = analysis.all_mods_index
         logging.debug("all_mods_index: %s", all_mods_index)
 
-        self._create_extra(sent, all_mods_index)
+        extra_key = self._extra_key()
+        if extra_key is not None and analysis.extra_key != extra_key:
+            self._create_extra(sent, all_mods_index)
+            analysis.extra_key = extra_key
 
-        aux_indices = self._create_indices(sent, all_mods_index)
+        aux_indices = self._create_indices(sent, analysis)
         logging.debug("good_mods_index: %s", aux_indices.mods_index)
         logging.debug("words index: %s", aux_indices.words_index)
+        return aux_indices
 
-        self._generate_phrases(sent, aux_indices)
-
-        # Collect all generated phrases.
+    def _collect_phrases(self, sent: lp_doc.Sent, aux_indices: AuxBuilderIndices, all_mods_index):
+        table = aux_indices.table
         all_phrases = []
         for head_phrases in aux_indices.words_index:
             if head_phrases is None:
@@ -517,18 +887,52 @@ class BasicPhraseBuilder:
                 if start_level is None:
                     continue
             for l in range(start_level, self._max_n):
-                for p in head_phrases[l]:
-                    pos = p.sent_hp()
+                for row in head_phrases[l]:
+                    pos = table.head_positions[row]
                     # Test created phrases. Some phrases suplied via
                     # init_phrases (e.g. MWEs) can be on levels > 0, and they
                     # might have heads not compatible with current builder
                     # settings. We have to remove them from the final phrases list.
                     # See test_add_mwes_to_doc_4
                     if self._test_head(sent[pos], pos, sent, all_mods_index):
-                        all_phrases.append(p)
+                        all_phrases.append(table.phrase(row))
 
         return all_phrases
 
+    def _build_phrases_impl(self, sent: lp_doc.Sent, analysis: SentAnalysis):
+        aux_indices = self._prepare_indices(sent, analysis)
+        self._generate_phrases(sent, aux_indices)
+        return self._collect_phrases(sent, aux_indices, analysis.all_mods_index)
+
+    def _iter_phrases_impl(
+        self, sent: lp_doc.Sent, aux_indices: AuxBuilderIndices, all_mods_index: ModsIndexType
+    ) -> Iterator[Phrase]:
+        if self._opts.return_top_level_phrases:
+            # The top level of a head is known only when all levels are generated
+            self._generate_phrases(sent, aux_indices)
+            yield from self._collect_phrases(sent, aux_indices, all_mods_index)
+            return
+
+        table = aux_indices.table
+        phrases_cache = set()
+        generate_for_level = self._level_generator()
+        last_level = self._max_n - 1
+        for l in range(0, self._max_n - 1):
+            for head_pos, head_index in enumerate(aux_indices.words_index):
+                if head_index is None:
+                    continue
+                generate_for_level(l, head_pos, aux_indices, sent, phrases_cache)
+                # See _collect_phrases for the head test
+                if head_index[l + 1] and self._test_head(
+                    sent[head_pos], head_pos, sent, all_mods_index
+                ):
+                    for row in head_index[l + 1]:
+                        yield table.phrase(row)
+                        if l + 1 == last_level:
+                            # Phrases of the last level are neither heads nor
+                            # modifiers of other phrases, do not keep them.
+                            table.drop_phrase(row)
+
     def _test_pair(
         self,
         head_pos: int,
@@ -544,6 +948,12 @@ class BasicPhraseBuilder:
     def _create_extra(self, sent: lp_doc.Sent, mods_index: ModsIndexType):
         pass
 
+    def _extra_key(self) -> Any:
+        """Builders with equal keys fill the same extras of words in
+        _create_extra, so it is called once per SentAnalysis. None means there
+        are no extras."""
+        return None
+
     def _test_modifier(
         self, word_obj: WordObj, pos: int, sent: lp_doc.Sent, mods_index: ModsIndexType
     ):
@@ -553,11 +963,59 @@ class BasicPhraseBuilder:
         raise NotImplementedError("_test_head")
 
     def build_phrases_for_sent(
-        self, sent: lp_doc.Sent, init_phrases: list[Phrase] | None = None
+        self,
+        sent: lp_doc.Sent,
+        init_phrases: list[Phrase] | None = None,
+        analysis: SentAnalysis | None = None,
+        executor: Executor | None = None,
     ) -> List[Phrase]:
-        if len(sent) > 4096:
-            raise RuntimeError("Sent size limit!")
+        """analysis may be shared between builders processing the same sent,
+        it is created if it is not passed.
+
+        Sentences longer than max_part_len words are split into windows (see
+        _partition), executor may be passed to build windows in parallel.
+        """
+        if self._is_long_sent(sent):
+            return list(
+                itertools.chain.from_iterable(
+                    self._build_partitioned(sent, init_phrases, analysis, executor)
+                )
+            )
+        analysis = self._prepare_sent(sent, init_phrases, analysis)
+        return self._build_phrases_impl(sent, analysis)
+
+    def iter_phrases_for_sent(
+        self,
+        sent: lp_doc.Sent,
+        init_phrases: list[Phrase] | None = None,
+        analysis: SentAnalysis | None = None,
+    ) -> Iterator[Phrase]:
+        """Lazy version of build_phrases_for_sent. Phrases are yielded level
+        by level (2-word phrases of all heads, then 3-word phrases etc.) and
+        head by head as soon as they are generated, so a consumer may stop
+        early and skip generation of the remaining phrases. Phrases of the
+        last level are not kept by the builder.
+
+        The set of phrases is the same as of build_phrases_for_sent, the order
+        differs. With return_top_level_phrases phrases are yielded after all
+        levels are generated. Long sentences are yielded window by window.
+        """
+        if self._is_long_sent(sent):
+            return itertools.chain.from_iterable(
+                self._build_partitioned(sent, init_phrases, analysis)
+            )
+        analysis = self._prepare_sent(sent, init_phrases, analysis)
+        # Indices are created here, so the builder may process other sentences
+        # while phrases of this one are consumed.
+        aux_indices = self._prepare_indices(sent, analysis)
+        return self._iter_phrases_impl(sent, aux_indices, analysis.all_mods_index)
 
+    def _prepare_sent(
+        self,
+        sent: lp_doc.Sent,
+        init_phrases: list[Phrase] | None,
+        analysis: SentAnalysis | None,
+    ) -> SentAnalysis:
         if init_phrases:
             self._init_phrases = [[] for _ in range(len(sent))]
             for p in init_phrases:
@@ -566,7 +1024,102 @@ class BasicPhraseBuilder:
         else:
             self._init_phrases = []
 
-        return self._build_phrases_impl(sent)
+        return self._sent_analysis(sent, analysis)
+
+    def _sent_analysis(self, sent: lp_doc.Sent, analysis: SentAnalysis | None) -> SentAnalysis:
+        if analysis is None:
+            analysis = SentAnalysis(sent)
+        elif analysis.sent is not sent:
+            raise RuntimeError("Analysis was created for another sentence!")
+        return analysis
+
+    def _is_long_sent(self, sent: lp_doc.Sent) -> bool:
+        return self._opts.max_part_len is not None and len(sent) > self._opts.max_part_len
+
+    def _partition(
+        self, sent: lp_doc.Sent, init_phrases: list[Phrase] | None, analysis: SentAnalysis
+    ) -> List[List[int]]:
+        """Split the sentence into windows that can be processed independently.
+
+        A phrase is connected by pairs of heads and good modifiers (so it
+        never spans links longer than max_syntax_dist), by conjuncts and by
+        init phrases. Components of these links never cross windows, words
+        outside of components are not in any window.
+        """
+        all_mods_index = analysis.all_mods_index
+        parents = list(range(len(sent)))
+        for pos, resolved in enumerate(analysis.resolved_heads):
+            if resolved is None:
+                continue
+            head_pos, mod_word_obj = resolved
+            if self._test_pair(head_pos, mod_word_obj, pos, sent, all_mods_index):
+                _union(parents, pos, head_pos)
+        for pos, aux_info in enumerate(analysis.aux_info_list):
+            if aux_info is not None and aux_info.main_mod_pos is not None:
+                _union(parents, pos, aux_info.main_mod_pos)
+        for phrase in init_phrases or []:
+            pos_list = phrase.get_sent_pos_list()
+            for pos in pos_list[1:]:
+                _union(parents, pos_list[0], pos)
+        return _pack_windows(parents, cast(int, self._opts.max_part_len))
+
+    def _build_partitioned(
+        self,
+        sent: lp_doc.Sent,
+        init_phrases: list[Phrase] | None,
+        analysis: SentAnalysis | None,
+        executor: Executor | None = None,
+    ) -> Iterator[List[Phrase]]:
+        """Phrases of windows of a long sentence in order of the windows."""
+        analysis = self._sent_analysis(sent, analysis)
+        # Tests of modifiers may depend on extras
+        extra_key = self._extra_key()
+        if extra_key is not None and analysis.extra_key != extra_key:
+            self._create_extra(sent, analysis.all_mods_index)
+            analysis.extra_key = extra_key
+
+        windows = self._partition(sent, init_phrases, analysis)
+        logging.debug("sent of %d words is split into %d windows", len(sent), len(windows))
+        starts = [start for start, _ in windows]
+        windows_init_phrases: List[List[Phrase]] = [[] for _ in windows]
+        for phrase in init_phrases or []:
+            i = bisect.bisect_right(starts, phrase.sent_hp()) - 1
+            # Single word init phrases may be out of windows, they are not returned anyway
+            if i >= 0 and phrase.sent_hp() < windows[i][1]:
+                windows_init_phrases[i].append(phrase)
+
+        sents = (_window_sent(sent, start, end) for start, end in windows)
+        shifted_init_phrases = (
+            _shift_phrases([copy.copy(p) for p in phrases], -start)
+            for (start, _), phrases in zip(windows, windows_init_phrases)
+        )
+        map_func = executor.map if executor is not None else map
+        results = map_func(
+            _build_window_phrases,
+            itertools.repeat(self),
+            sents,
+            shifted_init_phrases,
+            itertools.repeat(extra_key),
+        )
+        for (start, _), phrases, result in zip(windows, windows_init_phrases, results):
+            new_phrases = []
+            for p in result:
+                if isinstance(p, Phrase):
+                    new_phrases.append(p)
+                    continue
+                # Prepositions are propagated to head modifiers of conjuncts in place
+                i, window_phrase = p
+                head_modifier = phrases[i].get_head_modifier()
+                window_head_modifier = window_phrase.get_head_modifier()
+                if (
+                    head_modifier is not None
+                    and head_modifier.prep_modifier is None
+                    and window_head_modifier is not None
+                    and (prep := window_head_modifier.prep_modifier) is not None
+                ):
+                    head_modifier.prep_modifier = (prep[0] + start, *prep[1:])
+            _shift_phrases(new_phrases, start)
+            yield [p if isinstance(p, Phrase) else phrases[p[0]] for p in result]
 
 
 # * Opts and Constants
@@ -723,6 +1276,14 @@ class PhraseBuilderOpts(BasicPhraseBuilderOpts):
 # * Builder class
 
 
+def _lookup_table(values: Iterable[int], enum_cls) -> list[bool]:
+    """table[v] is True for v in values, indexed by values of enum_cls."""
+    table = [False] * (max(enum_cls) + 1)
+    for v in values:
+        table[v] = True
+    return table
+
+
 class PhraseBuilder(BasicPhraseBuilder):
     def __init__(self, MaxN, opts: BasicPhraseBuilderOpts = PhraseBuilderOpts()) -> None:
         super().__init__(MaxN, opts=opts)
@@ -730,6 +1291,20 @@ class PhraseBuilder(BasicPhraseBuilder):
 
         # set by methods
         self._init_phrases = []
+        self._compile_opts()
+
+    def _compile_opts(self):
+        """Precompute lookup tables from opts, so opts should not be changed
+        after the builder is created."""
+        opts = self.opts()
+        self._max_syntax_dist = opts.max_syntax_dist
+        self._good_mod_pos = _lookup_table(opts.good_mod_PoS, lp.PosTag)
+        self._good_head_pos = _lookup_table(opts.good_head_PoS, lp.PosTag)
+        self._good_synt_rels = _lookup_table(opts.good_synt_rels, lp.SyntLink)
+        self._bad_head_rels = _lookup_table(opts.bad_head_rels, lp.SyntLink)
+        self._banned_modifiers = frozenset(opts.banned_modifiers)
+        self._banned_mod_lemmas = frozenset(m[0] for m in opts.banned_modifiers)
+        self._whitelisted_preps = frozenset(opts.whitelisted_preps)
 
     def opts(self) -> PhraseBuilderOpts:
         return cast(PhraseBuilderOpts, self._opts)
@@ -766,7 +1341,7 @@ class PhraseBuilder(BasicPhraseBuilder):
             if mod_obj.pos_tag == lp.PosTag.ADP and mod_obj.synt_link == lp.SyntLink.CASE:
                 prep_str = self._restore_prep_str(mod_pos, mod_obj, sent)
                 word_id = mod_obj.word_id
-                if prep_str in self.opts().whitelisted_preps:
+                if prep_str in self._whitelisted_preps:
                     whitelisted_preps.append((mod_pos, prep_str, word_id))
                 else:
                     preps.append((mod_pos, prep_str, word_id))
@@ -810,6 +1385,9 @@ class PhraseBuilder(BasicPhraseBuilder):
             if extra:
                 word_obj.extra.update(extra)
 
+    def _extra_key(self) -> Any:
+        return self._whitelisted_preps
+
     def _test_pair(
         self,
         head_pos: int,
@@ -822,9 +1400,9 @@ class PhraseBuilder(BasicPhraseBuilder):
 
     def _test_nmod(self, word_obj: WordObj):
         """Return true if this nmod without prepositions or with whitelisted preposition"""
-        extra = word_obj.extra
         return word_obj.pos_tag in (lp.PosTag.NOUN, lp.PosTag.PROPN) and (
-            lp.Attr.PREP_WHITE_LIST in extra or lp.Attr.PREP_MOD not in extra
+            word_obj.get_extra(lp.Attr.PREP_WHITE_LIST) is not None
+            or word_obj.get_extra(lp.Attr.PREP_MOD) is None
         )
 
     def _test_modifier(
@@ -832,27 +1410,30 @@ class PhraseBuilder(BasicPhraseBuilder):
     ):
         """Return True if this is good modifier"""
 
+        pos_tag = word_obj.pos_tag
         if (
             not word_obj.parent_offs
-            or math.fabs(word_obj.parent_offs) > self.opts().max_syntax_dist
-            or word_obj.pos_tag not in self.opts().good_mod_PoS
+            or abs(word_obj.parent_offs) > self._max_syntax_dist
+            or pos_tag is None
+            or not self._good_mod_pos[pos_tag]
         ):
             return False
 
-        key = (
-            word_obj.lemma,
-            word_obj.pos_tag,
-            (
-                None
-                if (prep_mod := word_obj.extra.get(lp.Attr.PREP_WHITE_LIST)) is None
-                else prep_mod[1]
-            ),
-        )
-        if key in self.opts().banned_modifiers:
-            return False
+        if word_obj.lemma in self._banned_mod_lemmas:
+            key = (
+                word_obj.lemma,
+                pos_tag,
+                (
+                    None
+                    if (prep_mod := word_obj.get_extra(lp.Attr.PREP_WHITE_LIST)) is None
+                    else prep_mod[1]
+                ),
+            )
+            if key in self._banned_modifiers:
+                return False
 
         link = word_obj.synt_link
-        if link not in self.opts().good_synt_rels:
+        if link is None or not self._good_synt_rels[link]:
             return False
 
         if link == lp.SyntLink.NMOD:
@@ -862,10 +1443,13 @@ class PhraseBuilder(BasicPhraseBuilder):
         return True
 
     def _test_head(self, word_obj: WordObj, pos: int, sent: lp_doc.Sent, mods_index: ModsIndexType):
+        pos_tag = word_obj.pos_tag
+        link = word_obj.synt_link
         return (
             not word_obj.lang == lp.Lang.UNDEF
-            and word_obj.pos_tag in self.opts().good_head_PoS
-            and word_obj.synt_link not in self.opts().bad_head_rels
+            and pos_tag is not None
+            and self._good_head_pos[pos_tag]
+            and (link is None or not self._bad_head_rels[link])
         )
 
 
@@ -903,28 +1487,73 @@ class PhraseBuilderProfileArgs:
         self.mwe_max_n = mwe_max_n
 
 
-def _noun_phrases(
-    sent: lp_doc.Sent, max_n: int, profile_args: PhraseBuilderProfileArgs, builder_cls=PhraseBuilder
-) -> list[Phrase]:
-    mwe_opts = MWEBuilderOpts(profile_args.mwe_max_n)
-    if not mwe_opts.mwe_size:
-        mwe_size = max(6, max_n)
-    else:
-        mwe_size = mwe_opts.mwe_size
-    mwe_builder: BasicPhraseBuilder = builder_cls(mwe_size, mwe_opts)
-
-    builder_opts = PhraseBuilderOpts()
-    builder: BasicPhraseBuilder = builder_cls(max_n, builder_opts)
-
-    # MWEs are extracted using more efficient greedy algorithm.
-    mwes = mwe_builder.build_phrases_for_sent(sent)
-    # MWEs could be used to produce other phrases.
-    # For example, mod1 + (MWE_head, MWE_mod1, ...)
-    # So use them as init phrases, so builder could use them.
-    mwes = keep_non_overlapping_phrases(mwes)
-
-    phrases = builder.build_phrases_for_sent(sent, init_phrases=mwes)
-    return phrases
+class PhraseProfile:
+    """Builders of a phrase building profile. The profile is compiled once
+    (options and lookup tables of builders are prepared) and can be reused for
+    all sentences and documents.
+
+    Example:
+        profile = PhraseProfile('noun_phrases', 4)
+        for sent in doc:
+            sent.set_phrases(profile.build_phrases_for_sent(sent))
+    """
+
+    PROFILE_NAMES = ('noun_phrases', 'verb+noun_phrases')
+
+    def __init__(
+        self,
+        profile_name: str,
+        max_n: int,
+        profile_args: PhraseBuilderProfileArgs = PhraseBuilderProfileArgs(),
+        builder_cls=PhraseBuilder,
+    ) -> None:
+        if profile_name not in self.PROFILE_NAMES:
+            raise RuntimeError(f'Unknown profile name: {profile_name}')
+        self.profile_name = profile_name
+        self.max_n = max_n
+        # Ids of phrases are shared by builders of the profile and across sentences
+        self.id_memo = PhraseIdMemo()
+
+        mwe_opts = MWEBuilderOpts(profile_args.mwe_max_n)
+        mwe_opts.id_memo = self.id_memo
+        if not mwe_opts.mwe_size:
+            mwe_size = max(6, max_n)
+        else:
+            mwe_size = mwe_opts.mwe_size
+        self._mwe_builder: BasicPhraseBuilder = builder_cls(mwe_size, mwe_opts)
+        np_opts = PhraseBuilderOpts()
+        np_opts.id_memo = self.id_memo
+        self._np_builder: BasicPhraseBuilder = builder_cls(max_n, np_opts)
+
+        self._vp_builder: BasicPhraseBuilder | None = None
+        if profile_name == 'verb+noun_phrases':
+            builder_opts = PhraseBuilderOpts()
+            builder_opts.good_mod_PoS = frozenset([lp.PosTag.NOUN, lp.PosTag.PROPN])
+            builder_opts.good_head_PoS = frozenset([lp.PosTag.VERB])
+            builder_opts.good_synt_rels = VP_RELS
+            builder_opts.id_memo = self.id_memo
+            self._vp_builder = builder_cls(max_n, builder_opts)
+
+    def _noun_phrases(self, sent: lp_doc.Sent, analysis: SentAnalysis) -> list[Phrase]:
+        # MWEs are extracted using more efficient greedy algorithm.
+        mwes = self._mwe_builder.build_phrases_for_sent(sent, analysis=analysis)
+        # MWEs could be used to produce other phrases.
+        # For example, mod1 + (MWE_head, MWE_mod1, ...)
+        # So use them as init phrases, so builder could use them.
+        mwes = keep_non_overlapping_phrases(mwes)
+
+        return self._np_builder.build_phrases_for_sent(sent, init_phrases=mwes, analysis=analysis)
+
+    def build_phrases_for_sent(self, sent: lp_doc.Sent) -> list[Phrase]:
+        # Parse tree analysis does not depend on builder options, do it once.
+        analysis = SentAnalysis(sent)
+        init_phrases = self._noun_phrases(sent, analysis)
+        if self._vp_builder is None:
+            return init_phrases
+        vp = self._vp_builder.build_phrases_for_sent(
+            sent, init_phrases=init_phrases, analysis=analysis
+        )
+        return vp + init_phrases
 
 
 def dispatch_phrase_building(
@@ -934,16 +1563,8 @@ def dispatch_phrase_building(
     profile_args: PhraseBuilderProfileArgs = PhraseBuilderProfileArgs(),
     builder_cls=PhraseBuilder,
 ) -> list[Phrase]:
-    if profile_name == 'noun_phrases':
-        return _noun_phrases(sent, max_n, profile_args, builder_cls)
-    if profile_name == 'verb+noun_phrases':
-        init_phrases = _noun_phrases(sent, max_n, profile_args, builder_cls)
-        builder_opts = PhraseBuilderOpts()
-        builder_opts.good_mod_PoS = frozenset([lp.PosTag.NOUN, lp.PosTag.PROPN])
-        builder_opts.good_head_PoS = frozenset([lp.PosTag.VERB])
-        builder_opts.good_synt_rels = VP_RELS
-        builder: BasicPhraseBuilder = builder_cls(max_n, builder_opts)
-        vp = builder.build_phrases_for_sent(sent, init_phrases=init_phrases)
-        return vp + init_phrases
-
-    raise RuntimeError(f'Unknown profile name: {profile_name}')
+    """Build phrases for a single sentence. Use PhraseProfile directly to
+    build phrases for many sentences."""
+    return PhraseProfile(profile_name, max_n, profile_args, builder_cls).build_phrases_for_sent(
+        sent
+    )
@@ -10,13 +10,53 @@ from pylp.word_obj import WordObj
 from pylp.utils import word_id_combiner
 
 
+def positions_mask(positions) -> int:
+    """Bitmask of positions in a sentence: bit i is set for position i."""
+    mask = 0
+    for pos in positions:
+        mask |= 1 << pos
+    return mask
+
+
+class PhraseIdMemo:
+    """Combined ids of phrases keyed by the ordered tuple of id parts.
+
+    Prefixes of parts are memoized too, so a phrase extended with a modifier
+    on the right costs one combine call. The memo may be shared by many
+    builders and sentences, it is cleared when it exceeds max_size entries.
+    """
+
+    def __init__(self, max_size: int = 100_000) -> None:
+        self._max_size = max_size
+        self._memo: dict[tuple, int] = {}
+        self.combine_calls = 0
+        # Calls that would be made by word_id_combiner for memoized parts
+        self.saved_combine_calls = 0
+
+    def combine(self, parts: tuple) -> int:
+        if len(parts) == 1:
+            return parts[0]
+        if (word_id := self._memo.get(parts)) is not None:
+            self.saved_combine_calls += len(parts) - 1
+            return word_id
+
+        word_id = libpyexbase.combine_word_id(self.combine(parts[:-1]), parts[-1])
+        self.combine_calls += 1
+        if len(self._memo) >= self._max_size:
+            self._memo.clear()
+        self._memo[parts] = word_id
+        return word_id
+
+
 class PhraseId:
-    def __init__(self, word_obj: Optional[WordObj] = None):
+    def __init__(self, word_obj: Optional[WordObj] = None, memo: PhraseIdMemo | None = None):
 
         self._prep_id = None
-        self._id: int = 0
+        # None if the id has to be calculated from _id_parts, see get_id
+        self._id: int | None = 0
         self._root = None
         self._id_parts = []
+        self._memo = memo
 
         if word_obj is not None:
             word_id = word_obj.word_id
@@ -25,9 +65,8 @@ class PhraseId:
             self._id = word_id
             self._root = word_id
             self._id_parts = [word_id]
-            extra = word_obj.extra
-            if lp.Attr.PREP_WHITE_LIST in extra:
-                _, _, prep_id = extra[lp.Attr.PREP_WHITE_LIST]
+            if (prep_mod := word_obj.get_extra(lp.Attr.PREP_WHITE_LIST)) is not None:
+                _, _, prep_id = prep_mod
                 self._prep_id = prep_id
 
     def __copy__(self):
@@ -37,9 +76,22 @@ class PhraseId:
         result.__dict__['_root'] = self._root
         result.__dict__['_id_parts'] = copy.copy(self._id_parts)
         result.__dict__['_prep_id'] = self._prep_id
+        result.__dict__['_memo'] = self._memo
         return result
 
+    def __getstate__(self):
+        # The memo is shared by builders, do not pickle it with every phrase
+        state = self.__dict__.copy()
+        state['_id'] = self.get_id()
+        state['_memo'] = None
+        return state
+
     def get_id(self, with_prep=False):
+        if self._id is None:
+            if self._memo is not None:
+                self._id = self._memo.combine(tuple(self._id_parts))
+            else:
+                self._id = word_id_combiner(self._id_parts)
         if with_prep and self._prep_id:
             return libpyexbase.combine_word_id(self._prep_id, self._id)
         return self._id
@@ -57,11 +109,12 @@ class PhraseId:
             while self._id_parts[i - 1] != self._root and mod_id < self._id_parts[i - 1]:
                 i -= 1
         self._id_parts.insert(i, mod_id)
-        self._id = word_id_combiner(self._id_parts)
+        # Calculated on demand, ids of dropped candidates are never combined
+        self._id = None
         return self
 
     def to_dict(self):
-        d = {'id': self._id}
+        d = {'id': self.get_id()}
         if self._prep_id is not None:
             d['prep_id'] = self._prep_id
         return d
@@ -74,7 +127,7 @@ class PhraseId:
         return phrase_id
 
     def __str__(self):
-        return self._id
+        return str(self.get_id())
 
 
 class HeadModifier:
@@ -95,9 +148,11 @@ class HeadModifier:
     @classmethod
     def from_dict(cls, dic):
         hm = cls()
-        use_shorthand_keys = 'prep_mod' in dic
-        hm.prep_modifier = dic.get('p' if use_shorthand_keys else 'prep_mod')
+        use_shorthand_keys = 'prep_mod' not in dic and 'repr_mod_suffix' not in dic
+        prep_modifier = dic.get('p' if use_shorthand_keys else 'prep_mod')
+        hm.prep_modifier = tuple(prep_modifier) if prep_modifier is not None else None
         hm.repr_mod_suffix = dic.get('r' if use_shorthand_keys else 'repr_mod_suffix')
+        return hm
 
 
 class ReprEnhType(IntEnum):
@@ -144,10 +199,13 @@ class Phrase:
         id_holder: PhraseId | None = None,
         head_modifier: HeadModifier | None = None,
         repr_modifiers: List[List[ReprEnhancer] | None] | None = None,
+        sent_pos_mask: int | None = None,
     ):
         self._size = size
         self._head_pos = head_pos
         self._sent_pos_list = sent_pos_list if sent_pos_list is not None else []
+        # Calculated from _sent_pos_list on demand, see get_sent_pos_mask
+        self._sent_pos_mask = sent_pos_mask
         if self._size == 0:
             self._size = len(self._sent_pos_list)
         self._words = words if words is not None else []
@@ -159,21 +217,24 @@ class Phrase:
         self.phrase_type = PhraseType.DEFAULT
 
     @classmethod
-    def from_word(cls: type["Phrase"], pos: int, word_obj: WordObj):
+    def from_word(
+        cls: type["Phrase"], pos: int, word_obj: WordObj, id_memo: PhraseIdMemo | None = None
+    ):
         if word_obj.lemma is None:
             raise RuntimeError("Unindentified word")
 
-        prep_mod = word_obj.extra.get(lp.Attr.PREP_WHITE_LIST)
-        repr_mod_suffix = word_obj.extra.get(lp.Attr.REPR_MOD_SUFFIX)
+        prep_mod = word_obj.get_extra(lp.Attr.PREP_WHITE_LIST)
+        repr_mod_suffix = word_obj.get_extra(lp.Attr.REPR_MOD_SUFFIX)
         return cls(
             size=1,
             head_pos=0,
             sent_pos_list=[pos],
             words=[word_obj.lemma],
             deps=[0],
-            id_holder=PhraseId(word_obj),
+            id_holder=PhraseId(word_obj, id_memo),
             head_modifier=HeadModifier(prep_modifier=prep_mod, repr_mod_suffix=repr_mod_suffix),
             repr_modifiers=[None],
+            sent_pos_mask=1 << pos,
         )
 
     def size(self):
@@ -184,6 +245,9 @@ class Phrase:
         string for a phrase."""
         return self._head_modifier
 
+    def set_head_modifier(self, head_modifier: HeadModifier):
+        self._head_modifier = head_modifier
+
     def get_head_pos(self):
         """Relative position of the head in the phrase."""
         return self._head_pos
@@ -194,11 +258,18 @@ class Phrase:
 
     def set_sent_pos_list(self, sent_pos_list):
         self._sent_pos_list = sent_pos_list
+        self._sent_pos_mask = None
 
     def get_sent_pos_list(self):
         """Positions of phrase parts in the sentence."""
         return self._sent_pos_list
 
+    def get_sent_pos_mask(self) -> int:
+        """Positions of phrase parts in the sentence as a bitmask."""
+        if self._sent_pos_mask is None:
+            self._sent_pos_mask = positions_mask(self._sent_pos_list)
+        return self._sent_pos_mask
+
     def get_words(self):
         return self._words
 
@@ -250,19 +321,7 @@ class Phrase:
         )
 
     def contains(self, other: "Phrase"):
-        if not self.overlaps(other):
-            return False
-        other_pos_list = other.get_sent_pos_list()
-        i = j = 0
-        while i < len(other_pos_list):
-            if other_pos_list[i] < self._sent_pos_list[j]:
-                return False
-            if other_pos_list[i] == self._sent_pos_list[j]:
-                j += 1
-                i += 1
-            else:
-                j += 1
-        return True
+        return other.get_sent_pos_mask() & ~self.get_sent_pos_mask() == 0
 
     def to_dict(self, use_shorthand_keys: bool = False):
         d = {
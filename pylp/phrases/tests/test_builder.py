@@ -3,17 +3,28 @@
 
 import copy
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
-from pylp.phrases.phrase import Phrase
+import pytest
+
+from pylp.phrases.phrase import Phrase, PhraseIdMemo
 from pylp.phrases.builder import (
     BasicPhraseBuilder,
+    BasicPhraseBuilderOpts,
     PhraseBuilder,
+    PhraseBuilderOpts,
+    PhraseFreqScorer,
+    PhraseTable,
+    SentAnalysis,
     dispatch_phrase_building,
     make_new_phrase,
 )
 
 import pylp.common as lp
+import pylp.phrases.builder as builder_module
 from pylp.word_obj import WordObj
+from pylp.columnar import ColumnarSent
+from pylp.utils import word_id_combiner
 from pylp import lp_doc
 
 
@@ -164,6 +175,90 @@ def test_phrases_builder_2():
     assert str_phrases == etal_phrases
 
 
+def _create_fanout_sent():
+    words = [
+        _mkw('m0', 3),
+        _mkw('m1', 2),
+        _mkw('m2', 1),
+        _mkw('r', 0),
+        _mkw('m4', -1, lp.PosTag.NOUN),
+        _mkw('m5', -2),
+    ]
+    return lp_doc.Sent(words)
+
+
+def test_beam_search():
+    sent = _create_fanout_sent()
+    all_phrases = _TestPhraseBuilder(3).build_phrases_for_sent(sent)
+
+    builder = _TestPhraseBuilder(3, BasicPhraseBuilderOpts(beam_size=100))
+    phrases = builder.build_phrases_for_sent(sent)
+    assert sorted(map(_p2str, phrases)) == sorted(map(_p2str, all_phrases))
+
+    # The closest modifiers survive, a noun is preferred on the same distance
+    builder = _TestPhraseBuilder(2, BasicPhraseBuilderOpts(beam_size=1))
+    assert [_p2str(p) for p in builder.build_phrases_for_sent(sent)] == ['r_m4']
+    builder = _TestPhraseBuilder(3, BasicPhraseBuilderOpts(beam_size=2))
+    str_phrases = [_p2str(p) for p in builder.build_phrases_for_sent(sent)]
+    assert str_phrases == ['r_m4', 'm2_r', 'm2_r_m4', 'm1_r_m4']
+
+
+def test_beam_search_freq_scorer():
+    sent = _create_fanout_sent()
+    phrase_id = next(
+        p.get_id()
+        for p in _TestPhraseBuilder(2).build_phrases_for_sent(sent)
+        if _p2str(p) == 'm0_r'
+    )
+    opts = BasicPhraseBuilderOpts(beam_size=1, phrase_scorer=PhraseFreqScorer({phrase_id: 10}))
+    phrases = _TestPhraseBuilder(2, opts).build_phrases_for_sent(sent)
+    assert [_p2str(p) for p in phrases] == ['m0_r']
+
+
+@pytest.mark.parametrize('freq_scorer', [False, True])
+def test_beam_search_does_not_create_candidates(monkeypatch, freq_scorer):
+    sent = _create_fanout_sent()
+    merged = []
+    merge_phrases = builder_module._merge_phrases
+
+    def _merge_phrases(*args):
+        merged.append(merge_phrases(*args))
+        return merged[-1]
+
+    monkeypatch.setattr(builder_module, '_merge_phrases', _merge_phrases)
+    opts = BasicPhraseBuilderOpts(
+        beam_size=2, phrase_scorer=PhraseFreqScorer({}) if freq_scorer else None
+    )
+    builder = _TestPhraseBuilder(4, opts)
+    collect_phrases = builder._collect_phrases
+    created_before_collect = []
+
+    def _collect_phrases(*args):
+        created_before_collect.append(len(merged))
+        return collect_phrases(*args)
+
+    monkeypatch.setattr(builder, '_collect_phrases', _collect_phrases)
+    phrases = builder.build_phrases_for_sent(sent)
+    # Candidates are scored by the table rows, only returned phrases are created
+    assert created_before_collect == [0]
+    assert len(merged) == len(phrases)
+
+
+@pytest.mark.parametrize('max_n', [1, 2, 4])
+def test_iter_phrases(max_n):
+    for sent in (_create_sent(), _create_complex_sent(), _create_fanout_sent()):
+        builder = _TestPhraseBuilder(max_n)
+        phrases = [_p2str(p) for p in builder.build_phrases_for_sent(sent)]
+        iter_phrases = [_p2str(p) for p in builder.iter_phrases_for_sent(sent)]
+        assert sorted(iter_phrases) == sorted(phrases)
+        # level by level
+        sizes = [len(p.split('_')) for p in iter_phrases]
+        assert sizes == sorted(sizes)
+
+    it = _TestPhraseBuilder(4).iter_phrases_for_sent(_create_complex_sent())
+    assert next(it).size() == 2
+
+
 def test_multiple_right_mods():
     sent = lp_doc.Sent([_mkw('r', 0), _mkw('m1', 1), _mkw('h1', -2), _mkw('h2', -3)])
 
@@ -579,6 +674,23 @@ def test_phrase_id():
     assert phrase_id == phrase_id2
 
 
+def test_phrase_id_memo():
+    sent = _create_complex_sent()
+    memo = PhraseIdMemo()
+    builder = _TestPhraseBuilder(4, BasicPhraseBuilderOpts(id_memo=memo))
+    expected = [p.get_id() for p in _TestPhraseBuilder(4).build_phrases_for_sent(sent)]
+
+    assert [p.get_id() for p in builder.build_phrases_for_sent(sent)] == expected
+    combine_calls = memo.combine_calls
+    assert combine_calls > 0
+    # The memo is shared across sentences
+    assert [p.get_id() for p in builder.build_phrases_for_sent(sent)] == expected
+    assert memo.combine_calls == combine_calls
+    assert memo.saved_combine_calls > combine_calls
+
+    assert memo.combine((1, 2, 3)) == word_id_combiner([1, 2, 3])
+
+
 def test_phrase_id2():
     words = [
         _mkw('r', 0, lp.PosTag.NOUN, lp.SyntLink.ROOT),
@@ -705,6 +817,32 @@ def test_dispatcher_vp_conj_2():
     assert phrases[0].get_str_repr() == 'v1 n1'
 
 
+def test_shared_sent_analysis():
+    words = [
+        _mkw('v1', 0, lp.PosTag.VERB, lp.SyntLink.ROOT),
+        _mkw('v2', -1, lp.PosTag.VERB, lp.SyntLink.CONJ),
+        _mkw('amod', 1, lp.PosTag.ADJ, lp.SyntLink.AMOD),
+        _mkw('n1', -3, lp.PosTag.NOUN, lp.SyntLink.OBJ),
+        _mkw('n2', -1, lp.PosTag.NOUN, lp.SyntLink.CONJ),
+    ]
+    vp_opts = PhraseBuilderOpts()
+    vp_opts.good_mod_PoS = frozenset([lp.PosTag.NOUN, lp.PosTag.PROPN])
+    vp_opts.good_head_PoS = frozenset([lp.PosTag.VERB])
+    builders = [PhraseBuilder(4), PhraseBuilder(4, vp_opts)]
+
+    sent = lp_doc.Sent(words)
+    expected = [[p.to_dict() for p in b.build_phrases_for_sent(sent)] for b in builders]
+
+    analysis = SentAnalysis(sent)
+    assert analysis.resolved_heads[4] == (0, sent[3])
+    assert analysis.aux_info_list[3].conj_mask == 0b11000
+    for b, exp in zip(builders, expected):
+        assert [p.to_dict() for p in b.build_phrases_for_sent(sent, analysis=analysis)] == exp
+
+    with pytest.raises(RuntimeError):
+        builders[0].build_phrases_for_sent(lp_doc.Sent(words), analysis=analysis)
+
+
 # * Misc tests
 
 
@@ -791,3 +929,107 @@ def test_contains():
     assert not m4_h2.contains(h1_m4_h2)
     assert not m4_h2.contains(r_h1_m4_h2)
     assert m4_h2.contains(m4_h2)
+
+
+def test_sent_pos_mask():
+    sent = lp_doc.Sent([_mkw('m1', 2), _mkw('m2', 1), _mkw('r', 0)])
+    root = Phrase.from_word(2, sent[2])
+    mod1 = Phrase.from_word(0, sent[0])
+    mod2 = Phrase.from_word(1, sent[1])
+    assert root.get_sent_pos_mask() == 0b100
+
+    phrases_cache = set()
+    p1 = make_new_phrase(
+        make_new_phrase(root, mod1, sent, phrases_cache), mod2, sent, phrases_cache
+    )
+    assert p1.get_sent_pos_mask() == 0b111
+    assert p1.get_sent_pos_list() == [0, 1, 2]
+    # The same positions via the other order of modifiers
+    p2 = make_new_phrase(root, mod2, sent, phrases_cache)
+    assert make_new_phrase(p2, mod1, sent, phrases_cache) is None
+
+    with pytest.raises(RuntimeError):
+        make_new_phrase(p1, mod1, sent, set())
+
+    p1.set_sent_pos_list([3, 4, 6])
+    assert p1.get_sent_pos_mask() == 0b1011000
+
+
+def test_phrase_table():
+    sent = lp_doc.Sent([_mkw('m1', 2), _mkw('m2', 1), _mkw('r', 0)])
+    table = PhraseTable(sent)
+    root, mod1, mod2 = (table.add_phrase(Phrase.from_word(i, sent[i])) for i in (2, 0, 1))
+
+    phrases_cache = set()
+    row = table.merge(table.merge(root, mod1, phrases_cache), mod2, phrases_cache)
+    assert table.merge(table.merge(root, mod2, phrases_cache), mod1, phrases_cache) is None
+    assert len(table) == 6
+    assert table.masks[row] == 0b111
+    assert table.head_positions[row] == 2
+    # Phrases of merged rows are not created until accessed
+    assert table._phrases.count(None) == 3
+
+    expected = make_new_phrase(
+        make_new_phrase(table.phrase(root), table.phrase(mod1), sent, set()),
+        table.phrase(mod2),
+        sent,
+        set(),
+    )
+    assert table.phrase(row).to_dict() == expected.to_dict()
+    assert table.phrase(row) is table.phrase(row)
+
+    with pytest.raises(RuntimeError):
+        table.merge(row, mod1, set())
+
+
+def test_partitioned_sent():
+    words = [
+        _mkw('h1', 0, lp.PosTag.NOUN, lp.SyntLink.ROOT),
+        _mkw('of', 2, lp.PosTag.ADP, lp.SyntLink.CASE),
+        _mkw('m1', 1, lp.PosTag.ADJ, lp.SyntLink.AMOD),
+        _mkw('h2', -3, lp.PosTag.NOUN, lp.SyntLink.NMOD),
+    ]
+    sent = lp_doc.Sent(words + [copy.copy(w) for w in words])
+
+    def _build(max_part_len, executor=None):
+        opts = PhraseBuilderOpts()
+        opts.max_part_len = max_part_len
+        phrases = PhraseBuilder(4, opts).build_phrases_for_sent(
+            copy.deepcopy(sent), executor=executor
+        )
+        return sorted(str(p.to_dict()) for p in phrases)
+
+    expected = _build(None)
+    assert len(expected) == 6
+    assert _build(4) == expected
+    with ThreadPoolExecutor(2) as executor:
+        assert _build(4, executor) == expected
+
+    # No size limit for long sentences
+    long_sent = lp_doc.Sent([copy.copy(w) for _ in range(600) for w in _create_complex_sent()])
+    builder = _TestPhraseBuilder(2)
+    phrases = builder.build_phrases_for_sent(long_sent)
+    assert len(phrases) == 600 * len(builder.build_phrases_for_sent(_create_complex_sent()))
+    assert max(p.get_sent_pos_list()[-1] for p in phrases) == len(long_sent) - 1
+
+
+def test_partitioned_columnar_sent():
+    words = []
+    for i in range(4):
+        words += [
+            # Roots of the parts are linked to the first one by parataxis
+            _mkw('h1', -4 * i, lp.PosTag.NOUN, lp.SyntLink.PARATAXIS if i else lp.SyntLink.ROOT),
+            _mkw('of', 2, lp.PosTag.ADP, lp.SyntLink.CASE),
+            _mkw('m1', 1, lp.PosTag.ADJ, lp.SyntLink.AMOD),
+            _mkw('h2', -3, lp.PosTag.NOUN, lp.SyntLink.NMOD),
+        ]
+    sent = ColumnarSent.from_sent(lp_doc.Sent(words))
+    expected = sorted(str(p.to_dict()) for p in PhraseBuilder(4).build_phrases_for_sent(sent))
+    sent_dict = sent.to_dict()
+
+    opts = PhraseBuilderOpts()
+    opts.max_part_len = 4
+    phrases = PhraseBuilder(4, opts).build_phrases_for_sent(sent)
+    assert sorted(str(p.to_dict()) for p in phrases) == expected
+    # The input sentence is not changed
+    assert sent.to_dict() == sent_dict
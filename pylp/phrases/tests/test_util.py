@@ -4,10 +4,13 @@
 import copy
 from pylp import lp_doc
 
+import pytest
+
 from pylp.phrases.builder import (
     Phrase,
     PhraseBuilder,
     PhraseBuilderOpts,
+    PhraseProfile,
 )
 from pylp.phrases.phrase import PhraseType
 from pylp.phrases.util import replace_words_with_phrases, add_phrases_to_doc
@@ -81,6 +84,23 @@ def test_add_phrases_to_doc():
     assert str_phrases == ['h1 of h3']
 
 
+@pytest.mark.parametrize('profile_name', ['noun_phrases', 'verb+noun_phrases'])
+def test_add_phrases_to_doc_with_profile(profile_name):
+    expected = _create_doc_obj()
+    add_phrases_to_doc(expected, 4, profile_name=profile_name)
+
+    profile = PhraseProfile(profile_name, 4)
+    for _ in range(2):
+        doc_obj = _create_doc_obj()
+        add_phrases_to_doc(doc_obj, 4, profile=profile)
+        assert doc_obj.to_dict() == expected.to_dict()
+
+    with pytest.raises(RuntimeError):
+        add_phrases_to_doc(doc_obj, 4, profile_name=profile_name, profile=profile)
+    with pytest.raises(RuntimeError):
+        PhraseProfile('unknown', 4)
+
+
 def test_add_phrases_to_doc_with_min_cnt():
     doc_obj = _create_doc_obj()
     add_phrases_to_doc(doc_obj, 4, min_cnt=2, profile_name='noun_phrases')
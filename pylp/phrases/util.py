@@ -12,7 +12,7 @@ from pylp.phrases.builder import (
     PhraseBuilder,
     PhraseBuilderOpts,
     PhraseBuilderProfileArgs,
-    dispatch_phrase_building,
+    PhraseProfile,
 )
 from pylp.phrases.phrase import Phrase
 
@@ -43,27 +43,25 @@ def add_phrases_to_doc(
     profile_args: PhraseBuilderProfileArgs = PhraseBuilderProfileArgs(),
     builder_opts: PhraseBuilderOpts | None = None,
     builder_cls=PhraseBuilder,
+    profile: PhraseProfile | None = None,
 ):
-    """Pass either profile_name or builder_opts. If profile_name is not empty
-    call dispatch_phrase_building with specified profile_name. Otherwise call
-    builder_cls(phrases_max_n, builder_opts).build_phrases_for_sent for each
-    sentence in the doc.
+    """Pass either profile, profile_name or builder_opts. If profile is passed,
+    it is used for each sentence in the doc (phrases_max_n of the profile is
+    used). If profile_name is not empty, PhraseProfile is compiled for this doc.
+    Otherwise call builder_cls(phrases_max_n, builder_opts).build_phrases_for_sent
+    for each sentence in the doc.
+
+    Compile PhraseProfile once and pass it as profile when processing many docs.
     """
-    if not profile_name and builder_opts is None:
-        raise RuntimeError("Pass either profile_name or builder_opts!")
-    if profile_name and builder_opts:
-        raise RuntimeError("Pass either profile_name or builder_opts!")
+    if sum((profile is not None, bool(profile_name), builder_opts is not None)) != 1:
+        raise RuntimeError("Pass either profile, profile_name or builder_opts!")
+
+    if profile is None and profile_name:
+        profile = PhraseProfile(profile_name, phrases_max_n, profile_args, builder_cls)
 
-    if profile_name:
+    if profile is not None:
         for sent in doc_obj:
-            phrases = dispatch_phrase_building(
-                profile_name,
-                sent,
-                phrases_max_n,
-                profile_args=profile_args,
-                builder_cls=builder_cls,
-            )
-            sent.set_phrases(phrases)
+            sent.set_phrases(profile.build_phrases_for_sent(sent))
     elif builder_opts is not None:
         builder: BasicPhraseBuilder = builder_cls(phrases_max_n, builder_opts)
         for sent in doc_obj:
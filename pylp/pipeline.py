@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+
+"""Parallel processing of docs by an ordered list of stages.
+
+Example:
+    pipeline = Pipeline(
+        [
+            ('convert', {}),
+            ('lemmatize', {}),
+            ('filter', {'kinds': ['punct', 'determiner']}),
+            ('phrases', {'phrases_max_n': 4, 'profile_name': 'noun_phrases'}),
+            ('inflect', {}),
+        ],
+        processes=8,
+    )
+    for doc in pipeline.process((lp_doc.Doc(id, text=text), conll) for id, text, conll in inputs):
+        ...
+
+Stages are created and loaded once per worker process, so heavy resources
+(lemmatizer dictionaries, pymorphy2) are not reloaded for every doc. Docs are
+transferred between processes in the binary format.
+
+With cache_dir results are cached on disk by the doc text and the stages
+configuration (see ResultCache), workers share the cache directory.
+"""
+
+import collections
+import itertools
+import logging
+import multiprocessing
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pylp import lp_doc
+from pylp import word_id_cache
+from pylp.converter_conll_ud_v1 import ConverterConllUDV1
+from pylp.filtratus import Filtratus
+from pylp.lemmas.lemmatizer import Lemmatizer
+from pylp.phrases import inflect
+from pylp.phrases.builder import PhraseBuilder, PhraseBuilderProfileArgs, PhraseProfile
+from pylp.phrases.util import add_phrases_to_doc
+from pylp.post_processors import PostProcessor
+from pylp.result_cache import ResultCache, make_fingerprint
+
+StageConfigType = Tuple[Any, Dict[str, Any]]
+PipelineItemType = lp_doc.Doc | Tuple[lp_doc.Doc, Optional[str]]
+# (cache_dir, fingerprint, max_size)
+CacheConfigType = Tuple[str, str, int]
+
+
+class Stage:
+    name = 'stage'
+
+    def load(self):
+        """Load heavy resources. Called once in every worker process."""
+
+    def process(self, doc: lp_doc.Doc):
+        raise NotImplementedError("ABC")
+
+    def __call__(self, doc: lp_doc.Doc, conll_raw_text: Optional[str] = None):
+        self.process(doc)
+
+
+class ConvertStage(Stage):
+    name = 'convert'
+
+    def __init__(self, **kwargs) -> None:
+        """See ConverterConllUDV1 for kwargs, e.g. fields=ConvFields.INDEX."""
+        self._kwargs = kwargs
+
+    def load(self):
+        self._converter = ConverterConllUDV1(**self._kwargs)
+
+    def __call__(self, doc: lp_doc.Doc, conll_raw_text: Optional[str] = None):
+        if conll_raw_text is None:
+            raise RuntimeError(f"No conll text for the doc {doc.doc_id}")
+        self._converter(doc.text, conll_raw_text, doc)
+
+
+class LemmatizeStage(Stage):
+    name = 'lemmatize'
+
+    def __init__(self, **kwargs) -> None:
+        self._kwargs = kwargs
+
+    def load(self):
+        self._lemmatizer = Lemmatizer(**self._kwargs)
+
+    def process(self, doc: lp_doc.Doc):
+        self._lemmatizer(doc)
+
+
+class WordIdsStage(Stage):
+    name = 'word_ids'
+
+    def process(self, doc: lp_doc.Doc):
+        lp_doc.assign_word_ids_and_word_langs([doc])
+
+
+class FilterStage(Stage):
+    name = 'filter'
+
+    def __init__(self, kinds, **filters_kwargs) -> None:
+        self._kinds = kinds
+        self._filters_kwargs = filters_kwargs
+
+    def load(self):
+        self._filter = Filtratus(self._kinds, self._filters_kwargs).compile(self._kinds)
+
+    def process(self, doc: lp_doc.Doc):
+        for sent in doc:
+            self._filter.filter_sent(sent)
+
+
+class PostProcessStage(Stage):
+    name = 'postprocess'
+
+    def __init__(self, kinds, proc_kwargs=None, proc_params=None) -> None:
+        self._kinds = kinds
+        self._proc_kwargs = proc_kwargs or {}
+        self._proc_params = proc_params or {}
+
+    def load(self):
+        self._post_processor = PostProcessor(self._kinds, **self._proc_kwargs)
+
+    def process(self, doc: lp_doc.Doc):
+        self._post_processor(self._kinds, doc.text, doc, **self._proc_params)
+
+
+class PhrasesStage(Stage):
+    name = 'phrases'
+
+    def __init__(self, **kwargs) -> None:
+        """See add_phrases_to_doc for kwargs."""
+        self._kwargs = kwargs
+
+    def load(self):
+        # The profile is compiled once per worker, not for every doc
+        kwargs = dict(self._kwargs)
+        if profile_name := kwargs.pop('profile_name', ''):
+            kwargs['profile'] = PhraseProfile(
+                profile_name,
+                kwargs['phrases_max_n'],
+                kwargs.pop('profile_args', PhraseBuilderProfileArgs()),
+                kwargs.pop('builder_cls', PhraseBuilder),
+            )
+        self._load_kwargs = kwargs
+
+    def process(self, doc: lp_doc.Doc):
+        add_phrases_to_doc(doc, **self._load_kwargs)
+
+
+class InflectStage(Stage):
+    name = 'inflect'
+
+    def __init__(self, cache_max_size: int = -1) -> None:
+        self._cache_max_size = cache_max_size
+
+    def load(self):
+        # pymorphy2 is loaded by the inflectors
+        inflect._get_ru_inflector()
+        inflect._get_en_inflector()
+
+    def process(self, doc: lp_doc.Doc):
+        for sent in doc:
+            for phrase in sent.phrases():
+                inflect.inflect_phrase(phrase, sent, doc.lang, self._cache_max_size)
+
+
+_STAGES = {
+    cls.name: cls
+    for cls in (
+        ConvertStage,
+        LemmatizeStage,
+        WordIdsStage,
+        FilterStage,
+        PostProcessStage,
+        PhrasesStage,
+        InflectStage,
+    )
+}
+
+
+def create_stage(kind, **kwargs) -> Stage:
+    """kind is either a name of the stage or a Stage subclass."""
+    if isinstance(kind, type) and issubclass(kind, Stage):
+        return kind(**kwargs)
+    if kind in _STAGES:
+        return _STAGES[kind](**kwargs)
+    raise RuntimeError("Unknown pipeline stage: %s" % kind)
+
+
+class PipelineStats:
+    def __init__(self) -> None:
+        self.docs = 0
+        self.tokens = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    def docs_per_sec(self) -> float:
+        return self.docs / self.seconds if self.seconds else 0.0
+
+    def tokens_per_sec(self) -> float:
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"docs: {self.docs}, tokens: {self.tokens}, errors: {self.errors}, "
+            f"{self.docs_per_sec():.1f} docs/s, {self.tokens_per_sec():.1f} tokens/s"
+        )
+
+
+# * Worker
+#
+# Stages and result cache of a pool worker process, they are loaded by _init_worker
+_WORKER_STAGES: List[Stage] = []
+_WORKER_CACHE: Optional[ResultCache] = None
+
+
+def _init_stages(
+    stages_config: List[StageConfigType],
+    word_id_cache_path: Optional[str],
+    cache_config: Optional[CacheConfigType] = None,
+) -> Tuple[List[Stage], Optional[ResultCache]]:
+    """Prepare the current process and return loaded stages and result cache."""
+    if word_id_cache_path:
+        word_id_cache.load_word_id_cache(word_id_cache_path)
+    stages = [create_stage(kind, **kwargs) for kind, kwargs in stages_config]
+    for stage in stages:
+        stage.load()
+    cache = ResultCache(*cache_config) if cache_config is not None else None
+    return stages, cache
+
+
+def _init_worker(
+    stages_config: List[StageConfigType],
+    word_id_cache_path: Optional[str],
+    cache_config: Optional[CacheConfigType] = None,
+):
+    global _WORKER_STAGES, _WORKER_CACHE
+    _WORKER_STAGES, _WORKER_CACHE = _init_stages(stages_config, word_id_cache_path, cache_config)
+
+
+def _process_chunk(chunk: List[Tuple[bytes, Optional[str]]]):
+    return [_process_item_with_stages(_WORKER_STAGES, item, _WORKER_CACHE) for item in chunk]
+
+
+def _process_item_with_stages(
+    stages: List[Stage], item: Tuple[bytes, Optional[str]], cache: Optional[ResultCache] = None
+):
+    """Return (encoded doc, tokens count, None) or (None, 0, error message)."""
+    buf, conll_raw_text = item
+    doc = None
+    try:
+        doc = lp_doc.Doc.from_bytes(buf)
+        if cache is not None and doc.text_hash is not None:
+            cached = cache.get(doc.text_hash, doc.doc_id)
+            if cached is not None:
+                return cached.to_bytes(), sum(len(s) for s in cached), None
+        for stage in stages:
+            stage(doc, conll_raw_text)
+        if cache is not None and doc.text_hash is not None:
+            cache.put(doc)
+        return doc.to_bytes(), sum(len(s) for s in doc), None
+    except Exception as ex:
+        doc_id = doc.doc_id if doc is not None else '?'
+        logging.debug("Failed to process doc %s", doc_id, exc_info=True)
+        return None, 0, f"{doc_id}: {type(ex).__name__}: {ex}"
+
+
+def _encode_item(item: PipelineItemType) -> Tuple[bytes, Optional[str]]:
+    if isinstance(item, lp_doc.Doc):
+        return item.to_bytes(), None
+    doc, conll_raw_text = item
+    return doc.to_bytes(), conll_raw_text
+
+
+class Pipeline:
+    """Processes docs by stages in a pool of processes.
+
+    stages is the list of (kind, kwargs) pairs, see create_stage. Items passed
+    to process() are docs or (doc, conll_raw_text) pairs for the convert stage.
+    Processed docs are yielded in the input order as soon as they are ready.
+    When skip_errors is True, docs that failed are skipped and their errors
+    are collected in self.errors, otherwise RuntimeError is raised.
+
+    Items are read lazily: at most prefetch chunks of chunksize items per
+    process are submitted ahead of the consumer. With processes <= 1 docs are
+    processed in the calling process by stages owned by this pipeline, the
+    word id cache from word_id_cache_path is loaded into this process then.
+
+    When cache_dir is set, processed docs are cached there by their text and
+    the stages configuration, docs without text are always processed. The
+    cache is shared by the worker processes and is bounded by cache_max_size
+    bytes.
+    """
+
+    def __init__(
+        self,
+        stages: List[StageConfigType],
+        processes: int = 1,
+        chunksize: int = 4,
+        skip_errors: bool = False,
+        word_id_cache_path: Optional[str] = None,
+        prefetch: int = 2,
+        cache_dir: Optional[str] = None,
+        cache_max_size: int = 1 << 30,
+    ) -> None:
+        self._stages_config = list(stages)
+        self._processes = processes
+        self._chunksize = chunksize
+        self._prefetch = prefetch
+        self._skip_errors = skip_errors
+        self._word_id_cache_path = word_id_cache_path
+        self._cache_config: Optional[CacheConfigType] = None
+        if cache_dir is not None:
+            fingerprint = make_fingerprint(stages=self._stages_config)
+            self._cache_config = (cache_dir, fingerprint, cache_max_size)
+        self.stats = PipelineStats()
+        self.errors: List[str] = []
+
+    def _results(self, encoded_items: Iterable[Tuple[bytes, Optional[str]]]):
+        initargs = (self._stages_config, self._word_id_cache_path, self._cache_config)
+        if self._processes <= 1:
+            stages, cache = _init_stages(*initargs)
+            for item in encoded_items:
+                yield _process_item_with_stages(stages, item, cache)
+            return
+
+        # Pool.imap reads all input ahead, so chunks are submitted while the
+        # number of pending ones is bounded
+        items = iter(encoded_items)
+        max_pending = max(1, self._prefetch * self._processes)
+        pending: collections.deque = collections.deque()
+        with multiprocessing.Pool(
+            self._processes, initializer=_init_worker, initargs=initargs
+        ) as pool:
+            while True:
+                while len(pending) < max_pending and (
+                    chunk := list(itertools.islice(items, self._chunksize))
+                ):
+                    pending.append(pool.apply_async(_process_chunk, (chunk,)))
+                if not pending:
+                    break
+                yield from pending.popleft().get()
+
+    def process(self, items: Iterable[PipelineItemType]) -> Iterator[lp_doc.Doc]:
+        start = time.perf_counter()
+        for buf, tokens_cnt, error in self._results(map(_encode_item, items)):
+            self.stats.seconds = time.perf_counter() - start
+            if error is not None:
+                self.stats.errors += 1
+                self.errors.append(error)
+                if not self._skip_errors:
+                    raise RuntimeError(f"Failed to process doc {error}")
+                logging.debug("Skipped doc %s", error)
+                continue
+            self.stats.docs += 1
+            self.stats.tokens += tokens_cnt
+            yield lp_doc.Doc.from_bytes(buf)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""On-disk cache of processed docs keyed by text hash and pipeline configuration."""
+
+import collections
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Optional
+
+from pylp import lp_doc
+
+_SUFFIX = '.bin'
+
+
+def make_fingerprint(**options) -> str:
+    """Stable fingerprint of processing options (converter, lemmatizer,
+    filters, phrase builder etc.). Values that are not JSON serializable are
+    represented by their str()."""
+    s = json.dumps(options, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(s.encode('utf8')).hexdigest()
+
+
+class CacheInfo:
+    def __init__(self, hits: int, misses: int, evictions: int, entries: int, size: int) -> None:
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+        self.entries = entries
+        self.size = size
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"CacheInfo(hits={self.hits}, misses={self.misses}, evictions={self.evictions}, "
+            f"entries={self.entries}, size={self.size})"
+        )
+
+
+class ResultCache:
+    """Maps (doc.text_hash, fingerprint) to the serialized processed doc.
+
+    Entries are stored as separate files in cache_dir, so several processes
+    may share the directory: entries written by other processes are adopted
+    on lookup. When the total size exceeds max_size bytes, the directory is
+    rescanned and the least recently used entries (by mtime) are deleted. The
+    directory is also rescanned after rescan_size bytes were written by this
+    process, since other processes grow the cache too.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path,
+        fingerprint: str,
+        max_size: int = 1 << 30,
+        rescan_size: Optional[int] = None,
+    ) -> None:
+        self._dir = Path(cache_dir)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._fingerprint = fingerprint
+        self._max_size = max_size
+        self._rescan_size = max_size // 8 if rescan_size is None else rescan_size
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        # key -> size, ordered from the least recently used
+        self._entries: collections.OrderedDict[str, int] = collections.OrderedDict()
+        self._size = 0
+        # bytes written since the last scan of the directory
+        self._written = 0
+        self._load_entries()
+
+    def _load_entries(self):
+        files = []
+        for p in self._dir.glob(f'*/*{_SUFFIX}'):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                # evicted by another process
+                continue
+            files.append((st.st_mtime, p.stem, st.st_size))
+        files.sort()
+        self._entries.clear()
+        self._size = 0
+        self._written = 0
+        for _, key, size in files:
+            self._entries[key] = size
+            self._size += size
+        logging.debug("Loaded %d cache entries of %d bytes", len(self._entries), self._size)
+
+    def _key(self, text_hash: str) -> str:
+        return hashlib.sha1(f'{self._fingerprint}:{text_hash}'.encode('utf8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self._dir / key[:2] / (key + _SUFFIX)
+
+    def get(self, text_hash: str, doc_id: Optional[str] = None) -> Optional[lp_doc.Doc]:
+        """Return cached doc or None. If doc_id is passed it is assigned to the
+        returned doc, since the same text may come with different ids."""
+        key = self._key(text_hash)
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            # not cached yet or deleted by another process
+            self._size -= self._entries.pop(key, 0)
+            self._misses += 1
+            return None
+
+        # the entry may be written by another process
+        self._size += len(data) - self._entries.pop(key, 0)
+        self._entries[key] = len(data)
+        self._hits += 1
+        doc = lp_doc.Doc.from_bytes(data)
+        if doc_id is not None:
+            doc.doc_id = doc_id
+        return doc
+
+    def put(self, doc: lp_doc.Doc):
+        if doc.text_hash is None:
+            raise RuntimeError(f"Can't cache doc without text: {doc.doc_id}")
+        key = self._key(doc.text_hash)
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        data = doc.to_bytes()
+        tmp_path = path.with_name(path.name + f'.{os.getpid()}.tmp')
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        self._size += len(data) - self._entries.pop(key, 0)
+        self._entries[key] = len(data)
+        self._written += len(data)
+        self._evict()
+
+    def get_or_process(
+        self, doc: lp_doc.Doc, process: Callable[[lp_doc.Doc], lp_doc.Doc]
+    ) -> lp_doc.Doc:
+        """Return cached result for doc.text_hash or process the doc and cache the result."""
+        if doc.text_hash is not None:
+            cached = self.get(doc.text_hash, doc.doc_id)
+            if cached is not None:
+                return cached
+        result = process(doc)
+        if result.text_hash is not None:
+            self.put(result)
+        return result
+
+    def _evict(self):
+        if self._size > self._max_size or self._written > self._rescan_size:
+            # account for entries of other processes
+            self._load_entries()
+        while self._size > self._max_size and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self._evictions += 1
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self._hits, self._misses, self._evictions, len(self._entries), self._size)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+"""Append-only store of binary encoded docs with random access by doc_id.
+
+A store consists of two files:
+    <path>.seg - concatenated Doc.to_bytes() payloads;
+    <path>.idx - index sorted by doc_id: (doc_id, offset, length) entries.
+
+DocStore opens both files via mmap, so several reader processes share the
+page cache and docs are decoded directly from the mapped memory.
+"""
+
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from pylp import lp_doc
+from pylp import binary_codec
+
+SEGMENT_SUFFIX = '.seg'
+INDEX_SUFFIX = '.idx'
+
+_INDEX_MAGIC = b'PLPI'
+_INDEX_VERSION = 1
+_INDEX_HEADER = struct.Struct('<4sBQ')
+# key offset in keys blob, key length, payload offset, payload length
+_INDEX_ENTRY = struct.Struct('<QIQQ')
+
+
+class DocStoreError(RuntimeError):
+    pass
+
+
+def _read_index_entries(buf) -> List[Tuple[bytes, int, int]]:
+    index = _Index(buf)
+    return [(index.key(i), *index.location(i)) for i in range(len(index))]
+
+
+def _write_index(path: Path, entries: List[Tuple[bytes, int, int]]):
+    entries.sort(key=lambda e: e[0])
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, _INDEX_VERSION, len(entries)))
+        key_offset = 0
+        for key, offset, length in entries:
+            f.write(_INDEX_ENTRY.pack(key_offset, len(key), offset, length))
+            key_offset += len(key)
+        for key, _, _ in entries:
+            f.write(key)
+    os.replace(tmp_path, path)
+
+
+class _Index:
+    def __init__(self, buf) -> None:
+        magic, version, self._size = _INDEX_HEADER.unpack_from(buf, 0)
+        if magic != _INDEX_MAGIC or version != _INDEX_VERSION:
+            raise DocStoreError("Invalid index file")
+        self._buf = buf
+        self._keys_begin = _INDEX_HEADER.size + self._size * _INDEX_ENTRY.size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _entry(self, i: int):
+        return _INDEX_ENTRY.unpack_from(self._buf, _INDEX_HEADER.size + i * _INDEX_ENTRY.size)
+
+    def key(self, i: int) -> bytes:
+        key_offset, key_len, _, _ = self._entry(i)
+        begin = self._keys_begin + key_offset
+        return bytes(self._buf[begin : begin + key_len])
+
+    def location(self, i: int) -> Tuple[int, int]:
+        _, _, offset, length = self._entry(i)
+        return offset, length
+
+    def find(self, key: bytes) -> Optional[Tuple[int, int]]:
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._size and self.key(lo) == key:
+            return self.location(lo)
+        return None
+
+
+class DocStoreWriter:
+    """Appends docs to the store. The index is rewritten on close; if the
+    same doc_id is added again, the latest payload wins."""
+
+    def __init__(self, path: str | Path) -> None:
+        self._seg_path = Path(str(path) + SEGMENT_SUFFIX)
+        self._idx_path = Path(str(path) + INDEX_SUFFIX)
+        self._entries: dict[bytes, Tuple[int, int]] = {}
+        if self._idx_path.exists():
+            with open(self._idx_path, 'rb') as f:
+                for key, offset, length in _read_index_entries(f.read()):
+                    self._entries[key] = (offset, length)
+
+        self._seg_file = open(self._seg_path, 'ab')
+        self._offset = self._seg_file.tell()
+
+    def add(self, doc: lp_doc.Doc):
+        payload = doc.to_bytes()
+        self._seg_file.write(payload)
+        self._entries[doc.doc_id.encode('utf8')] = (self._offset, len(payload))
+        self._offset += len(payload)
+
+    def close(self):
+        if self._seg_file.closed:
+            return
+        self._seg_file.close()
+        _write_index(self._idx_path, [(k, o, l) for k, (o, l) in self._entries.items()])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DocStore:
+    """Read-only mmap based store.
+
+    Docs and payloads returned by the store are not copied: they reference
+    the mapped segment, and lazy docs decode sentences from it on the first
+    access. They stay valid after the store is closed, since the mapping is
+    unmapped only when the last of them is released. Pass copy=True to get
+    and get_payload to get docs and payloads that own a copy of the bytes.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self._seg_file = open(str(path) + SEGMENT_SUFFIX, 'rb')
+        self._idx_file = open(str(path) + INDEX_SUFFIX, 'rb')
+        self._seg_mm = self._mmap(self._seg_file)
+        self._idx_mm = self._mmap(self._idx_file)
+        self._index = _Index(self._idx_mm)
+        self._seg_view = memoryview(self._seg_mm) if self._seg_mm is not None else b''
+
+    @staticmethod
+    def _mmap(f) -> Optional[mmap.mmap]:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files can not be mapped
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _payload(self, doc_id: str, copy: bool = False) -> memoryview | bytes:
+        location = self._index.find(doc_id.encode('utf8'))
+        if location is None:
+            raise KeyError(doc_id)
+        offset, length = location
+        payload = self._seg_view[offset : offset + length]
+        return bytes(payload) if copy else payload
+
+    def __getitem__(self, doc_id: str) -> lp_doc.Doc:
+        return lp_doc.Doc.from_bytes(self._payload(doc_id), lazy=True)
+
+    def get(self, doc_id: str, default=None, copy: bool = False):
+        try:
+            return lp_doc.Doc.from_bytes(self._payload(doc_id, copy), lazy=True)
+        except KeyError:
+            return default
+
+    def get_payload(self, doc_id: str, copy: bool = False) -> memoryview | bytes:
+        """Encoded doc without decoding."""
+        return self._payload(doc_id, copy)
+
+    def get_fragment(self, doc_id: str, fragment_no: int, name='default') -> List[lp_doc.Sent]:
+        """Sentences of the fragment. Only sentences of the fragment are decoded."""
+        payload = self._payload(doc_id)
+        header = binary_codec.decode_header(payload)
+        fragments = header.doc.get_fragments(name)
+        if fragments is None:
+            raise KeyError(f"No fragments {name} in doc {doc_id}")
+        begin, end = fragments[fragment_no]
+        return [
+            binary_codec.decode_sent(payload, header.sent_pos(i)) for i in range(begin, end + 1)
+        ]
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self._index.find(doc_id.encode('utf8')) is not None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def doc_ids(self) -> Iterator[str]:
+        for i in range(len(self._index)):
+            yield self._index.key(i).decode('utf8')
+
+    def close(self):
+        if isinstance(self._seg_view, memoryview):
+            self._seg_view.release()
+        for mm in (self._seg_mm, self._idx_mm):
+            if mm is not None:
+                try:
+                    mm.close()
+                except BufferError:
+                    # Returned docs or payloads still reference the mapping,
+                    # it is unmapped when the last of them is released
+                    pass
+        self._seg_mm = self._idx_mm = None
+        self._seg_file.close()
+        self._idx_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
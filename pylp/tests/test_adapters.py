@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+from types import SimpleNamespace
+
+import pytest
+
+from pylp import lp_doc
+from pylp.adapters import DocAdapter, TokenTuple
+from pylp.common import PosTag, SyntLink
+from pylp.converter_conll_ud_v1 import ConllFormatStreamParser, ConverterConllUDV1, ConvFields
+from pylp.tests.test_converter_conll_ud_v1 import CONLLU_TEXT_WITH_SYNT, TEXT_3
+
+
+def _tokens_from_conll(conll, doc):
+    sents = []
+    for conllu_sent, sent in zip(ConllFormatStreamParser(conll), doc):
+        rows = [r for r in conllu_sent if not r[0].startswith('#')]
+        sents.append(
+            [
+                TokenTuple(r[1], r[2], r[3], r[5], int(r[6]), r[7], w.offset, w.offset + w.len)
+                for r, w in zip(rows, sent)
+            ]
+        )
+    return sents
+
+
+@pytest.mark.parametrize('max_cache_size', [0, 100])
+def test_from_tokens(max_cache_size):
+    expected = ConverterConllUDV1()(TEXT_3, CONLLU_TEXT_WITH_SYNT, lp_doc.Doc('1', text=TEXT_3))
+    sents = _tokens_from_conll(CONLLU_TEXT_WITH_SYNT, expected)
+
+    doc = DocAdapter(max_cache_size).from_tokens('1', TEXT_3, sents)
+    assert doc.to_dict() == expected.to_dict()
+
+    doc = DocAdapter(max_cache_size, fields=ConvFields.INDEX).from_tokens('1', TEXT_3, sents)
+    assert doc[0][0].offset is None
+    assert doc[0][0].lemma == 'mom'
+    assert doc[0][0].number is None
+
+
+def test_feats_mapping():
+    token = ('мыла', 'мыть', 'VERB', {'VerbForm': 'Fin', 'Gender': 'Fem'}, 0, 'root')
+    doc = DocAdapter().from_tokens('1', None, [[token]])
+    word = doc[0][0]
+    assert word.pos_tag == PosTag.VERB
+    assert word.gender is not None
+    assert word.parent_offs == 0
+    assert word.offset is None
+
+
+def _spacy_token(i, text, lemma, pos, dep, head_i, idx, morph=''):
+    return SimpleNamespace(
+        i=i, text=text, lemma_=lemma, pos_=pos, dep_=dep, idx=idx, morph=morph, head_i=head_i
+    )
+
+
+class _Span(list):
+    def __init__(self, start, tokens):
+        super().__init__(tokens)
+        self.start = start
+
+
+def test_from_spacy():
+    text = 'Hi. Cats sleep'
+    tokens = [
+        _spacy_token(0, 'Hi', 'hi', 'INTJ', 'ROOT', 0, 0),
+        _spacy_token(1, '.', '.', 'PUNCT', 'punct', 0, 2),
+        _spacy_token(2, 'Cats', 'cat', 'NOUN', 'nsubj', 3, 4, 'Number=Plur'),
+        _spacy_token(3, 'sleep', 'sleep', 'VERB', 'ROOT', 3, 9),
+    ]
+    for t in tokens:
+        t.head = tokens[t.head_i]
+    spacy_doc = SimpleNamespace(text=text, sents=[_Span(0, tokens[:2]), _Span(2, tokens[2:])])
+
+    doc = DocAdapter().from_spacy(spacy_doc, 'sp')
+    assert [len(s) for s in doc] == [2, 2]
+    cats, sleep = doc[1][0], doc[1][1]
+    assert cats.lemma == 'cat'
+    assert (cats.offset, cats.len) == (4, 4)
+    assert cats.parent_offs == 1
+    assert cats.synt_link == SyntLink.NSUBJ
+    assert sleep.parent_offs == 0
+    assert sleep.synt_link == SyntLink.ROOT
+    assert text[sleep.offset : sleep.offset + sleep.len] == 'sleep'
+
+
+def test_from_stanza():
+    words = [
+        SimpleNamespace(
+            text='Мама',
+            lemma='мама',
+            upos='NOUN',
+            feats='Case=Nom|Number=Sing',
+            head=2,
+            deprel='nsubj',
+            start_char=0,
+            end_char=4,
+        ),
+        SimpleNamespace(
+            text='мыла',
+            lemma='мыть',
+            upos='VERB',
+            feats=None,
+            head=0,
+            deprel='root',
+            start_char=5,
+            end_char=9,
+        ),
+    ]
+    stanza_doc = SimpleNamespace(text='Мама мыла', sentences=[SimpleNamespace(words=words)])
+    doc = DocAdapter().from_stanza(stanza_doc, 'st')
+    mama, myla = doc[0]
+    assert mama.parent_offs == 1
+    assert mama.case is not None
+    assert (myla.offset, myla.len) == (5, 4)
+    assert myla.synt_link == SyntLink.ROOT
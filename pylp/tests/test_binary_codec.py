@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import json
+
+import pytest
+
+from pylp import lp_doc
+from pylp import binary_codec
+from pylp.columnar import ColumnarSent
+from pylp.common import Lang, PosTag, SyntLink, WordCase, WordGender
+from pylp.phrases.builder import PhraseBuilder
+from pylp.word_obj import WordObj
+
+
+def _make_doc():
+    words = [
+        WordObj(lemma='путь', form='Путь', pos_tag=PosTag.NOUN, synt_link=SyntLink.ROOT),
+        WordObj(lemma='к', form='к', pos_tag=PosTag.ADP, parent_offs=1, synt_link=SyntLink.CASE),
+        WordObj(
+            lemma='вершина',
+            form='вершине',
+            pos_tag=PosTag.NOUN,
+            gender=WordGender.FEM,
+            case=WordCase.DAT,
+            parent_offs=-2,
+            synt_link=SyntLink.NMOD,
+            offset=7,
+            length=7,
+        ),
+    ]
+    sent = lp_doc.Sent(words, bounds=(0, 14))
+    sent.set_phrases(PhraseBuilder(MaxN=3).build_phrases_for_sent(sent))
+    assert sent.to_dict()['phrases']
+
+    doc = lp_doc.Doc('doc1', text='Путь к вершине', lang=Lang.RU)
+    doc.add_sent(sent)
+    doc.add_sent(lp_doc.Sent([WordObj(lemma='', form='!', pos_tag=PosTag.PUNCT)]))
+    doc.add_sent(lp_doc.Sent())
+    doc.set_fragments([(0, 1), (1, 2)])
+    doc.add_ling_prop('word_lang_detected')
+    return doc
+
+
+def test_round_trip():
+    doc = _make_doc()
+    data = doc.to_bytes()
+    restored = lp_doc.Doc.from_bytes(data)
+    assert restored.to_dict() == doc.to_dict()
+    assert restored.lang == Lang.RU
+    assert restored[0][2].case == WordCase.DAT
+    assert restored[0][0].offset is None
+
+    phrase = next(restored[0].phrases())
+    assert phrase.get_str_repr() == 'путь к вершина'
+
+
+def test_round_trip_columnar():
+    doc = _make_doc()
+    restored = lp_doc.Doc.from_bytes(doc.to_bytes(), sent_cls=ColumnarSent)
+    assert isinstance(restored[0], ColumnarSent)
+    assert restored.to_dict() == doc.to_dict()
+    assert lp_doc.Doc.from_bytes(restored.to_bytes()).to_dict() == doc.to_dict()
+
+
+def test_decode_single_sent():
+    doc = _make_doc()
+    data = doc.to_bytes()
+    header = binary_codec.decode_header(memoryview(data))
+    assert len(header) == 3
+    assert header.doc.text == doc.text
+    assert header.doc.get_fragments() == [(0, 1), (1, 2)]
+    sent = binary_codec.decode_sent(memoryview(data), header.sent_pos(1))
+    assert sent.to_dict() == doc[1].to_dict()
+
+
+def test_bad_data():
+    with pytest.raises(binary_codec.BinaryCodecError):
+        lp_doc.Doc.from_bytes(b'JSON{}')
+
+
+def test_lazy_decode():
+    doc = _make_doc()
+    restored = lp_doc.Doc.from_bytes(memoryview(doc.to_bytes()), lazy=True)
+    assert restored.get_fragments() == [(0, 1), (1, 2)]
+    sent = restored[0]
+    assert isinstance(sent, lp_doc.LazySent)
+    assert len(sent) == 3
+    assert not sent.is_materialized()
+    assert [p.get_words() for p in sent.phrases()] == [p.get_words() for p in doc[0].phrases()]
+    assert restored.to_dict() == doc.to_dict()
+    assert sent.is_materialized()
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_round_trip_after_json(lazy):
+    doc = lp_doc.Doc.from_dict(json.loads(json.dumps(_make_doc().to_dict())))
+    restored = lp_doc.Doc.from_bytes(doc.to_bytes(), lazy=lazy)
+    assert restored.to_dict() == doc.to_dict()
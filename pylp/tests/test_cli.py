@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from pylp import cli
+from pylp.io import ShardedDocWriter
+
+
+def test_prefetch_pairs(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    for name in ['a', 'sub/b', 'sub/c']:
+        (tmp_path / f'{name}.txt').write_text(f'text {name}', encoding='utf8')
+    (tmp_path / 'a.conll').write_text('conll a', encoding='utf8')
+    (tmp_path / 'sub/c.txt').write_bytes(b'\xff\xfe\xfa')
+
+    prefixes = cli.find_input_prefixes([str(tmp_path)])
+    assert prefixes == [tmp_path / 'a', tmp_path / 'sub/b', tmp_path / 'sub/c']
+    assert cli.find_input_prefixes([str(tmp_path / 'sub/*.txt')]) == prefixes[1:]
+
+    errors = []
+    pairs = list(cli.prefetch_pairs(prefixes, errors, queue_size=1))
+    assert [(d.text, conll) for d, conll in pairs] == [('text a', 'conll a'), ('text sub/b', None)]
+    assert len(errors) == 1 and 'sub/c' in errors[0]
+
+
+def test_prefetch_dotted_names(tmp_path):
+    for name in ['2021.05', 'a.1', 'a.2']:
+        (tmp_path / f'{name}.txt').write_text(f'text {name}', encoding='utf8')
+        (tmp_path / f'{name}.conll').write_text(f'conll {name}', encoding='utf8')
+
+    prefixes = cli.find_input_prefixes([str(tmp_path)])
+    assert prefixes == [tmp_path / '2021.05', tmp_path / 'a.1', tmp_path / 'a.2']
+
+    errors = []
+    pairs = list(cli.prefetch_pairs(prefixes, errors))
+    assert [(d.text, conll) for d, conll in pairs] == [
+        ('text 2021.05', 'conll 2021.05'),
+        ('text a.1', 'conll a.1'),
+        ('text a.2', 'conll a.2'),
+    ]
+    assert not errors
+
+
+CONLL = """# text = Мама мыла раму.
+1	Мама	мама	NOUN	_	_	2	nsubj	_	_
+2	мыла	мыть	VERB	_	_	0	root	_	_
+3	раму	рама	NOUN	_	_	2	obj	_	SpaceAfter=No
+4	.	.	PUNCT	_	_	2	punct	_	_
+
+"""
+
+
+def test_batch_bounded_read_ahead(tmp_path, monkeypatch):
+    (tmp_path / 'in').mkdir()
+    for i in range(60):
+        (tmp_path / f'in/{i:02}.txt').write_text('Мама мыла раму.', encoding='utf8')
+        (tmp_path / f'in/{i:02}.conll').write_text(CONLL, encoding='utf8')
+
+    read_cnt = 0
+    read_pair = cli._read_pair
+
+    def counting_read_pair(prefix):
+        nonlocal read_cnt
+        read_cnt += 1
+        return read_pair(prefix)
+
+    in_flight = []
+    write = ShardedDocWriter.write
+
+    def recording_write(self, doc):
+        write(self, doc)
+        in_flight.append(read_cnt - self.docs_cnt)
+
+    monkeypatch.setattr(cli, '_read_pair', counting_read_pair)
+    monkeypatch.setattr(ShardedDocWriter, 'write', recording_write)
+    args = argparse.Namespace(
+        inputs=[str(tmp_path / 'in')],
+        output_dir=str(tmp_path / 'out'),
+        processes=2,
+        chunksize=2,
+        prefetch=1,
+        read_ahead=4,
+        shard_size=100,
+        output_suffix='.jsonl',
+        report_every=30.0,
+        max_errors_to_show=20,
+    )
+    cli.batch_cli(args)
+    assert len(in_flight) == 60
+    # the read queue, pending chunks and a pair held by each of two threads
+    assert max(in_flight) <= 4 + 1 * 2 * 2 + 2
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+from pylp.common import Attr, PosTag, SyntLink, WordCase, WordNumber
+from pylp import lp_doc
+from pylp.columnar import ColumnarSent, NONE_INT
+from pylp.phrases.phrase import Phrase
+from pylp.phrases.builder import PhraseBuilder
+from pylp.word_obj import WordObj
+
+
+def filter1(word_obj: WordObj, pos, sent: lp_doc.Sent):
+    return word_obj.pos_tag in (PosTag.ADP, PosTag.NUM)
+
+
+def _make_words():
+    return [
+        WordObj(lemma='a', pos_tag=PosTag.NOUN, parent_offs=0, synt_link=SyntLink.ROOT),
+        WordObj(lemma=',', pos_tag=PosTag.ADP, parent_offs=-1, synt_link=SyntLink.CASE),
+        WordObj(
+            lemma='b',
+            pos_tag=PosTag.NOUN,
+            parent_offs=-2,
+            synt_link=SyntLink.NMOD,
+            case=WordCase.GEN,
+            number=WordNumber.PLUR,
+        ),
+        WordObj(lemma='1', pos_tag=PosTag.NUM, parent_offs=-1, synt_link=SyntLink.NUMMOD),
+    ]
+
+
+def test_views():
+    sent = ColumnarSent(_make_words())
+    assert len(sent) == 4
+    w = sent[2]
+    assert w.lemma == 'b'
+    assert w.case == WordCase.GEN
+    assert w.gender is None
+    assert w.offset is None
+    assert sent[-1].lemma == '1'
+    assert [v.lemma for v in sent[1:3]] == [',', 'b']
+
+    w.gender = None
+    w.parent_offs = -1
+    w.extra['k'] = 1
+    assert sent[2].parent_offs == -1
+    assert sent[2].extra == {'k': 1}
+    assert sent.column('offset')[0] == NONE_INT
+    assert sent.parent_offsets() == [0, -1, -1, -1]
+
+
+def test_filter_words():
+    phrases = [
+        Phrase(sent_pos_list=[0, 2], words=['a', 'b']),
+        Phrase(sent_pos_list=[2, 3], words=['b', '1']),
+    ]
+    sent = ColumnarSent(_make_words(), phrases)
+    sent.filter_words([filter1])
+
+    assert len(sent) == 2
+    assert [w.lemma for w in sent] == ['a', 'b']
+    assert sent[1].parent_offs == -1
+    assert sent[1].case == WordCase.GEN
+    adjusted_phrases = list(sent.phrases())
+    assert len(adjusted_phrases) == 1
+    assert adjusted_phrases[0].get_sent_pos_list() == [0, 1]
+
+
+def test_filter_words_orphan():
+    words = [
+        WordObj(lemma='on', pos_tag=PosTag.ADP, parent_offs=0, synt_link=SyntLink.ROOT),
+        WordObj(lemma='b', pos_tag=PosTag.NOUN, parent_offs=-1, synt_link=SyntLink.NMOD),
+    ]
+    sent = ColumnarSent(words)
+    sent.filter_words([filter1])
+    assert len(sent) == 1
+    assert sent[0].parent_offs == 0
+    assert sent[0].synt_link == SyntLink.ORPHAN
+
+
+def test_to_from_dict():
+    sent = lp_doc.Sent(_make_words(), bounds=(0, 4))
+    col_sent = ColumnarSent.from_sent(sent)
+    assert col_sent.to_dict() == sent.to_dict()
+
+    restored = ColumnarSent.from_dict(sent.to_dict())
+    assert restored.to_dict() == sent.to_dict()
+    assert restored.to_sent().to_dict() == sent.to_dict()
+
+    doc_dict = {
+        'id': 'temp',
+        'sents': [{'words': [{Attr.POS_TAG: 1, Attr.WORD_FORM: "norm"}]}],
+    }
+    doc_obj = lp_doc.Doc.from_dict(doc_dict, sent_cls=ColumnarSent)
+    assert isinstance(doc_obj[0], ColumnarSent)
+    assert doc_obj[0][0].pos_tag == PosTag.VERB
+    conv_dict = doc_obj.to_dict()
+    del conv_dict['ling_meta']
+    assert conv_dict == doc_dict
+
+
+def test_set_words():
+    sent = ColumnarSent(_make_words())
+    sent.set_words(list(sent)[::-1])
+    assert [w.lemma for w in sent] == ['1', 'b', ',', 'a']
+
+
+def test_phrase_builder():
+    words = [
+        WordObj(lemma='h1', pos_tag=PosTag.NOUN, parent_offs=0, synt_link=SyntLink.ROOT),
+        WordObj(lemma='h2', pos_tag=PosTag.NOUN, parent_offs=-1, synt_link=SyntLink.NMOD),
+    ]
+    builder = PhraseBuilder(MaxN=3)
+    expected = [p.get_words() for p in builder.build_phrases_for_sent(lp_doc.Sent(words))]
+    phrases = builder.build_phrases_for_sent(ColumnarSent(words))
+    assert [p.get_words() for p in phrases] == expected == [['h1', 'h2']]
@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 
-from pylp.converter_conll_ud_v1 import ConverterConllUDV1
+import gzip
+import io
+
+import pytest
+
+from pylp.converter_conll_ud_v1 import ConverterConllUDV1, ConvFields, TextAligner
 from pylp import common, lp_doc
 
 TEXT_1 = """ Тестовый "текст".
@@ -452,3 +457,133 @@ def test_tokens_with_spaces_4():
     assert word3.len == 9
 
     assert TEXT_8_4[word3.offset : word3.offset + word3.len] == 'ln[1  0,3'
+
+
+CONLLU_MULTI_DOC = """# newdoc id = d1
+# sent_id = 1
+# text = Мама мыла раму.
+1	Мама	мама	NOUN	_	Case=Nom	2	nsubj	_	_
+2	мыла	мыть	VERB	_	_	0	root	_	_
+3	раму	рама	NOUN	_	Case=Acc	2	obj	_	SpaceAfter=No
+4	.	.	PUNCT	_	_	2	punct	_	_
+
+# sent_id = 2
+1	Ok	ok	INTJ	_	_	0	root	_	SpaceAfter=No
+2	!	!	PUNCT	_	_	1	punct	_	_
+
+# newdoc id = d2
+# text = Second doc
+1	Second	second	ADJ	_	_	2	amod	_	_
+2	doc	doc	NOUN	_	_	0	root	_	_
+"""
+
+
+def test_iter_docs(tmp_path):
+    converter = ConverterConllUDV1()
+    docs = list(converter.iter_docs(io.StringIO(CONLLU_MULTI_DOC)))
+    assert [d.doc_id for d in docs] == ['d1', 'd2']
+    assert docs[0].text == 'Мама мыла раму.\nOk!'
+    assert [len(s) for s in docs[0]] == [4, 2]
+    assert docs[0][1][1].offset == 18
+    assert docs[1][0][1].lemma == 'doc'
+    assert docs[1][0][1].offset == 7
+
+    path = tmp_path / 'docs.conllu.gz'
+    with gzip.open(path, 'wt', encoding='utf8') as f:
+        f.write(CONLLU_MULTI_DOC)
+    texts = {'d2': 'Title\n\nSecond   doc'}
+    docs = list(converter.iter_docs(path, texts))
+    assert docs[1].text == texts['d2']
+    assert docs[1][0][1].offset == 16
+
+
+def test_file_object():
+    converter = ConverterConllUDV1()
+    doc_obj = lp_doc.Doc('2')
+    converter(TEXT_2, io.StringIO(CONLLU_TEXT_WITH_TAGS), doc_obj)
+    assert len(doc_obj) == 3
+
+
+@pytest.mark.parametrize(
+    'text,conll',
+    [
+        (TEXT_1, CONLLU_TEXT_ONLY_TOKENS),
+        (TEXT_2, CONLLU_TEXT_WITH_TAGS),
+        (TEXT_3, CONLLU_TEXT_WITH_SYNT),
+        (TEXT_4, CONLLU_TEXT_WITH_SYNT_2),
+        (TEXT_6, CONLLU_TEXT_6),
+        (TEXT_8_3, CONLLU_TEXT_8_3),
+    ],
+)
+def test_cached_conversion(text, conll):
+    uncached = ConverterConllUDV1(max_cache_size=0)(text, conll, lp_doc.Doc('1'))
+    converter = ConverterConllUDV1(max_cache_size=3)
+    for _ in range(2):
+        cached = converter(text, conll, lp_doc.Doc('1'))
+        assert cached.to_dict() == uncached.to_dict()
+    assert 0 < len(converter._morph_cache) <= 3
+
+
+def test_text_aligner():
+    text = 'a  b\n\nc d  e x'
+    aligner = TextAligner(text)
+    assert aligner.align('a b') == (0, 4)
+    assert aligner.align('c d') == (6, 3)
+    assert aligner.align('missing') == (None, None)
+    assert aligner.align('e') == (11, 1)
+    assert aligner.align('x') == (13, 1)
+    assert aligner.unaligned == ['missing']
+
+    aligner = TextAligner('plain text')
+    assert aligner.align('text') == (6, 4)
+
+    with pytest.raises(RuntimeError):
+        TextAligner('a b', strict=True).align('c')
+
+
+def test_unaligned_tokens():
+    converter = ConverterConllUDV1()
+    doc_obj = converter('Мама мыла', CONLLU_MULTI_DOC, lp_doc.Doc('1'))
+    assert doc_obj[0][1].offset == 5
+    assert doc_obj[0][2].offset is None
+    assert (0, 2, 'раму') in converter.unaligned
+
+    with pytest.raises(RuntimeError):
+        ConverterConllUDV1(strict_alignment=True)('Мама мыла', CONLLU_MULTI_DOC, lp_doc.Doc('1'))
+
+
+@pytest.mark.parametrize('max_cache_size', [0, 100])
+@pytest.mark.parametrize(
+    'text,conll',
+    [
+        (TEXT_2, CONLLU_TEXT_WITH_TAGS),
+        (TEXT_3, CONLLU_TEXT_WITH_SYNT),
+        (TEXT_4, CONLLU_TEXT_WITH_SYNT_2),
+    ],
+)
+def test_fields(text, conll, max_cache_size):
+    full = ConverterConllUDV1(max_cache_size)(text, conll, lp_doc.Doc('1'))
+    index = ConverterConllUDV1(max_cache_size, fields=ConvFields.INDEX)(
+        text, conll, lp_doc.Doc('1')
+    )
+    assert [len(s) for s in index] == [len(s) for s in full]
+    for full_sent, sent in zip(full, index):
+        for full_word, word in zip(full_sent, sent):
+            assert word.lemma == full_word.lemma
+            assert word.pos_tag == full_word.pos_tag
+            assert word.form is None
+            assert word.offset is None and word.len is None
+            assert word.case is None and word.number is None
+            assert (word.parent_offs, word.synt_link) == (
+                full_word.parent_offs,
+                full_word.synt_link,
+            )
+
+    no_offsets = ConverterConllUDV1(max_cache_size, fields=ConvFields.ALL & ~ConvFields.OFFSETS)(
+        text, conll, lp_doc.Doc('1')
+    )
+    for full_sent, sent in zip(full, no_offsets):
+        for full_word, word in zip(full_sent, sent):
+            word.offset = full_word.offset
+            word.len = full_word.len
+            assert word.to_dict() == full_word.to_dict()
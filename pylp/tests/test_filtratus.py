@@ -2,8 +2,9 @@
 
 import pytest
 
-from pylp.filtratus import Filtratus
+from pylp.filtratus import CompiledFilter, Filtratus, PunctAndUndefFiltratus
 from pylp import lp_doc
+from pylp.columnar import ColumnarSent
 from pylp.word_obj import WordObj
 from pylp.common import PosTag, SyntLink, Lang
 
@@ -133,3 +134,55 @@ def test_stopwords_with_synt(filtratus):
     assert sent1[8].synt_link == SyntLink.ORPHAN
     assert sent1[9].lemma == 'comp'
     assert sent1[9].parent_offs == -1
+
+
+def _make_mixed_words():
+    return [
+        WordObj(lemma='the', pos_tag=PosTag.DET, parent_offs=1, lang=Lang.EN),
+        WordObj(lemma='cat', pos_tag=PosTag.NOUN, parent_offs=1, lang=Lang.EN),
+        WordObj(lemma='be', pos_tag=PosTag.AUX, parent_offs=2, lang=Lang.EN),
+        WordObj(lemma='very', pos_tag=PosTag.ADV, parent_offs=1, lang=Lang.EN),
+        WordObj(lemma='big', pos_tag=PosTag.ADJ, parent_offs=0, lang=Lang.EN),
+        WordObj(lemma='is', pos_tag=PosTag.VERB, synt_link=SyntLink.COP, parent_offs=-1),
+        WordObj(lemma='2', pos_tag=PosTag.NUM, parent_offs=-2, lang=Lang.EN),
+        WordObj(lemma='zz', pos_tag=PosTag.NOUN, parent_offs=-3, lang=Lang.UNDEF),
+        WordObj(lemma='it', pos_tag=PosTag.PRON, parent_offs=-4, lang=Lang.EN),
+        WordObj(lemma='.', pos_tag=PosTag.PUNCT, parent_offs=-5, lang=Lang.EN),
+    ]
+
+
+@pytest.mark.parametrize('sent_cls', [lp_doc.Sent, ColumnarSent])
+def test_compiled_filter(tmp_path, sent_cls):
+    sw_path = tmp_path / 'sw.txt'
+    sw_path.write_text('very\nbig\n')
+    wl_path = tmp_path / 'wl.txt'
+    wl_path.write_text('it\n')
+    kinds = ['punct', 'determiner', 'common_aux', 'stopwords', 'num&undeflang']
+    filt = Filtratus(kinds, {'sw_list_path': str(sw_path), 'sw_white_list_path': str(wl_path)})
+    compiled = filt.compile(kinds)
+    assert compiled is filt.compile(kinds)
+    assert not compiled._callables
+
+    filters = [filt._filters[k] for k in kinds]
+    expected = lp_doc.Sent(_make_mixed_words())
+    expected.filter_words(filters)
+    assert [w.lemma for w in expected] == ['cat', 'it']
+
+    sent = sent_cls(_make_mixed_words())
+    compiled.filter_sent(sent)
+    assert [w.to_dict() for w in sent] == [w.to_dict() for w in expected]
+
+    # Compiled filter can be used as an ordinary one
+    sent = sent_cls(_make_mixed_words())
+    sent.filter_words([compiled])
+    assert [w.to_dict() for w in sent] == [w.to_dict() for w in expected]
+
+
+def test_compiled_filter_fallback():
+    def custom(word_obj, word_pos, sent):
+        return word_obj.lemma == 'cat'
+
+    sent = lp_doc.Sent(_make_mixed_words())
+    compiled = CompiledFilter([PunctAndUndefFiltratus(), custom])
+    compiled.filter_sent(sent)
+    assert [w.lemma for w in sent][:3] == ['the', 'be', 'very']
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import io
+
+import pytest
+
+from pylp import lp_doc
+from pylp import io as pylp_io
+from pylp.common import Lang, PosTag
+from pylp.word_obj import WordObj
+
+
+def _make_docs(cnt):
+    docs = []
+    for i in range(cnt):
+        doc = lp_doc.Doc(str(i), text=f'text {i}', lang=Lang.EN)
+        doc.add_sent(lp_doc.Sent([WordObj(lemma='text', pos_tag=PosTag.NOUN)]))
+        docs.append(doc)
+    return docs
+
+
+@pytest.mark.parametrize('name', ['docs.jsonl', 'docs.jsonl.gz'])
+def test_write_read(tmp_path, name):
+    path = tmp_path / name
+    docs = _make_docs(5)
+    assert pylp_io.write_docs(path, docs, batch_size=2) == 5
+
+    restored = list(pylp_io.read_docs(path))
+    assert [d.to_dict() for d in restored] == [d.to_dict() for d in docs]
+
+
+def test_filters(tmp_path):
+    path = tmp_path / 'docs.jsonl.gz'
+    docs = _make_docs(5)
+    pylp_io.write_docs(path, docs)
+
+    restored = list(pylp_io.read_docs(path, pylp_io.by_ids(['1', '3'])))
+    assert [d.doc_id for d in restored] == ['1', '3']
+
+    restored = list(pylp_io.read_docs(path, pylp_io.by_text_hashes([docs[4].text_hash])))
+    assert [d.doc_id for d in restored] == ['4']
+
+
+def test_file_objects():
+    out = io.StringIO()
+    with pylp_io.DocWriter(out, batch_size=10) as writer:
+        writer.write_many(_make_docs(3))
+        assert out.getvalue() == ''
+    assert out.getvalue().count('\n') == 3
+
+    restored = list(pylp_io.read_docs(io.StringIO(out.getvalue()), lazy=True))
+    assert len(restored) == 3
+    assert isinstance(restored[0][0], lp_doc.LazySent)
+    assert restored[2][0][0].lemma == 'text'
+
+
+def test_sharded_writer(tmp_path):
+    docs = _make_docs(5)
+    with pylp_io.ShardedDocWriter(tmp_path / 'out', shard_size=2) as writer:
+        for doc in docs:
+            writer.write(doc)
+    assert [p.name for p in writer.shards] == [
+        'docs-00000.jsonl.gz',
+        'docs-00001.jsonl.gz',
+        'docs-00002.jsonl.gz',
+    ]
+    restored = [d for p in writer.shards for d in pylp_io.read_docs(p)]
+    assert [d.to_dict() for d in restored] == [d.to_dict() for d in docs]
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
-from pylp.common import Attr, PosTag
+import pytest
+
+from pylp.common import Attr, Lang, PosTag, SyntLink, WordCase, WordNumber
 from pylp import lp_doc
 from pylp.phrases.phrase import Phrase
-from pylp.word_obj import WordObj
+from pylp.word_obj import WordObj, words_from_dicts
 
 
 def filter1(word_obj: WordObj, pos, sent: lp_doc.Sent):
@@ -111,3 +113,78 @@ def test_from_dict():
     conv_dict = doc_obj.to_dict()
     del conv_dict['ling_meta']
     assert conv_dict == doc_dict
+
+
+def test_from_dict_lazy():
+    doc_dict = {
+        'id': 'temp',
+        'text': 'norm norm2',
+        'sents': [
+            {'words': [{Attr.POS_TAG: 1, Attr.WORD_FORM: "norm"}], 'bounds': [0, 4]},
+            {
+                'words': [
+                    {Attr.POS_TAG: 2, Attr.WORD_FORM: "norm2"},
+                    {Attr.POS_TAG: 3, Attr.WORD_FORM: "norm3"},
+                ],
+                'phrases': [Phrase(sent_pos_list=[0, 1], words=['norm2', 'norm3']).to_dict()],
+            },
+        ],
+    }
+
+    doc_obj = lp_doc.Doc.from_dict(doc_dict, lazy=True)
+    assert doc_obj.text == 'norm norm2'
+    assert len(doc_obj) == 2
+    sent2 = doc_obj[1]
+    assert isinstance(sent2, lp_doc.LazySent)
+    assert len(sent2) == 2
+    assert not sent2.is_materialized()
+
+    phrases = list(sent2.phrases())
+    assert phrases[0].get_sent_pos_list() == [0, 1]
+    assert sent2[1].form == "norm3"
+    assert sent2.is_materialized()
+
+    lazy_doc_obj = lp_doc.Doc.from_dict(doc_dict, lazy=True)
+    assert lazy_doc_obj.to_dict() == lp_doc.Doc.from_dict(doc_dict).to_dict()
+
+
+def test_lazy_filter_words():
+    words = [
+        WordObj(lemma='t', pos_tag=PosTag.NOUN),
+        WordObj(lemma='on', pos_tag=PosTag.ADP),
+    ]
+    sent = lp_doc.Sent(words, [Phrase(sent_pos_list=[0, 1], words=['t', 'on'])])
+    lazy_sent = lp_doc.LazySent.from_dict(sent.to_dict())
+    lazy_sent.filter_words([filter1])
+    assert len(lazy_sent) == 1
+    assert not list(lazy_sent.phrases())
+
+
+def test_words_from_dicts():
+    words = [
+        WordObj(
+            lemma='дом',
+            form='дома',
+            pos_tag=PosTag.NOUN,
+            offset=0,
+            length=4,
+            parent_offs=1,
+            synt_link=SyntLink.NMOD,
+            lang=Lang.RU,
+            number=WordNumber.PLUR,
+            case=WordCase.NOM,
+        ),
+        WordObj(lemma='red', pos_tag=PosTag.ADJ),
+    ]
+    words[1].word_id = 42
+    dicts = [w.to_dict() for w in words]
+
+    decoded = words_from_dicts(dicts)
+    assert [w.to_dict() for w in decoded] == dicts
+    assert [w.to_dict() for w in decoded] == [WordObj.from_dict(d).to_dict() for d in dicts]
+    assert decoded[0].case is WordCase.NOM
+    assert decoded[0].lang is Lang.RU
+    assert decoded[1].extra == {} and decoded[0].extra is not decoded[1].extra
+
+    with pytest.raises(ValueError):
+        words_from_dicts([{Attr.POS_TAG: 10000}])
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from pylp import lp_doc
+from pylp.common import Lang, PosTag
+from pylp.pipeline import Pipeline, Stage
+from pylp.word_obj import WordObj
+
+CONLL = """# sent_id = 1
+# text = Мама мыла раму.
+1	Мама	мама	NOUN	_	Animacy=Anim|Case=Nom|Gender=Fem|Number=Sing	2	nsubj	_	_
+2	мыла	мыть	VERB	_	Aspect=Imp|Gender=Fem|Mood=Ind|Number=Sing|Tense=Past|VerbForm=Fin|Voice=Act	0	root	_	_
+3	раму	рама	NOUN	_	Animacy=Inan|Case=Acc|Gender=Fem|Number=Sing	2	obj	_	SpaceAfter=No
+4	.	.	PUNCT	_	_	2	punct	_	SpacesAfter=\\n
+
+"""
+
+
+class SplitStage(Stage):
+    name = 'split'
+
+    def process(self, doc: lp_doc.Doc):
+        if doc.text == 'fail':
+            raise RuntimeError("Bad doc")
+        words = [WordObj(lemma=w, pos_tag=PosTag.NOUN) for w in doc.text.split()]
+        words.append(WordObj(lemma='.', pos_tag=PosTag.PUNCT))
+        doc.add_sent(lp_doc.Sent(words))
+
+
+def _make_docs(cnt):
+    return [lp_doc.Doc(str(i), text=' '.join(['w'] * (i + 1)), lang=Lang.EN) for i in range(cnt)]
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_pipeline(processes):
+    pipeline = Pipeline(
+        [(SplitStage, {}), ('filter', {'kinds': ['punct']})], processes=processes, chunksize=2
+    )
+    docs = list(pipeline.process(_make_docs(10)))
+    assert [d.doc_id for d in docs] == [str(i) for i in range(10)]
+    assert [len(d[0]) for d in docs] == list(range(1, 11))
+    assert pipeline.stats.docs == 10
+    assert pipeline.stats.tokens == sum(range(1, 11))
+    assert pipeline.stats.tokens_per_sec() > 0
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_pipeline_bounded_input(processes):
+    pulled = 0
+
+    def docs():
+        nonlocal pulled
+        for doc in _make_docs(50):
+            pulled += 1
+            yield doc
+
+    pipeline = Pipeline([(SplitStage, {})], processes=processes, chunksize=2, prefetch=2)
+    for consumed, _ in enumerate(pipeline.process(docs()), 1):
+        # prefetch chunks of chunksize docs per process
+        assert pulled - consumed <= 2 * 2 * processes
+    assert consumed == 50
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_pipeline_cache(tmp_path, monkeypatch, processes):
+    docs = _make_docs(4)
+    stages = [(SplitStage, {})]
+    pipeline = Pipeline(stages, processes=processes, cache_dir=str(tmp_path))
+    expected = [d.to_dict() for d in pipeline.process(docs)]
+    assert len(list(tmp_path.glob('*/*.bin'))) == 4
+
+    # Cached docs are not processed again, workers are forked with the patched stage
+    def fail(self, doc):
+        raise RuntimeError("Not cached")
+
+    monkeypatch.setattr(SplitStage, 'process', fail)
+    pipeline = Pipeline(stages, processes=processes, cache_dir=str(tmp_path))
+    assert [d.to_dict() for d in pipeline.process(_make_docs(4))] == expected
+    assert pipeline.stats.tokens == sum(range(2, 6))
+
+    # The same text with another id
+    doc = lp_doc.Doc('other', text=docs[1].text, lang=Lang.EN)
+    assert next(pipeline.process([doc])).doc_id == 'other'
+
+    # Other stages do not share the results
+    pipeline = Pipeline(stages + [('word_ids', {})], processes=processes, cache_dir=str(tmp_path))
+    with pytest.raises(RuntimeError):
+        list(pipeline.process(_make_docs(1)))
+
+
+def test_pipeline_errors():
+    docs = _make_docs(3)
+    docs[1].text = 'fail'
+
+    pipeline = Pipeline([(SplitStage, {})])
+    with pytest.raises(RuntimeError):
+        list(pipeline.process(docs))
+
+    pipeline = Pipeline([(SplitStage, {})], skip_errors=True)
+    assert [d.doc_id for d in pipeline.process(docs)] == ['0', '2']
+    assert pipeline.stats.errors == 1
+    assert 'Bad doc' in pipeline.errors[0]
+
+
+def test_pipeline_convert():
+    pipeline = Pipeline([('convert', {}), ('filter', {'kinds': ['punct']})])
+    doc = lp_doc.Doc('1', text='Мама мыла раму.')
+    (result,) = pipeline.process([(doc, CONLL)])
+    assert [w.lemma for w in result[0]] == ['мама', 'мыть', 'рама']
+    assert result[0][2].offset == 10
+
+    with pytest.raises(RuntimeError):
+        list(pipeline.process([doc]))
+
+
+class MarkStage(Stage):
+    def __init__(self, mark: str):
+        self._mark = mark
+
+    def process(self, doc: lp_doc.Doc):
+        doc.text += self._mark
+
+
+def test_interleaved_pipelines():
+    docs = _make_docs(4)
+    results1 = Pipeline([(MarkStage, {'mark': ' a'})]).process(docs)
+    first = next(results1)
+    results2 = Pipeline([(MarkStage, {'mark': ' b'})]).process(docs)
+    results = [first]
+    for doc1, doc2 in zip(results1, results2):
+        results.extend((doc1, doc2))
+    assert [d.text.split()[-1] for d in results] == ['a', 'a', 'b', 'a', 'b', 'a', 'b']
+
+
+def test_unknown_stage():
+    with pytest.raises(RuntimeError):
+        list(Pipeline([('unknown', {})]).process(_make_docs(1)))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from pylp import lp_doc
+from pylp.common import PosTag
+from pylp.result_cache import ResultCache, make_fingerprint
+from pylp.word_obj import WordObj
+
+
+def _process(doc: lp_doc.Doc):
+    doc.add_sent(lp_doc.Sent([WordObj(lemma=w, pos_tag=PosTag.NOUN) for w in doc.text.split()]))
+    return doc
+
+
+def test_fingerprint():
+    fp1 = make_fingerprint(phrases_max_n=4, profile_name='noun_phrases')
+    fp2 = make_fingerprint(profile_name='noun_phrases', phrases_max_n=4)
+    assert fp1 == fp2
+    assert fp1 != make_fingerprint(profile_name='noun_phrases', phrases_max_n=3)
+
+
+def test_get_or_process(tmp_path):
+    cache = ResultCache(tmp_path, make_fingerprint(a=1))
+    calls = []
+
+    def process(doc):
+        calls.append(doc.doc_id)
+        return _process(doc)
+
+    doc1 = cache.get_or_process(lp_doc.Doc('1', text='some text'), process)
+    doc2 = cache.get_or_process(lp_doc.Doc('2', text='some text'), process)
+    assert calls == ['1']
+    assert doc2.doc_id == '2'
+    assert doc2[0][1].lemma == 'text'
+    assert doc1.text_hash == doc2.text_hash
+
+    info = cache.info()
+    assert (info.hits, info.misses, info.entries) == (1, 1, 1)
+    assert info.hit_rate() == pytest.approx(0.5)
+
+    # Other configuration does not see these results
+    other_cache = ResultCache(tmp_path, make_fingerprint(a=2))
+    assert other_cache.get(doc1.text_hash) is None
+
+    # Entries are restored from the disk
+    restored_cache = ResultCache(tmp_path, make_fingerprint(a=1))
+    assert restored_cache.get(doc1.text_hash).to_dict() == doc1.to_dict()
+
+
+def test_eviction(tmp_path):
+    docs = [_process(lp_doc.Doc(str(i), text=f'text {i}')) for i in range(4)]
+    size = len(docs[0].to_bytes())
+    cache = ResultCache(tmp_path, make_fingerprint(), max_size=size * 2)
+    for doc in docs[:2]:
+        cache.put(doc)
+    assert cache.get(docs[0].text_hash) is not None
+    cache.put(docs[2])
+
+    assert cache.get(docs[1].text_hash) is None
+    assert cache.get(docs[0].text_hash) is not None
+    assert cache.get(docs[2].text_hash) is not None
+    assert cache.info().evictions == 1
+    assert len(list(tmp_path.glob('*/*.bin'))) == 2
+
+
+def test_shared_dir(tmp_path):
+    docs = [_process(lp_doc.Doc(str(i), text=f'text {i}')) for i in range(4)]
+    size = len(docs[0].to_bytes())
+    cache1 = ResultCache(tmp_path, make_fingerprint(), max_size=size * 3)
+    cache2 = ResultCache(tmp_path, make_fingerprint(), max_size=size * 3)
+
+    # Entries written by another process are adopted
+    cache1.put(docs[0])
+    assert cache2.get(docs[0].text_hash, '0').to_dict() == docs[0].to_dict()
+    assert cache2.info().entries == 1
+
+    # The size is bounded by both processes together
+    cache1.put(docs[1])
+    cache2.put(docs[2])
+    cache2.put(docs[3])
+    assert len(list(tmp_path.glob('*/*.bin'))) == 3
+    assert cache2.info().size == size * 3
+    assert cache2.info().evictions == 1
+    assert cache1.get(docs[0].text_hash) is None
+    assert cache1.get(docs[1].text_hash) is not None
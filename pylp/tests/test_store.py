@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from pylp import lp_doc
+from pylp.store import DocStore, DocStoreWriter
+from pylp.common import Lang, PosTag
+from pylp.word_obj import WordObj
+
+
+def _make_doc(doc_id, sents_cnt=4):
+    doc = lp_doc.Doc(doc_id, text=f'text of {doc_id}', lang=Lang.EN)
+    for i in range(sents_cnt):
+        doc.add_sent(lp_doc.Sent([WordObj(lemma=f'{doc_id}_{i}', pos_tag=PosTag.NOUN)]))
+    doc.set_fragments([(0, 1), (2, 3)])
+    return doc
+
+
+def test_store(tmp_path):
+    path = tmp_path / 'corpus'
+    docs = [_make_doc(f'doc{i}') for i in (3, 1, 2)]
+    with DocStoreWriter(path) as writer:
+        for doc in docs:
+            writer.add(doc)
+
+    with DocStore(path) as store:
+        assert len(store) == 3
+        assert list(store.doc_ids()) == ['doc1', 'doc2', 'doc3']
+        for doc in docs:
+            assert doc.doc_id in store
+            assert store[doc.doc_id].to_dict() == doc.to_dict()
+        assert 'doc4' not in store
+        assert store.get('doc4') is None
+        with pytest.raises(KeyError):
+            store['doc4']
+
+        fragment = store.get_fragment('doc2', 1)
+        assert [s[0].lemma for s in fragment] == ['doc2_2', 'doc2_3']
+        doc = store['doc1']
+        payload = store.get_payload('doc1')
+        assert isinstance(payload, memoryview)
+        assert isinstance(store.get_payload('doc1', copy=True), bytes)
+        assert store.get('doc1', copy=True).to_dict() == docs[1].to_dict()
+
+    # Returned docs and payloads outlive the store
+    assert doc.to_dict() == docs[1].to_dict()
+    assert lp_doc.Doc.from_bytes(payload).to_dict() == docs[1].to_dict()
+    assert [s[0].lemma for s in fragment] == ['doc2_2', 'doc2_3']
+
+
+def test_append(tmp_path):
+    path = tmp_path / 'corpus'
+    with DocStoreWriter(path) as writer:
+        writer.add(_make_doc('doc1'))
+        writer.add(_make_doc('doc2'))
+
+    with DocStoreWriter(path) as writer:
+        writer.add(_make_doc('doc0'))
+        writer.add(_make_doc('doc2', sents_cnt=2))
+
+    with DocStore(path) as store:
+        assert list(store.doc_ids()) == ['doc0', 'doc1', 'doc2']
+        assert len(store['doc1']) == 4
+        assert len(store['doc2']) == 2
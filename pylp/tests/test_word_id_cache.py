@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import libpyexbase
+import pytest
+
+from pylp import lp_doc
+from pylp import word_id_cache
+from pylp.common import Lang
+from pylp.word_obj import WordObj
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    word_id_cache.clear_word_id_cache()
+    calls = []
+    calc_batch = libpyexbase.calc_word_ids_and_langs
+    detect_calc = libpyexbase.detect_lang_calc_word_id
+
+    def batch(lemmas, flag):
+        calls.append(list(lemmas))
+        return calc_batch(lemmas, flag)
+
+    def single(lemma, flag):
+        calls.append([lemma])
+        return detect_calc(lemma, flag)
+
+    monkeypatch.setattr(libpyexbase, 'calc_word_ids_and_langs', batch)
+    monkeypatch.setattr(libpyexbase, 'detect_lang_calc_word_id', single)
+    # restore the bound after tests that change it
+    monkeypatch.setattr(word_id_cache, '_MAX_SIZE', word_id_cache._MAX_SIZE)
+    yield calls
+    word_id_cache.clear_word_id_cache()
+
+
+def _make_doc(lemmas):
+    doc = lp_doc.Doc('1')
+    doc.add_sent(lp_doc.Sent([WordObj(lemma=l) for l in lemmas]))
+    return doc
+
+
+def test_word_id(calls):
+    w1 = WordObj(lemma='House')
+    w2 = WordObj(lemma='house')
+    assert w1.word_id == w2.word_id
+    assert calls == [['house']]
+    assert word_id_cache.get_word_id_cache_info() == (1, 1, 1)
+
+
+def test_batch(calls):
+    lp_doc.assign_word_ids_and_word_langs([_make_doc(['a', 'b'])])
+    doc = _make_doc(['b', 'c'])
+    lp_doc.assign_word_ids_and_word_langs([doc])
+    assert [sorted(c) for c in calls] == [['a', 'b'], ['c']]
+    assert doc[0][0].word_id == WordObj(lemma='b').word_id
+    assert isinstance(doc[0][0].lang, Lang)
+    assert len(calls) == 2
+
+    _, hits, misses = word_id_cache.get_word_id_cache_info()
+    assert (hits, misses) == (2, 3)
+
+
+def test_max_size(calls):
+    word_id_cache.set_word_id_cache_max_size(1)
+    word_id_cache.get_word_ids_and_langs(['a', 'b'])
+    word_id_cache.get_word_ids_and_langs(['a'])
+    assert calls[-1] == ['a']
+
+
+def test_save_load(calls, tmp_path):
+    expected = word_id_cache.get_word_ids_and_langs(['a', 'b'])
+    path = tmp_path / 'word_ids.pickle.gz'
+    word_id_cache.save_word_id_cache(path)
+
+    word_id_cache.clear_word_id_cache()
+    word_id_cache.set_word_id_cache_max_size(0)
+    word_id_cache.load_word_id_cache(path)
+    assert word_id_cache.get_word_ids_and_langs(['a', 'b']) == expected
+    assert len(calls) == 1
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import pickle
+
+import pytest
+
+from pylp import common
+from pylp.common import Attr, PosTag, WordCase, WordGender, WordNumber
+from pylp.word_obj import MORPH_FIELDS, CompactWordObj, WordObj, words_from_dicts
+
+
+def _make_word(cls):
+    return cls(
+        lemma='дом',
+        pos_tag=PosTag.NOUN,
+        number=WordNumber.PLUR,
+        gender=WordGender.MASC,
+        case=WordCase.NOM,
+        degree=common.WordDegree.ABS,
+    )
+
+
+def test_lazy_extra():
+    word = WordObj(lemma='a')
+    assert word.get_extra(Attr.PREP_MOD) is None
+    assert not word.has_extra()
+    assert word._extra is None
+
+    word.extra[Attr.PREP_MOD] = [1]
+    assert word.has_extra()
+    assert word.get_extra(Attr.PREP_MOD) == [1]
+
+
+def test_compact_morph():
+    word = _make_word(CompactWordObj)
+    ref = _make_word(WordObj)
+    for name in MORPH_FIELDS:
+        assert getattr(word, name) == getattr(ref, name), name
+    assert word.case is WordCase.NOM
+    assert word.tense is None
+    assert word.to_dict() == ref.to_dict()
+
+    word.case = WordCase.VOC
+    word.number = None
+    assert word.case is WordCase.VOC
+    assert word.number is None
+    assert word.gender is WordGender.MASC
+
+    word = CompactWordObj()
+    enums = (
+        common.WordNumber,
+        common.WordGender,
+        common.WordCase,
+        common.WordTense,
+        common.WordPerson,
+        common.WordDegree,
+        common.WordAspect,
+        common.WordVoice,
+        common.WordMood,
+        common.WordNumType,
+        common.WordAnimacy,
+    )
+    for name, enum_cls in zip(MORPH_FIELDS, enums):
+        for v in enum_cls:
+            setattr(word, name, v)
+            assert getattr(word, name) is v
+
+    with pytest.raises(ValueError):
+        word.case = 100
+
+
+def test_compact_morph_code():
+    w1 = _make_word(CompactWordObj)
+    w2 = CompactWordObj.from_word(_make_word(WordObj))
+    assert w1.morph_code == w2.morph_code
+    w2.case = WordCase.GEN
+    assert w1.morph_code != w2.morph_code
+
+
+def test_compact_decode_and_pickle():
+    ref = _make_word(WordObj)
+    ref.word_id = 7
+    word = words_from_dicts([ref.to_dict()], cls=CompactWordObj)[0]
+    assert isinstance(word, CompactWordObj)
+    assert word.to_dict() == ref.to_dict()
+
+    restored = pickle.loads(pickle.dumps(word))
+    assert restored.to_dict() == ref.to_dict()
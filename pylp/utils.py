@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-from typing import List
+from typing import List, MutableSequence, Sequence, Tuple
 
 import libpyexbase
 
@@ -19,6 +19,22 @@ def word_id_combiner(words) -> int:
 
 
 # * Syntax helpers
+def new_positions_from_mask(keep: Sequence[bool]) -> Tuple[List[int], int]:
+    """Example:
+    keep: [True, False, True]
+    result: ([0, -1, 1], 2)
+    """
+    new_positions = []
+    cur_pos = 0
+    for k in keep:
+        if k:
+            new_positions.append(cur_pos)
+            cur_pos += 1
+        else:
+            new_positions.append(-1)
+    return new_positions, cur_pos
+
+
 def adjust_syntax_links(new_sent: List[WordObj], new_positions: List[int]):
     """Example:
     old_sent: ['word', ',', 'word2', ':', 'word3']
@@ -55,3 +71,28 @@ def adjust_syntax_links(new_sent: List[WordObj], new_positions: List[int]):
             new_sent[new_pos].synt_link = common.SyntLink.ORPHAN
         else:
             new_sent[new_pos].parent_offs = new_parent_pos - new_pos
+
+
+def adjust_syntax_links_columns(
+    parent_offs: MutableSequence[int],
+    synt_links: MutableSequence[int],
+    kept: List[int],
+    new_positions: List[int],
+    none_val: int,
+):
+    """Same as adjust_syntax_links, but works on compacted columns of a sentence.
+
+    kept[new_pos] is the old position of a word, parent offsets are not adjusted
+    yet. Missing parent offsets are stored as none_val.
+    """
+    orphan = common.SyntLink.ORPHAN
+    for new_pos, old_pos in enumerate(kept):
+        old_parent_offs = parent_offs[new_pos]
+        if old_parent_offs == none_val or old_parent_offs == 0:
+            continue
+        new_parent_pos = new_positions[old_pos + old_parent_offs]
+        if new_parent_pos == -1:
+            parent_offs[new_pos] = 0
+            synt_links[new_pos] = orphan
+        else:
+            parent_offs[new_pos] = new_parent_pos - new_pos
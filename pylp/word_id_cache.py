@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""Process-wide cache of word ids.
+
+Maps (lowercased lemma, lang) to (word_id, lang). lang=None in the key means
+that the language is detected by libpyexbase; the detected language is
+returned as the second element of the value.
+
+The cache consists of two parts:
+    - preloaded entries that are read from a file (see save_word_id_cache)
+      and never evicted. When loaded before forking worker processes, these
+      entries are shared between workers;
+    - LRU part that is bounded by max_size.
+"""
+
+import collections
+import gzip
+import pickle
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import libpyexbase
+
+KeyType = Tuple[str, Optional[int]]
+ValueType = Tuple[int, Optional[int]]
+
+_PRELOADED: Dict[KeyType, ValueType] = {}
+_CACHE: collections.OrderedDict[KeyType, ValueType] = collections.OrderedDict()
+_MAX_SIZE = 500_000
+_CACHE_HITS = 0
+_CACHE_MISSES = 0
+
+
+def get_word_id_cache_info():
+    return len(_PRELOADED) + len(_CACHE), _CACHE_HITS, _CACHE_MISSES
+
+
+def set_word_id_cache_max_size(max_size: int):
+    """Set the bound of the LRU part. max_size=0 disables caching of new entries."""
+    global _MAX_SIZE
+    _MAX_SIZE = max_size
+    while len(_CACHE) > _MAX_SIZE:
+        _CACHE.popitem(last=False)
+
+
+def clear_word_id_cache():
+    global _CACHE_HITS, _CACHE_MISSES
+    _PRELOADED.clear()
+    _CACHE.clear()
+    _CACHE_HITS = 0
+    _CACHE_MISSES = 0
+
+
+def _lookup(key: KeyType, need_lang: bool = False) -> Optional[ValueType]:
+    global _CACHE_HITS, _CACHE_MISSES
+    value = _PRELOADED.get(key)
+    if value is None:
+        value = _CACHE.get(key)
+        if value is not None:
+            _CACHE.move_to_end(key)
+    if value is not None and need_lang and value[1] is None:
+        # Cached by get_word_id without the language detection
+        value = None
+    if value is None:
+        _CACHE_MISSES += 1
+    else:
+        _CACHE_HITS += 1
+    return value
+
+
+def _put(key: KeyType, value: ValueType):
+    if _MAX_SIZE <= 0:
+        return
+    _CACHE[key] = value
+    if len(_CACHE) > _MAX_SIZE:
+        _CACHE.popitem(last=False)
+
+
+def get_word_id(lemma: str, lang: Optional[int] = None) -> int:
+    """Word id of the lemma. lemma should be already lowercased."""
+    key = (lemma, None if lang is None else int(lang))
+    value = _lookup(key)
+    if value is None:
+        if lang is None:
+            value = (libpyexbase.detect_lang_calc_word_id(lemma, True), None)
+        else:
+            value = (libpyexbase.calc_word_id(lemma, lang, True), key[1])
+        _put(key, value)
+    return value[0]
+
+
+def get_word_ids_and_langs(lemmas: List[str]) -> List[ValueType]:
+    """Batch version of get_word_id with the language detection. Returns
+    (word_id, detected lang) for every lemma. Only missed lemmas are passed to
+    libpyexbase."""
+    results: List[Optional[ValueType]] = [_lookup((l, None), True) for l in lemmas]
+    missed = [i for i, r in enumerate(results) if r is None]
+    if missed:
+        word_ids, word_langs = libpyexbase.calc_word_ids_and_langs(
+            [lemmas[i] for i in missed], True
+        )
+        for i, word_id, lang in zip(missed, word_ids, word_langs):
+            value = (word_id, lang)
+            results[i] = value
+            _put((lemmas[i], None), value)
+    return results  # type: ignore
+
+
+def load_word_id_cache(path: str | Path):
+    """Preload entries from the file created by save_word_id_cache."""
+    with gzip.open(path, 'rb') as f:
+        entries = pickle.load(f)
+    if not isinstance(entries, dict):
+        raise RuntimeError(f"Invalid word id cache file: {path}")
+    _PRELOADED.update(entries)
+
+
+def save_word_id_cache(path: str | Path):
+    """Save all entries (preloaded and cached) to the file."""
+    entries = dict(_PRELOADED)
+    entries.update(_CACHE)
+    with gzip.open(path, 'wb') as f:
+        pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
@@ -2,15 +2,35 @@
 
 from __future__ import annotations
 
-from typing import Dict, Optional, Any
-
-import libpyexbase
+import abc
+import enum
+from typing import Dict, List, Optional, Any, TypeVar
 
 from pylp import common
+from pylp import word_id_cache
 from pylp.common import Attr
 
+MORPH_FIELDS = (
+    'number',
+    'gender',
+    'case',
+    'tense',
+    'person',
+    'degree',
+    'aspect',
+    'voice',
+    'mood',
+    'num_type',
+    'animacy',
+)
+
+_WordT = TypeVar('_WordT', bound='BaseWordObj')
+
+
+class BaseWordObj(abc.ABC):
+    """Common part of word representations. Subclasses define how morph
+    features (see MORPH_FIELDS) are stored and fill them in _init_morph."""
 
-class WordObj:
     __slots__ = (
         'lemma',
         'form',
@@ -21,20 +41,22 @@ class WordObj:
         'parent_offs',
         'synt_link',
         'lang',
-        'number',
-        'gender',
-        'case',
-        'tense',
-        'person',
-        'degree',
-        'aspect',
-        'voice',
-        'mood',
-        'num_type',
-        'animacy',
-        'extra',
+        '_extra',
     )
 
+    # morph features
+    number: Optional[common.WordNumber]
+    gender: Optional[common.WordGender]
+    case: Optional[common.WordCase]
+    tense: Optional[common.WordTense]
+    person: Optional[common.WordPerson]
+    degree: Optional[common.WordDegree]
+    aspect: Optional[common.WordAspect]
+    voice: Optional[common.WordVoice]
+    mood: Optional[common.WordMood]
+    num_type: Optional[common.WordNumType]
+    animacy: Optional[common.WordAnimacy]
+
     def __init__(
         self,
         *,
@@ -74,31 +96,91 @@ class WordObj:
         self.lang: Optional[common.Lang] = lang
 
         # morph features
-        self.number: Optional[common.WordNumber] = number
-        self.gender: Optional[common.WordGender] = gender
-        self.case: Optional[common.WordCase] = case
-        self.tense: Optional[common.WordTense] = tense
-        self.person: Optional[common.WordPerson] = person
-        self.degree: Optional[common.WordDegree] = degree
-        self.aspect: Optional[common.WordAspect] = None
-        self.voice: Optional[common.WordVoice] = voice
-        self.mood: Optional[common.WordMood] = None
-        self.num_type: Optional[common.WordNumType] = None
-        self.animacy: Optional[common.WordAnimacy] = animacy
+        self._init_morph(
+            number=number,
+            gender=gender,
+            case=case,
+            tense=tense,
+            person=person,
+            degree=degree,
+            voice=voice,
+            animacy=animacy,
+        )
 
         # Aux fields. These fields are used by some internal algorithms (phrase builder).
-        self.extra: dict = {}
+        # The dict is allocated on the first access to extra.
+        self._extra: Optional[dict] = None
+
+    @abc.abstractmethod
+    def _init_morph(
+        self,
+        number: Optional[common.WordNumber] = None,
+        gender: Optional[common.WordGender] = None,
+        case: Optional[common.WordCase] = None,
+        tense: Optional[common.WordTense] = None,
+        person: Optional[common.WordPerson] = None,
+        degree: Optional[common.WordDegree] = None,
+        aspect: Optional[common.WordAspect] = None,
+        voice: Optional[common.WordVoice] = None,
+        mood: Optional[common.WordMood] = None,
+        num_type: Optional[common.WordNumType] = None,
+        animacy: Optional[common.WordAnimacy] = None,
+    ):
+        """Set all morph features, missing ones are None."""
+
+    @classmethod
+    def _blank(cls):
+        """Create a word with default values bypassing __init__ keyword arguments."""
+        word_obj = cls.__new__(cls)
+        word_obj.pos_tag = common.PosTag.UNDEF
+        word_obj.lemma = None
+        word_obj.form = None
+        word_obj._word_id = None
+        word_obj.offset = None
+        word_obj.len = None
+        word_obj.parent_offs = None
+        word_obj.synt_link = None
+        word_obj.lang = None
+        word_obj._init_morph()
+        word_obj._extra = None
+        return word_obj
+
+    @classmethod
+    def from_word(cls: type[_WordT], word_obj: BaseWordObj) -> _WordT:
+        """Detached copy of any word representation (e.g. a view of a column
+        store). The extra dict is shared with word_obj."""
+        new_word = cls._blank()
+        for name in _COPIED_FIELDS:
+            setattr(new_word, name, getattr(word_obj, name))
+        if word_obj.has_extra():
+            new_word.extra = word_obj.extra
+        return new_word
+
+    @property
+    def extra(self) -> dict:
+        if self._extra is None:
+            self._extra = {}
+        return self._extra
+
+    @extra.setter
+    def extra(self, extra: dict):
+        self._extra = extra
+
+    def get_extra(self, key, default=None):
+        """Read extra field without allocating the dict."""
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    def has_extra(self) -> bool:
+        return bool(self._extra)
 
     @property
     def word_id(self) -> Optional[int]:
         if self._word_id is None:
             if self.lemma is None:
                 return None
-            l = self.lemma.lower()
-            if self.lang is None:
-                self._word_id = libpyexbase.detect_lang_calc_word_id(l, True)
-            else:
-                self._word_id = libpyexbase.calc_word_id(l, self.lang, True)
+            self._word_id = word_id_cache.get_word_id(self.lemma.lower(), self.lang)
         return self._word_id
 
     @word_id.setter
@@ -150,6 +232,7 @@ class WordObj:
     @classmethod
     def from_dict(cls, dic):
         word_obj = cls()
+        morph: Dict[str, Any] = {}
         for key, value in dic.items():
             if value is None:
                 continue
@@ -173,27 +256,29 @@ class WordObj:
                 case Attr.LANG:
                     word_obj.lang = common.Lang(value)
                 case Attr.NUMBER:
-                    word_obj.number = common.WordNumber(value)
+                    morph['number'] = common.WordNumber(value)
                 case Attr.GENDER:
-                    word_obj.gender = common.WordGender(value)
+                    morph['gender'] = common.WordGender(value)
                 case Attr.CASE:
-                    word_obj.case = common.WordCase(value)
+                    morph['case'] = common.WordCase(value)
                 case Attr.TENSE:
-                    word_obj.tense = common.WordTense(value)
+                    morph['tense'] = common.WordTense(value)
                 case Attr.PERSON:
-                    word_obj.person = common.WordPerson(value)
+                    morph['person'] = common.WordPerson(value)
                 case Attr.DEGREE:
-                    word_obj.degree = common.WordDegree(value)
+                    morph['degree'] = common.WordDegree(value)
                 case Attr.ASPECT:
-                    word_obj.aspect = common.WordAspect(value)
+                    morph['aspect'] = common.WordAspect(value)
                 case Attr.VOICE:
-                    word_obj.voice = common.WordVoice(value)
+                    morph['voice'] = common.WordVoice(value)
                 case Attr.MOOD:
-                    word_obj.mood = common.WordMood(value)
+                    morph['mood'] = common.WordMood(value)
                 case Attr.NUM_TYPE:
-                    word_obj.num_type = common.WordNumType(value)
+                    morph['num_type'] = common.WordNumType(value)
                 case Attr.ANIMACY:
-                    word_obj.animacy = common.WordAnimacy(value)
+                    morph['animacy'] = common.WordAnimacy(value)
+        if morph:
+            word_obj._init_morph(**morph)
         return word_obj
 
     def __str__(self) -> str:
@@ -241,4 +326,199 @@ class WordObj:
         return ''.join(parts_s)
 
     def __repr__(self) -> str:
-        return f"WordObj(pos_tag={self.pos_tag}, lemma={self.lemma}, word_id={self.word_id:x})"
+        return (
+            f"{self.__class__.__name__}(pos_tag={self.pos_tag}, lemma={self.lemma}, "
+            f"word_id={self.word_id:x})"
+        )
+
+
+class WordObj(BaseWordObj):
+    """Word with morph features stored as separate enum fields."""
+
+    __slots__ = MORPH_FIELDS
+
+    def _init_morph(
+        self,
+        number=None,
+        gender=None,
+        case=None,
+        tense=None,
+        person=None,
+        degree=None,
+        aspect=None,
+        voice=None,
+        mood=None,
+        num_type=None,
+        animacy=None,
+    ):
+        self.number = number
+        self.gender = gender
+        self.case = case
+        self.tense = tense
+        self.person = person
+        self.degree = degree
+        self.aspect = aspect
+        self.voice = voice
+        self.mood = mood
+        self.num_type = num_type
+        self.animacy = animacy
+
+
+def _morph_layout():
+    layout = {}
+    shift = 0
+    for name, enum_cls in zip(
+        MORPH_FIELDS,
+        (
+            common.WordNumber,
+            common.WordGender,
+            common.WordCase,
+            common.WordTense,
+            common.WordPerson,
+            common.WordDegree,
+            common.WordAspect,
+            common.WordVoice,
+            common.WordMood,
+            common.WordNumType,
+            common.WordAnimacy,
+        ),
+    ):
+        # 0 is reserved for None, so value v is stored as v + 1
+        width = (max(enum_cls) + 1).bit_length()
+        table: List[Optional[enum.IntEnum]] = [None] * (1 << width)
+        for v in enum_cls:
+            table[v + 1] = v
+        layout[name] = (shift, (1 << width) - 1, tuple(table))
+        shift += width
+    return layout
+
+
+_MORPH_LAYOUT = _morph_layout()
+_COPIED_FIELDS = tuple(n for n in BaseWordObj.__slots__ if n != '_extra') + MORPH_FIELDS
+
+
+def _morph_property(name) -> Any:
+    shift, mask, table = _MORPH_LAYOUT[name]
+    clear_mask = ~(mask << shift)
+
+    def getter(self):
+        return table[(self._morph >> shift) & mask]
+
+    def setter(self, value):
+        code = 0 if value is None else int(value) + 1
+        if code > mask:
+            raise ValueError(f"Invalid {name} value: {value}")
+        self._morph = (self._morph & clear_mask) | (code << shift)
+
+    return property(getter, setter)
+
+
+class CompactWordObj(BaseWordObj):
+    """Word with all morph features packed into a single int.
+
+    Every feature takes a few bits of the _morph field, so a word has one slot
+    instead of eleven. Enum values are created only when a feature is read.
+    morph_code can be used for fast comparison of morph features of words.
+    """
+
+    __slots__ = ('_morph',)
+
+    def _init_morph(
+        self,
+        number=None,
+        gender=None,
+        case=None,
+        tense=None,
+        person=None,
+        degree=None,
+        aspect=None,
+        voice=None,
+        mood=None,
+        num_type=None,
+        animacy=None,
+    ):
+        self._morph = 0
+        for name, value in (
+            ('number', number),
+            ('gender', gender),
+            ('case', case),
+            ('tense', tense),
+            ('person', person),
+            ('degree', degree),
+            ('aspect', aspect),
+            ('voice', voice),
+            ('mood', mood),
+            ('num_type', num_type),
+            ('animacy', animacy),
+        ):
+            if value is not None:
+                setattr(self, name, value)
+
+    @property
+    def morph_code(self) -> int:
+        return self._morph
+
+    number = _morph_property('number')
+    gender = _morph_property('gender')
+    case = _morph_property('case')
+    tense = _morph_property('tense')
+    person = _morph_property('person')
+    degree = _morph_property('degree')
+    aspect = _morph_property('aspect')
+    voice = _morph_property('voice')
+    mood = _morph_property('mood')
+    num_type = _morph_property('num_type')
+    animacy = _morph_property('animacy')
+
+
+def _enum_table(enum_cls):
+    return {v.value: v for v in enum_cls}
+
+
+# Attr key -> (slot name, value -> enum table or None)
+_DECODE_TABLE = {
+    Attr.POS_TAG: ('pos_tag', _enum_table(common.PosTag)),
+    Attr.WORD_LEMMA: ('lemma', None),
+    Attr.WORD_FORM: ('form', None),
+    Attr.WORD_ID: ('_word_id', None),
+    Attr.OFFSET: ('offset', None),
+    Attr.LENGTH: ('len', None),
+    Attr.SYNTAX_PARENT: ('parent_offs', None),
+    Attr.SYNTAX_LINK_NAME: ('synt_link', _enum_table(common.SyntLink)),
+    Attr.LANG: ('lang', _enum_table(common.Lang)),
+    Attr.NUMBER: ('number', _enum_table(common.WordNumber)),
+    Attr.GENDER: ('gender', _enum_table(common.WordGender)),
+    Attr.CASE: ('case', _enum_table(common.WordCase)),
+    Attr.TENSE: ('tense', _enum_table(common.WordTense)),
+    Attr.PERSON: ('person', _enum_table(common.WordPerson)),
+    Attr.DEGREE: ('degree', _enum_table(common.WordDegree)),
+    Attr.ASPECT: ('aspect', _enum_table(common.WordAspect)),
+    Attr.VOICE: ('voice', _enum_table(common.WordVoice)),
+    Attr.MOOD: ('mood', _enum_table(common.WordMood)),
+    Attr.NUM_TYPE: ('num_type', _enum_table(common.WordNumType)),
+    Attr.ANIMACY: ('animacy', _enum_table(common.WordAnimacy)),
+}
+
+
+def words_from_dicts(word_dicts, cls: type[BaseWordObj] = WordObj) -> List[Any]:
+    """Bulk version of WordObj.from_dict.
+
+    Uses precomputed key -> slot and value -> enum tables instead of matching
+    every key and calling enum constructors.
+    """
+    table = _DECODE_TABLE
+    blank = cls._blank
+    words = []
+    for dic in word_dicts:
+        word_obj = blank()
+        try:
+            for key, value in dic.items():
+                if value is None or (entry := table.get(key)) is None:
+                    continue
+                slot, enum_table = entry
+                setattr(word_obj, slot, value if enum_table is None else enum_table[value])
+        except KeyError:
+            # Let from_dict report an invalid enum value
+            word_obj = cls.from_dict(dic)
+        words.append(word_obj)
+    return words
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+
+"""Microbenchmarks for pylp hot paths. Run `bench.py <cmd> --help` for options."""
+
+import argparse
+import io
+import itertools
+import logging
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import ujson
+
+from pylp import common
+from pylp import lp_doc
+from pylp.columnar import ColumnarSent
+from pylp.converter_conll_ud_v1 import ConverterConllUDV1, ConvFields
+from pylp.io import open_text
+from pylp.filtratus import Filtratus
+from pylp.word_obj import WordObj, words_from_dicts
+from pylp.phrases.phrase import PhraseIdMemo
+from pylp.phrases.builder import (
+    MWEBuilderOpts,
+    PhraseBuilder,
+    PhraseBuilderOpts,
+    PhraseProfile,
+    dispatch_phrase_building,
+)
+from pylp.pipeline import Pipeline
+
+
+def _timeit(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _report(name, seconds, docs_cnt, tokens_cnt, size=None):
+    size_s = f", size: {size / 1024:.1f} KiB" if size is not None else ''
+    logging.info(
+        "%-24s %8.2f ms, %9.0f docs/s, %11.0f tokens/s%s",
+        name,
+        seconds * 1000,
+        docs_cnt / seconds,
+        tokens_cnt / seconds,
+        size_s,
+    )
+
+
+def make_synthetic_sent(rnd: random.Random, sent_len: int, lemmas) -> lp_doc.Sent:
+    words = []
+    offset = 0
+    for i in range(sent_len):
+        lemma = rnd.choice(lemmas)
+        parent_offs = 0 if i == 0 else rnd.randint(-min(i, 5), -1)
+        words.append(
+            WordObj(
+                lemma=lemma,
+                form=lemma,
+                pos_tag=rnd.choice([common.PosTag.NOUN, common.PosTag.ADJ, common.PosTag.VERB]),
+                offset=offset,
+                length=len(lemma),
+                parent_offs=parent_offs,
+                synt_link=common.SyntLink.ROOT if i == 0 else common.SyntLink.NMOD,
+                number=common.WordNumber.SING,
+                case=rnd.choice(list(common.WordCase)),
+                gender=rnd.choice(list(common.WordGender)),
+            )
+        )
+        offset += len(lemma) + 1
+    return lp_doc.Sent(words, bounds=(0, offset))
+
+
+def make_synthetic_docs(docs_cnt, sents_cnt, sent_len, with_phrases=True, seed=0):
+    rnd = random.Random(seed)
+    lemmas = [f'lemma{i}' for i in range(2000)]
+    builder = PhraseBuilder(MaxN=3)
+    docs = []
+    for doc_no in range(docs_cnt):
+        doc = lp_doc.Doc(str(doc_no), lang=common.Lang.EN)
+        for _ in range(sents_cnt):
+            sent = make_synthetic_sent(rnd, sent_len, lemmas)
+            if with_phrases:
+                sent.set_phrases(builder.build_phrases_for_sent(sent))
+            doc.add_sent(sent)
+        doc.text = ' '.join(w.form for s in doc for w in s if w.form)
+        docs.append(doc)
+    return docs
+
+
+def bench_codec(args):
+    docs = make_synthetic_docs(args.docs, args.sents, args.sent_len)
+    tokens_cnt = sum(len(s) for d in docs for s in d)
+    logging.info("docs: %d, tokens: %d", len(docs), tokens_cnt)
+
+    json_data = [ujson.dumps(d.to_dict()) for d in docs]
+    bin_data = [d.to_bytes() for d in docs]
+
+    t = _timeit(lambda: [ujson.dumps(d.to_dict()) for d in docs], args.repeat)
+    _report("to_dict+ujson encode", t, len(docs), tokens_cnt, sum(len(s) for s in json_data))
+    t = _timeit(lambda: [d.to_bytes() for d in docs], args.repeat)
+    _report("to_bytes encode", t, len(docs), tokens_cnt, sum(len(s) for s in bin_data))
+
+    t = _timeit(lambda: [lp_doc.Doc.from_dict(ujson.loads(s)) for s in json_data], args.repeat)
+    _report("ujson+from_dict decode", t, len(docs), tokens_cnt)
+    t = _timeit(lambda: [lp_doc.Doc.from_bytes(s) for s in bin_data], args.repeat)
+    _report("from_bytes decode", t, len(docs), tokens_cnt)
+
+
+def bench_decoder(args):
+    docs = make_synthetic_docs(args.docs, args.sents, args.sent_len, with_phrases=False)
+    words_dicts = [[w.to_dict() for w in s] for d in docs for s in d]
+    tokens_cnt = sum(len(s) for s in words_dicts)
+    logging.info("docs: %d, tokens: %d", len(docs), tokens_cnt)
+
+    t = _timeit(lambda: [[WordObj.from_dict(w) for w in s] for s in words_dicts], args.repeat)
+    _report("WordObj.from_dict", t, len(docs), tokens_cnt)
+    t = _timeit(lambda: [words_from_dicts(s) for s in words_dicts], args.repeat)
+    _report("words_from_dicts", t, len(docs), tokens_cnt)
+
+
+def bench_filter(args):
+    kinds = ['punct', 'determiner', 'common_aux', 'stopwords', 'num&undeflang']
+    filt = Filtratus(kinds, {})
+    filters = [filt._filters[k] for k in kinds]
+    compiled = filt.compile(kinds)
+    docs = make_synthetic_docs(args.docs, args.sents, args.sent_len, with_phrases=False)
+    sents = [s for d in docs for s in d]
+    tokens_cnt = sum(len(s) for s in sents)
+    logging.info("docs: %d, tokens: %d", len(docs), tokens_cnt)
+
+    for sent_cls in (lp_doc.Sent, ColumnarSent):
+        dicts = [s.to_dict() for s in sents]
+        t = _timeit(
+            lambda: [sent_cls.from_dict(d).filter_words(filters) for d in dicts], args.repeat
+        )
+        _report(f"{sent_cls.__name__} filters", t, len(docs), tokens_cnt)
+        t = _timeit(
+            lambda: [compiled.filter_sent(sent_cls.from_dict(d)) for d in dicts], args.repeat
+        )
+        _report(f"{sent_cls.__name__} compiled", t, len(docs), tokens_cnt)
+
+
+def bench_pipeline(args):
+    docs = make_synthetic_docs(args.docs, args.sents, args.sent_len, with_phrases=False)
+    stages = [
+        ('filter', {'kinds': ['punct', 'determiner', 'num&undeflang']}),
+        ('phrases', {'phrases_max_n': 4, 'builder_opts': PhraseBuilderOpts()}),
+    ]
+    for processes in args.processes:
+        pipeline = Pipeline(stages, processes=processes)
+        for _ in pipeline.process(docs):
+            pass
+        logging.info("processes: %d, %s", processes, pipeline.stats)
+
+
+def _make_dense(sent: lp_doc.Sent, rnd: random.Random):
+    """Nouns and adjectives only, so every link produces phrases."""
+    for word_obj in sent:
+        is_noun = rnd.random() < 0.6
+        word_obj.pos_tag = common.PosTag.NOUN if is_noun else common.PosTag.ADJ
+        if word_obj.parent_offs:
+            word_obj.synt_link = common.SyntLink.NMOD if is_noun else common.SyntLink.AMOD
+
+
+def _make_fanout(sent: lp_doc.Sent, fanout: int):
+    """Every fanout-th word is a head of all words up to the next head."""
+    for i, word_obj in enumerate(sent):
+        word_obj.parent_offs = -(i % fanout) or -min(i, fanout)
+
+
+def bench_builder(args):
+    docs = make_synthetic_docs(args.docs, args.sents, args.sent_len, with_phrases=False)
+    sents = [s for d in docs for s in d]
+    rnd = random.Random(0)
+    for sent in sents:
+        if args.fanout:
+            _make_fanout(sent, args.fanout)
+        if args.dense or args.fanout or args.mwe:
+            _make_dense(sent, rnd)
+        if args.mwe:
+            for word_obj in sent:
+                if word_obj.parent_offs:
+                    word_obj.synt_link = common.SyntLink.COMPOUND
+    tokens_cnt = sum(len(s) for s in sents)
+    logging.info("docs: %d, tokens: %d", len(docs), tokens_cnt)
+
+    for beam_size in [None] + args.beam_size:
+        opts = MWEBuilderOpts() if args.mwe else PhraseBuilderOpts()
+        opts.max_variants_bound = args.max_variants_bound
+        opts.beam_size = beam_size
+        for max_n in args.max_n:
+            opts.id_memo = PhraseIdMemo() if args.id_memo else None
+            builder = PhraseBuilder(MaxN=max_n, opts=opts)
+            phrases_cnt = sum(len(builder.build_phrases_for_sent(s)) for s in sents)
+            t = _timeit(lambda: [builder.build_phrases_for_sent(s) for s in sents], args.repeat)
+            _report(
+                f"MaxN={max_n}, beam={beam_size}, {phrases_cnt} phrases", t, len(docs), tokens_cnt
+            )
+            if opts.id_memo is not None:
+                # ids are calculated on demand, so request them as a consumer would
+                t = _timeit(
+                    lambda: [
+                        [p.get_id() for p in builder.build_phrases_for_sent(s)] for s in sents
+                    ],
+                    args.repeat,
+                )
+                _report("with ids", t, len(docs), tokens_cnt)
+                logging.info(
+                    "phrase id combine calls: %d, saved by memo: %d",
+                    opts.id_memo.combine_calls,
+                    opts.id_memo.saved_combine_calls,
+                )
+
+    if args.iter_first:
+        builder = PhraseBuilder(MaxN=max(args.max_n))
+        t = _timeit(
+            lambda: [
+                list(itertools.islice(builder.iter_phrases_for_sent(s), args.iter_first))
+                for s in sents
+            ],
+            args.repeat,
+        )
+        _report(f"iter first {args.iter_first} phrases", t, len(docs), tokens_cnt)
+
+    for max_part_len in args.max_part_len:
+        opts = PhraseBuilderOpts()
+        opts.max_part_len = max_part_len
+        builder = PhraseBuilder(MaxN=max(args.max_n), opts=opts)
+        t = _timeit(lambda: [builder.build_phrases_for_sent(s) for s in sents], args.repeat)
+        _report(f"max_part_len={max_part_len}", t, len(docs), tokens_cnt)
+        if args.part_processes:
+            with ProcessPoolExecutor(args.part_processes) as executor:
+                t = _timeit(
+                    lambda: [builder.build_phrases_for_sent(s, executor=executor) for s in sents],
+                    args.repeat,
+                )
+            _report(f"{args.part_processes} processes", t, len(docs), tokens_cnt)
+
+
+def bench_profile(args):
+    docs = make_synthetic_docs(args.docs, args.sents, args.sent_len, with_phrases=False)
+    sents = [s for d in docs for s in d]
+    tokens_cnt = sum(len(s) for s in sents)
+    logging.info("docs: %d, sents: %d, tokens: %d", len(docs), len(sents), tokens_cnt)
+
+    for profile_name in PhraseProfile.PROFILE_NAMES:
+        t = _timeit(
+            lambda: [dispatch_phrase_building(profile_name, s, args.max_n) for s in sents],
+            args.repeat,
+        )
+        _report(f"{profile_name} dispatch", t, len(docs), tokens_cnt)
+        profile = PhraseProfile(profile_name, args.max_n)
+        t = _timeit(lambda: [profile.build_phrases_for_sent(s) for s in sents], args.repeat)
+        _report(f"{profile_name} profile", t, len(docs), tokens_cnt)
+        logging.info(
+            "phrase id combine calls: %d, saved by memo: %d",
+            profile.id_memo.combine_calls,
+            profile.id_memo.saved_combine_calls,
+        )
+
+
+def make_synthetic_conll(docs) -> str:
+    lines = []
+    for doc in docs:
+        lines.append(f'# newdoc id = {doc.doc_id}')
+        for sent in doc:
+            for i, w in enumerate(sent):
+                feats = '|'.join(
+                    f'{name}={getattr(w, name.lower()).name.capitalize()}'
+                    for name in ('Case', 'Gender', 'Number')
+                )
+                head = 0 if w.parent_offs == 0 else i + 1 + w.parent_offs
+                deprel = 'root' if head == 0 else 'nmod'
+                row = [str(i + 1), w.form, w.lemma, w.pos_tag.name, '_', feats, str(head), deprel]
+                lines.append('\t'.join(row + ['_', '_']))
+            lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+def bench_conll(args):
+    if args.input:
+        with open_text(args.input) as f:
+            data = f.read()
+    else:
+        docs = make_synthetic_docs(args.docs, args.sents, args.sent_len, with_phrases=False)
+        data = make_synthetic_conll(docs)
+    converted = list(ConverterConllUDV1().iter_docs(io.StringIO(data)))
+    tokens_cnt = sum(len(s) for d in converted for s in d)
+    logging.info("docs: %d, tokens: %d", len(converted), tokens_cnt)
+
+    for max_cache_size in (0, 100_000):
+        t = _timeit(
+            lambda: list(ConverterConllUDV1(max_cache_size).iter_docs(io.StringIO(data))),
+            args.repeat,
+        )
+        _report(f"max_cache_size={max_cache_size}", t, len(converted), tokens_cnt)
+
+    for fields in (ConvFields.ALL, ConvFields.INDEX, ConvFields.ALL & ~ConvFields.OFFSETS):
+        t = _timeit(
+            lambda: list(ConverterConllUDV1(fields=fields).iter_docs(io.StringIO(data))),
+            args.repeat,
+        )
+        _report(f"fields={fields.name}", t, len(converted), tokens_cnt)
+
+
+def _add_synthetic_args(parser):
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--sents", type=int, default=20)
+    parser.add_argument("--sent_len", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verbose", "-v", action="store_true", default=False)
+
+    subparsers = parser.add_subparsers(help='sub-command help')
+
+    codec_parser = subparsers.add_parser('codec', help='binary codec vs to_dict+ujson')
+    _add_synthetic_args(codec_parser)
+    codec_parser.set_defaults(func=bench_codec)
+
+    decoder_parser = subparsers.add_parser('decoder', help='table-driven words decoder')
+    _add_synthetic_args(decoder_parser)
+    decoder_parser.set_defaults(func=bench_decoder)
+
+    filter_parser = subparsers.add_parser('filter', help='compiled vs per-word filtratus')
+    _add_synthetic_args(filter_parser)
+    filter_parser.set_defaults(func=bench_filter)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='Pipeline scaling')
+    _add_synthetic_args(pipeline_parser)
+    pipeline_parser.add_argument("--processes", type=int, nargs='+', default=[1, 2, 4])
+    pipeline_parser.set_defaults(func=bench_pipeline)
+
+    builder_parser = subparsers.add_parser('builder', help='PhraseBuilder')
+    _add_synthetic_args(builder_parser)
+    builder_parser.add_argument("--max_n", type=int, nargs='+', default=[3, 5, 7])
+    builder_parser.add_argument("--max_variants_bound", type=int, default=8)
+    builder_parser.add_argument("--dense", action="store_true", help='nouns and adjectives only')
+    builder_parser.add_argument("--id_memo", action="store_true", help='memoize phrase ids')
+    builder_parser.add_argument("--mwe", action="store_true", help='MWE builder, top level only')
+    builder_parser.add_argument("--fanout", type=int, default=0, help='modifiers per head')
+    builder_parser.add_argument(
+        "--beam_size", type=int, nargs='*', default=[], help='also run in beam mode'
+    )
+    builder_parser.add_argument(
+        "--max_part_len", type=int, nargs='*', default=[], help='also run with partitioning'
+    )
+    builder_parser.add_argument(
+        "--part_processes", type=int, default=0, help='build partitions in a process pool'
+    )
+    builder_parser.add_argument(
+        "--iter_first", type=int, default=0, help='take N phrases per sent from the iterator'
+    )
+    builder_parser.set_defaults(func=bench_builder)
+
+    profile_parser = subparsers.add_parser('profile', help='compiled PhraseProfile vs dispatch')
+    _add_synthetic_args(profile_parser)
+    profile_parser.add_argument("--max_n", type=int, default=4)
+    profile_parser.set_defaults(func=bench_profile)
+
+    conll_parser = subparsers.add_parser('conll', help='CoNLL-U converter with/without caches')
+    _add_synthetic_args(conll_parser)
+    conll_parser.add_argument("--input", "-i", help='conllu file (synthetic data by default)')
+    conll_parser.set_defaults(func=bench_conll)
+
+    args = parser.parse_args()
+
+    FORMAT = "%(asctime)s %(levelname)s: %(name)s: %(message)s"
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format=FORMAT)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()